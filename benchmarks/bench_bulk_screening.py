@@ -0,0 +1,69 @@
+"""
+Measures bulk screening throughput: BulkScreener's chunked TF-IDF product on
+one and on all cores, against matching names one at a time with a
+LocalSearchIndex. Also reports recall: the share of the index's matches that
+survive the top --candidates cut by cosine similarity.
+
+Usage:
+    python benchmarks/bench_bulk_screening.py
+    python benchmarks/bench_bulk_screening.py --aliases 40000 --names 20000 --candidates 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+sys.path.append(os.path.dirname(__file__))
+from bench_fuzzy_index import synthetic_records, with_typos
+from bulk_screening import BulkScreener, screen_bulk
+from local_search import LocalSearchIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk TF-IDF screening.")
+    parser.add_argument("--aliases", type=int, default=40000)
+    parser.add_argument("--names", type=int, default=5000, help="Customer names to screen.")
+    parser.add_argument("--threshold", type=int, default=2)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--chunk_size", type=int, default=128)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    records = synthetic_records(args.aliases, rng)
+    aliases = [r["names"][0]["normalized_name"] for r in records]
+    # Half near-misses of listed names, half unrelated names
+    names = [
+        (str(i), with_typos(rng.choice(aliases), rng.randint(0, args.threshold), rng) if i % 2
+         else with_typos(rng.choice(aliases)[::-1], 3, rng))
+        for i in range(args.names)
+    ]
+
+    start = time.perf_counter()
+    screener = BulkScreener(records, candidates=args.candidates)
+    print(f"{len(aliases)} aliases, {len(names)} names; TF-IDF index built in {time.perf_counter() - start:.2f}s")
+
+    bulk = {}
+    for workers in sorted({1, args.workers}):
+        start = time.perf_counter()
+        results = list(screen_bulk(screener, names, args.threshold, 1000, args.chunk_size, workers))
+        elapsed = time.perf_counter() - start
+        print(f"{f'bulk, {workers} workers':<26} {len(names) / elapsed:9.0f} names/s")
+        bulk = {r["input_id"]: {m["entity_id"] for m in r["matches"]} for r in results}
+
+    index = LocalSearchIndex(records, fuzzy_index="qgram")
+    start = time.perf_counter()
+    expected = {input_id: {entity_id for entity_id, _ in index.match(name, args.threshold)}
+                for input_id, name in names}
+    elapsed = time.perf_counter() - start
+    print(f"{'one at a time, qgram index':<26} {len(names) / elapsed:9.0f} names/s")
+
+    found = sum(len(expected[i] & bulk[i]) for i in expected)
+    total = sum(len(matches) for matches in expected.values())
+    print(f"Recall of index matches with {args.candidates} candidates: {found / total if total else 1:.2%}")
+
+
+if __name__ == "__main__":
+    main()
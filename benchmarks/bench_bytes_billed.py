@@ -0,0 +1,103 @@
+"""
+Reports the bytes each search layout processes and bills for the standard test
+terms (those of tests/test_robust_search_cases.py), against a loaded dataset:
+the default search_data query, the single-scan ranked query with and without
+the stored keys, and the ranked query on the clustered alias table through its
+search index. The query cache is disabled so every query is billed.
+
+Search indexes are only populated on tables of 10 GB or more, so on a smaller
+alias table SEARCH() scans and the savings come from the narrow, clustered
+alias table alone. The index's state is printed with the results.
+
+Usage:
+    GOOGLE_CLOUD_PROJECT_ID=my-project python benchmarks/bench_bytes_billed.py
+    python benchmarks/bench_bytes_billed.py --project my-project --table sanctions_data.sdn_entities --terms Bank Corp
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+from google.cloud import bigquery
+
+import search_bq
+from table_layout import search_index_name
+
+STANDARD_TERMS = [
+    "AERO-CARIBBEAN", "AEROCARIBBEAN", "BLUE LAGOON GROUP", "Blue Lagoon Grp", "Blue Lagoon Group Ltd",
+    "Blue Lagoon Group Limited", "Hamza", "Hital Exchange", "Hital Xchange", "Corp", "Corporation", "James", "Bank",
+]
+
+
+class RecordingClient:
+    """Wraps a bigquery.Client, turning off the query cache and keeping every query job it starts."""
+
+    def __init__(self, client):
+        self._client = client
+        self.jobs = []
+
+    def query(self, query, job_config=None, **kwargs):
+        job_config = job_config or bigquery.QueryJobConfig()
+        job_config.use_query_cache = False
+        job = self._client.query(query, job_config=job_config, **kwargs)
+        self.jobs.append(job)
+        return job
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report bytes billed per search layout.")
+    parser.add_argument("--project", default=os.environ.get("GOOGLE_CLOUD_PROJECT_ID"))
+    parser.add_argument("--table", default="sanctions_data.sdn_entities", help="DATASET.TABLE")
+    parser.add_argument("--alias_table", help="Alias table ID (defaults to TABLE_aliases).")
+    parser.add_argument("--threshold", type=int, default=2)
+    parser.add_argument("--terms", nargs="+", default=STANDARD_TERMS)
+    args = parser.parse_args()
+    if not args.project:
+        parser.error("Set --project or GOOGLE_CLOUD_PROJECT_ID.")
+
+    dataset_id, table_id = args.table.split(".")
+    alias_table_id = args.alias_table or f"{table_id}_aliases"
+    client = RecordingClient(bigquery.Client(project=args.project))
+    layouts = {
+        "default": lambda term: search_bq.query_entities(
+            args.project, dataset_id, table_id, term, args.threshold, client=client),
+        "ranked": lambda term: search_bq.ranked_search(
+            args.project, dataset_id, table_id, term, args.threshold, client=client),
+        "ranked, keys": lambda term: search_bq.ranked_search(
+            args.project, dataset_id, table_id, term, args.threshold, client=client, use_keys=True),
+        "alias table + index": lambda term: search_bq.ranked_search(
+            args.project, dataset_id, table_id, term, args.threshold, client=client,
+            use_search_index=True, alias_table_id=alias_table_id),
+    }
+
+    index_rows = client.query(
+        f"SELECT index_status, coverage_percentage FROM `{args.project}.{dataset_id}.INFORMATION_SCHEMA.SEARCH_INDEXES`"
+        f" WHERE index_name = '{search_index_name(alias_table_id)}'"
+    ).result()
+    for row in index_rows:
+        print(f"Search index {search_index_name(alias_table_id)}: {row['index_status']}, "
+              f"{row['coverage_percentage']}% covered")
+
+    print(f"{'term':<28}" + "".join(f"{name:>22}" for name in layouts))
+    totals = dict.fromkeys(layouts, 0)
+    index_usage = {}
+    for term in args.terms:
+        billed = []
+        for name, search in layouts.items():
+            search(term)
+            job = client.jobs[-1]
+            billed.append(job.total_bytes_billed or 0)
+            totals[name] += billed[-1]
+            if job.search_stats is not None:
+                index_usage[term] = job.search_stats.mode
+        print(f"{term:<28}" + "".join(f"{b / 1e6:19.1f} MB" for b in billed))
+    print(f"{'total':<28}" + "".join(f"{totals[name] / 1e6:19.1f} MB" for name in layouts))
+    if index_usage:
+        print("Search index usage: " + ", ".join(f"{term}: {mode}" for term, mode in index_usage.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Measures edit-distance throughput when scoring queries against every alias, as
+a brute-force fuzzy match does: the reference DP, the bounded DP local_search
+used before, Myers' bit-parallel bounded_levenshtein, and PackedStrings scoring
+a query against all aliases at once with NumPy.
+
+Usage:
+    python benchmarks/bench_edit_distance.py
+    python benchmarks/bench_edit_distance.py --aliases 40000 --queries 50 --threshold 2
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+from edit_distance import PackedStrings, bounded_levenshtein, levenshtein
+
+
+def bounded_dp(a, b, limit):
+    """The row-by-row DP with an early exit that local_search used before Myers."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+def random_name(rng):
+    words = ["".join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(2, 9)))
+             for _ in range(rng.randint(1, 4))]
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark edit-distance kernels.")
+    parser.add_argument("--aliases", type=int, default=40000, help="Normalized names to score against.")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--threshold", type=int, default=2)
+    parser.add_argument("--reference_queries", type=int, default=2,
+                        help="Queries timed with the unbounded reference DP, which is slow.")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    aliases = [random_name(rng) for _ in range(args.aliases)]
+    queries = [rng.choice(aliases) for _ in range(args.queries)]
+    print(f"{args.aliases} aliases, threshold {args.threshold}")
+
+    def report(label, count, elapsed):
+        pairs = count * len(aliases)
+        print(f"{label:<24} {elapsed / count * 1000:9.2f}ms/query  {pairs / elapsed / 1e6:8.2f}M pairs/s")
+
+    start = time.perf_counter()
+    for query in queries[:args.reference_queries]:
+        [levenshtein(query, alias) for alias in aliases]
+    report("reference DP", args.reference_queries, time.perf_counter() - start)
+
+    for label, kernel in (("bounded DP", bounded_dp), ("Myers bit-parallel", bounded_levenshtein)):
+        start = time.perf_counter()
+        for query in queries:
+            [kernel(query, alias, args.threshold) for alias in aliases]
+        report(label, len(queries), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    packed = PackedStrings(aliases)
+    print(f"{'(packing)':<24} {(time.perf_counter() - start) * 1000:9.2f}ms once")
+    start = time.perf_counter()
+    for query in queries:
+        packed.distances(query, args.threshold)
+    report("NumPy packed Myers", len(queries), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for query in queries:
+        packed.distances(query, len(query))
+    report("NumPy packed, no band", len(queries), time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares how LocalSearchIndex finds fuzzy candidates: the q-gram count filter,
+the pigeonhole filter and a brute-force scan of every normalized name. For
+each, reports build time, edit distances computed per query and latency, with
+the speedup over the scan.
+
+Names are drawn from a word vocabulary (or read from --snapshot), and queries
+are names with up to --threshold random typos.
+
+Usage:
+    python benchmarks/bench_fuzzy_index.py
+    python benchmarks/bench_fuzzy_index.py --names 50000 --queries 300 --threshold 2
+    python benchmarks/bench_fuzzy_index.py --snapshot sdn_shards/part-*.jsonl
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+from local_search import FUZZY_INDEXES, LocalSearchIndex
+
+WORDS = [
+    "AL", "BANK", "TRADING", "GROUP", "SHIPPING", "NATIONAL", "INTERNATIONAL", "HOLDING", "PETRO", "STAR",
+    "OCEAN", "NORTH", "EAST", "GLOBAL", "IMPORT", "EXPORT", "MARINE", "INDUSTRIAL", "DEVELOPMENT", "ENERGY",
+    "CO", "LTD", "CORP", "INC", "LLC", "FZE", "GENERAL", "UNITED", "ROYAL", "GOLDEN",
+]
+
+
+def synthetic_records(count, rng):
+    records = []
+    for i in range(count):
+        words = rng.sample(WORDS, rng.randint(2, 4))
+        # A made-up surname keeps names distinct, as real aliases are
+        words.insert(rng.randint(0, len(words)), "".join(rng.choice(string.ascii_uppercase) for _ in range(6)))
+        name = " ".join(words)
+        records.append({"entity_id": i, "names": [{"full_name": name, "normalized_name": name}]})
+    return records
+
+
+def with_typos(name, count, rng):
+    chars = list(name)
+    for _ in range(count):
+        position = rng.randrange(len(chars) + 1)
+        edit = rng.choice(["insert", "delete", "replace"])
+        if edit == "insert" or not chars:
+            chars.insert(position, rng.choice(string.ascii_uppercase))
+        elif edit == "delete":
+            del chars[min(position, len(chars) - 1)]
+        else:
+            chars[min(position, len(chars) - 1)] = rng.choice(string.ascii_uppercase)
+    return "".join(chars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy candidate generation in LocalSearchIndex.")
+    parser.add_argument("--names", type=int, default=20000, help="Synthetic names when no --snapshot is given.")
+    parser.add_argument("--snapshot", nargs="+", help="JSONL snapshot file(s) to index instead.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threshold", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.snapshot:
+        records = LocalSearchIndex.from_jsonl(args.snapshot, fuzzy_index="scan").entities
+    else:
+        records = synthetic_records(args.names, rng)
+    names = [n["full_name"] for r in records for n in r.get("names") or [] if n.get("full_name")]
+    queries = [with_typos(rng.choice(names).upper(), rng.randint(0, args.threshold), rng)
+               for _ in range(args.queries)]
+    print(f"{len(names)} names, {len(queries)} queries, threshold {args.threshold}")
+
+    timings = {}
+    for fuzzy_index in ("scan",) + tuple(i for i in FUZZY_INDEXES if i != "scan"):
+        start = time.perf_counter()
+        index = LocalSearchIndex(records, fuzzy_index=fuzzy_index)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        for query in queries:
+            index.match(query, args.threshold)
+        timings[fuzzy_index] = elapsed = time.perf_counter() - start
+        stats = index.fuzzy_stats()
+        print(
+            f"{fuzzy_index:<11} build {built:6.2f}s  {stats['mean_candidates']:9.1f} candidates/query "
+            f"({stats['candidate_fraction']:6.2%})  {elapsed / len(queries) * 1000:8.2f}ms/query  "
+            f"{timings['scan'] / elapsed:6.1f}x vs scan"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Compares the token-dictionary NameNormalizer, with and without its memo,
+against the original re.sub rule chain on a stream of names with realistic
+repetition, then shows how each scales as the dictionary grows.
+
+Usage:
+    python benchmarks/bench_normalization.py
+    python benchmarks/bench_normalization.py --names 500000 --distinct 20000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+from normalization_logic import NameNormalizer
+
+# The original rule chain and the same rules expressed as a dictionary
+LEGACY_RULES = [
+    (r"[^A-Z0-9\s&]", ""),
+    (r"\b(PRIVATE|PVT|PTE)\s+(LIMITED|LTD)\b", "PVT LTD"),
+    (r"\bPTE\b", "PVT"),
+    (r"\bLIMITED$", "LTD"),
+    (r"\bCORPORATION\b", "CORP"),
+    (r"\bINCORPORATED\b", "INC"),
+    (r"\bCOMPANY$", "CO"),
+    (r"\bDEPARTMENT\b", "DEPT"),
+    (r"\bBROTHERS$", "BROS"),
+    (r"\bAND\b", "&"),
+    (r"\s+", " "),
+]
+LEGACY_ABBREVIATIONS = {
+    "version": "1",
+    "phrases": [{"match": [["PRIVATE", "PVT", "PTE"], ["LIMITED", "LTD"]], "replace": "PVT LTD"}],
+    "anywhere": {
+        "PTE": "PVT", "CORPORATION": "CORP", "INCORPORATED": "INC", "DEPARTMENT": "DEPT", "AND": "&",
+    },
+    "at_end": {"LIMITED": "LTD", "COMPANY": "CO", "BROTHERS": "BROS"},
+}
+
+WORDS = [
+    "Global", "Trading", "Shipping", "Petroleum", "Bank", "National", "Al", "Noor",
+    "Holdings", "Investment", "Sea", "Star", "Blue", "Lagoon", "Industrial", "Group",
+]
+SUFFIXES = ["Ltd.", "Private Limited", "Pte Ltd", "Corporation", "Company", "Inc.", "and Sons", ""]
+
+
+def legacy_normalize(name, rules=LEGACY_RULES):
+    """
+    The uncompiled rule chain this benchmark measures against; the tests check
+    NameNormalizer(LEGACY_ABBREVIATIONS) against it.
+    """
+    if not name:
+        return None
+    norm = name.upper().strip()
+    for pattern, replacement in rules:
+        norm = re.sub(pattern, replacement, norm)
+    return norm.strip()
+
+
+def grow_dictionary(extra_entries):
+    """Returns the legacy rules and dictionary with extra_entries made-up abbreviations added."""
+    extra = {f"TERM{i}": f"T{i}" for i in range(extra_entries)}
+    rules = LEGACY_RULES[:-1] + [(rf"\b{word}\b", abbr) for word, abbr in extra.items()] + LEGACY_RULES[-1:]
+    abbreviations = dict(LEGACY_ABBREVIATIONS, anywhere={**LEGACY_ABBREVIATIONS["anywhere"], **extra})
+    return rules, abbreviations
+
+
+def build_names(num_names, num_distinct, seed=0):
+    """Draws num_names names from num_distinct, skewed so common names repeat."""
+    rng = random.Random(seed)
+    distinct = [
+        " ".join(rng.sample(WORDS, rng.randint(1, 4))) + " " + rng.choice(SUFFIXES)
+        for _ in range(num_distinct)
+    ]
+    weights = [1.0 / (rank + 1) for rank in range(num_distinct)]
+    return rng.choices(distinct, weights=weights, k=num_names)
+
+
+def _time(label, fn, names, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(names)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<26} {best:8.3f}s  {len(names) / best:12.0f} names/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark name normalization strategies.")
+    parser.add_argument("--names", type=int, default=200000, help="Names to normalize per run.")
+    parser.add_argument("--distinct", type=int, default=20000, help="Distinct names in the stream.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per strategy; the best is reported.")
+    parser.add_argument("--dictionary_sizes", type=int, nargs="*", default=[0, 100, 400],
+                        help="Extra dictionary entries to measure scaling with.")
+    args = parser.parse_args()
+
+    names = build_names(args.names, args.distinct)
+
+    legacy = _time("re.sub chain (previous)", lambda ns: [legacy_normalize(n) for n in ns], names, args.repeat)
+    uncached = NameNormalizer(LEGACY_ABBREVIATIONS, cache_size=0)
+    compiled = _time("token dictionary, no memo", uncached.normalize_many, names, args.repeat)
+
+    normalizer = NameNormalizer(LEGACY_ABBREVIATIONS)
+    # A fresh memo per run, so the timing includes the cold misses
+    def memoized(ns):
+        normalizer.clear_cache()
+        return normalizer.normalize_many(ns)
+
+    cached = _time("token dictionary + memo", memoized, names, args.repeat)
+    print(f"Memo hit rate: {normalizer.cache_info()['hit_rate']:.1%}")
+    assert normalizer.normalize_many(names) == [legacy_normalize(n) for n in names]
+
+    print(f"Speedup (no memo): {legacy / compiled:.2f}x")
+    print(f"Speedup (memoized): {legacy / cached:.2f}x")
+
+    print("\nScaling with dictionary size (no memo):")
+    for size in args.dictionary_sizes:
+        rules, abbreviations = grow_dictionary(size)
+        label = f"{len(rules):>4} rules"
+        _time(f"re.sub chain, {label}", lambda ns: [legacy_normalize(n, rules) for n in ns], names, 1)
+        _time(f"dictionary,   {label}", NameNormalizer(abbreviations, cache_size=0).normalize_many, names, 1)
+
+
+if __name__ == "__main__":
+    main()
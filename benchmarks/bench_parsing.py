@@ -0,0 +1,151 @@
+"""
+Compares the single-walk document parser against the previous four-pass
+implementation on the same input.
+
+Usage:
+    python benchmarks/bench_parsing.py --input_file sdn_advanced.xml
+    python benchmarks/bench_parsing.py --synthetic_parties 20000
+"""
+import argparse
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+import sdn_parser
+from sdn_parser import ns
+from normalization_logic import normalize_name
+
+NAMESPACE = ns["ns"]
+
+
+def _legacy_parse(root):
+    """The four-pass implementation this benchmark measures against."""
+    country_map = sdn_parser._parse_countries(root)
+    location_map = sdn_parser._parse_locations(root, country_map)
+    profile_programs = sdn_parser._parse_sanctions_programs(root)
+
+    records = []
+    for elem in root.findall(".//ns:DistinctParty", ns):
+        entity_id = elem.attrib.get("FixedRef")
+        profile = elem.find("ns:Profile", ns)
+        if profile is None or not entity_id:
+            continue
+
+        aliases = []
+        identity = profile.find("ns:Identity", ns)
+        if identity is not None:
+            for alias in identity.findall(".//ns:Alias", ns):
+                full_name_parts = []
+                doc_name = alias.find(".//ns:DocumentedName", ns)
+                if doc_name is not None:
+                    for part in doc_name.findall(".//ns:DocumentedNamePart", ns):
+                        val = part.find(".//ns:NamePartValue", ns)
+                        if val is not None and val.text:
+                            full_name_parts.append(val.text.strip())
+                full_name = " ".join(full_name_parts)
+                if full_name:
+                    aliases.append(
+                        {
+                            "full_name": full_name,
+                            "normalized_name": normalize_name(full_name),
+                            "is_primary": alias.attrib.get("Primary") == "true",
+                            "type_id": alias.attrib.get("AliasTypeID"),
+                        }
+                    )
+
+        entity_addresses = []
+        for feature in profile.findall("ns:Feature", ns):
+            if feature.attrib.get("FeatureTypeID") == "25":
+                ver_loc = feature.find(".//ns:VersionLocation", ns)
+                if ver_loc is not None:
+                    loc_id = ver_loc.attrib.get("LocationID")
+                    if loc_id in location_map:
+                        entity_addresses.append(location_map[loc_id])
+
+        records.append(
+            {
+                "entity_id": int(entity_id),
+                "names": aliases,
+                "programs": profile_programs.get(profile.attrib.get("ID"), []),
+                "addresses": entity_addresses,
+            }
+        )
+    return records
+
+
+def build_synthetic_document(num_parties):
+    """Generates an SDN-shaped document with the given number of parties."""
+    parts = [f'<?xml version="1.0" encoding="utf-8"?>\n<Sanctions xmlns="{NAMESPACE}">']
+    parts.append("<ReferenceValueSets><CountryValues>")
+    for c in range(200):
+        parts.append(f'<Country ID="{c}" ISO2="C{c % 10}">Country {c}</Country>')
+    parts.append("</CountryValues></ReferenceValueSets><Locations>")
+    for loc in range(num_parties // 2):
+        parts.append(
+            f'<Location ID="{loc}"><LocationCountry CountryID="{loc % 200}"/>'
+            f'<LocationPart LocPartTypeID="1451"><LocationPartValue><Value>{loc} Main Street</Value>'
+            f'</LocationPartValue></LocationPart><LocationPart LocPartTypeID="1454">'
+            f"<LocationPartValue><Value>City {loc % 97}</Value></LocationPartValue></LocationPart></Location>"
+        )
+    parts.append("</Locations><DistinctParties>")
+    for i in range(num_parties):
+        aliases = "".join(
+            f'<Alias AliasTypeID="1400" Primary="{"true" if a == 0 else "false"}"><DocumentedName>'
+            f"<DocumentedNamePart><NamePartValue>Party {i} Trading Company</NamePartValue></DocumentedNamePart>"
+            f"<DocumentedNamePart><NamePartValue>Alias {a} Limited</NamePartValue></DocumentedNamePart>"
+            f"</DocumentedName></Alias>"
+            for a in range(3)
+        )
+        parts.append(
+            f'<DistinctParty FixedRef="{i}"><Comment/><Profile ID="{i}" PartySubTypeID="{i % 4 + 1}">'
+            f"<Identity>{aliases}</Identity>"
+            f'<Feature FeatureTypeID="25"><FeatureVersion><VersionLocation LocationID="{i // 2}"/>'
+            f"</FeatureVersion></Feature></Profile></DistinctParty>"
+        )
+    parts.append("</DistinctParties><SanctionsEntries>")
+    for i in range(num_parties):
+        parts.append(
+            f'<SanctionsEntry ProfileID="{i}"><SanctionsMeasure><Comment>PROGRAM{i % 30}</Comment>'
+            f"</SanctionsMeasure></SanctionsEntry>"
+        )
+    parts.append("</SanctionsEntries></Sanctions>")
+    return "".join(parts).encode("utf-8")
+
+
+def _time(label, fn, root, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = fn(root)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<22} {best:8.3f}s  {len(records) / best:10.0f} entities/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SDN XML parsing strategies.")
+    parser.add_argument("--input_file", help="SDN Advanced XML file to parse.")
+    parser.add_argument("--synthetic_parties", type=int, default=20000,
+                        help="Number of parties in the generated document when no input file is given.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per strategy; the best is reported.")
+    args = parser.parse_args()
+
+    if args.input_file:
+        with open(args.input_file, "rb") as f:
+            data = f.read()
+    else:
+        data = build_synthetic_document(args.synthetic_parties)
+
+    root = ET.fromstring(data)
+    print(f"Input: {len(data) / 1e6:.1f} MB")
+
+    legacy = _time("four-pass (previous)", _legacy_parse, root, args.repeat)
+    single = _time("single walk", sdn_parser.parse_sanctions_document, root, args.repeat)
+    print(f"Speedup: {legacy / single:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Measures search throughput against a local stand-in for the BigQuery REST API,
+comparing the per-call client of search_bq.search_data with a SearchService
+sharing one pooled client across concurrent searches.
+
+The stand-in answers jobs.insert and jobs.getQueryResults over HTTP, holding each
+query for --latency_ms to simulate job execution, so the real client library,
+HTTP session and connection pool are exercised.
+
+Usage:
+    python benchmarks/bench_search_service.py
+    python benchmarks/bench_search_service.py --searches 200 --latency_ms 300 --concurrency 1 8 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+import search_bq
+from search_service import SearchService
+
+RESULT_SCHEMA = {
+    "fields": [
+        {"name": "entity_id", "type": "INTEGER", "mode": "NULLABLE"},
+        {"name": "match_type", "type": "STRING", "mode": "NULLABLE"},
+        {"name": "distance", "type": "INTEGER", "mode": "NULLABLE"},
+        {"name": "matched_name", "type": "STRING", "mode": "NULLABLE"},
+    ]
+}
+
+
+def start_stand_in(latency):
+    """Starts the stand-in API on a free local port and returns its endpoint."""
+
+    completed = set()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; don't let Nagle hold the body back
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            # jobs.insert: accept the job and echo its reference
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            self._reply(
+                {
+                    "jobReference": dict(request.get("jobReference", {}), location="US"),
+                    "configuration": request.get("configuration", {}),
+                    "status": {"state": "RUNNING"},
+                }
+            )
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            results = re.search(r"/queries/([^/]+)$", path)
+            if results is None:
+                # jobs.get
+                self._reply(
+                    {
+                        "jobReference": {"projectId": "bench", "jobId": path.rsplit("/", 1)[-1], "location": "US"},
+                        "configuration": {"query": {}},
+                        "status": {"state": "DONE"},
+                    }
+                )
+                return
+            # jobs.getQueryResults: the first call for a job waits out the simulated run time
+            job_id = results.group(1)
+            with lock:
+                first_call = job_id not in completed
+                completed.add(job_id)
+            if first_call:
+                time.sleep(latency)
+            self._reply(
+                {
+                    "jobReference": {"projectId": "bench", "jobId": job_id, "location": "US"},
+                    "jobComplete": True,
+                    "totalRows": "1",
+                    "schema": RESULT_SCHEMA,
+                    "rows": [{"f": [{"v": "36"}, {"v": "FUZZY"}, {"v": "1"}, {"v": "AEROCARIBBEAN AIRLINES"}]}],
+                }
+            )
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def _client(endpoint, pool_size=None):
+    import requests
+    from google.auth.credentials import AnonymousCredentials
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud import bigquery
+
+    session = None
+    if pool_size:
+        session = AuthorizedSession(AnonymousCredentials())
+        session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+    return bigquery.Client(
+        project="bench",
+        credentials=AnonymousCredentials(),
+        client_options={"api_endpoint": endpoint},
+        _http=session,
+    )
+
+
+def _report(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{label:<30} {len(latencies) / elapsed:8.1f} searches/s  p50 {p50:7.1f}ms  p95 {p95:7.1f}ms")
+
+
+def bench_per_call_client(endpoint, terms):
+    """What search_data does: a new client and a blocking query per search."""
+    latencies = []
+    start = time.perf_counter()
+    for term in terms:
+        begin = time.perf_counter()
+        client = _client(endpoint)
+        search_bq.ranked_search("bench", "sanctions_data", "sdn_entities", term, 2, client=client)
+        client.close()
+        latencies.append(time.perf_counter() - begin)
+    _report("per-call client, sequential", latencies, time.perf_counter() - start)
+
+
+def bench_service(endpoint, terms, concurrency):
+    service = SearchService("bench", max_concurrency=concurrency, client=_client(endpoint, concurrency))
+    latencies = []
+
+    async def timed(term):
+        begin = time.perf_counter()
+        await service.search(term)
+        latencies.append(time.perf_counter() - begin)
+
+    async def main():
+        await asyncio.gather(*(timed(term) for term in terms))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    service.close()
+    # Queueing for a slot counts towards latency, as it would for a caller
+    _report(f"SearchService, {concurrency:>3} concurrent", latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SearchService against a BigQuery stand-in.")
+    parser.add_argument("--searches", type=int, default=100, help="Searches per run.")
+    parser.add_argument("--latency_ms", type=float, default=200, help="Simulated run time of each query job.")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 8, 32],
+                        help="SearchService concurrency limits to measure.")
+    args = parser.parse_args()
+
+    endpoint = start_stand_in(args.latency_ms / 1000)
+    terms = [f"Aero Caribbean {i}" for i in range(args.searches)]
+    print(f"{args.searches} searches, {args.latency_ms:.0f}ms simulated job time")
+
+    bench_per_call_client(endpoint, terms)
+    for concurrency in args.concurrency:
+        bench_service(endpoint, terms, concurrency)
+
+
+if __name__ == "__main__":
+    main()
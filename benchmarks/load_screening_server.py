@@ -0,0 +1,137 @@
+"""
+Load generator for screening_server.py. Drives concurrent single-name /screen
+requests for a fixed time and reports throughput, latency percentiles and how
+the server batched them.
+
+Without --url a server is started in-process on a synthetic snapshot (or
+--snapshot). --job_ms makes each batch wait as long as a BigQuery job would, to
+show what micro-batching saves; --max_batch_size 1 turns batching off.
+
+Usage:
+    python benchmarks/load_screening_server.py --clients 200 --job_ms 300
+    python benchmarks/load_screening_server.py --clients 200 --job_ms 300 --max_batch_size 1
+    python benchmarks/load_screening_server.py --url http://127.0.0.1:8080 --clients 50
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+sys.path.append(os.path.dirname(__file__))
+import screening_server
+import sdn_parser
+from bench_parsing import build_synthetic_document
+from local_search import LocalSearchIndex
+
+
+def _start_server(args):
+    if args.snapshot:
+        index = LocalSearchIndex.from_jsonl(args.snapshot)
+    else:
+        root = ET.fromstring(build_synthetic_document(args.synthetic_parties))
+        index = LocalSearchIndex(sdn_parser.parse_sanctions_document(root))
+    backend = screening_server.LocalIndexBackend(index)
+
+    def process_batch(requests):
+        # Stands in for the fixed cost of one query job per batch
+        time.sleep(args.job_ms / 1000)
+        return backend(requests)
+
+    batcher = screening_server.MicroBatcher(process_batch, args.max_batch_size, args.max_wait_ms)
+    server = screening_server.make_server(batcher, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server, batcher
+
+
+def _client_loop(url, names, deadline, latencies, errors):
+    parsed = urlparse(url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+    rng = random.Random()
+    while time.monotonic() < deadline:
+        body = json.dumps({"name": rng.choice(names)})
+        start = time.perf_counter()
+        try:
+            connection.request("POST", "/screen", body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate screening load and report latency percentiles.")
+    parser.add_argument("--url", help="Server to load. Omit to start one in-process.")
+    parser.add_argument("--clients", type=int, default=100, help="Concurrent clients.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run.")
+    parser.add_argument("--snapshot", nargs="+", help="JSONL snapshot for the in-process server.")
+    parser.add_argument("--synthetic_parties", type=int, default=5000,
+                        help="Size of the generated snapshot when no --snapshot is given.")
+    parser.add_argument("--job_ms", type=float, default=0, help="Simulated query job time per batch.")
+    parser.add_argument("--max_batch_size", type=int, default=100)
+    parser.add_argument("--max_wait_ms", type=float, default=10)
+    args = parser.parse_args()
+
+    server = batcher = None
+    url = args.url
+    if url is None:
+        url, server, batcher = _start_server(args)
+
+    names = [f"Party {i} Trading Company" for i in range(0, args.synthetic_parties, 7)]
+    names += [f"Partie {i} Tradin Co" for i in range(0, args.synthetic_parties, 11)]
+    latencies, errors = [], []
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=_client_loop, args=(url, names, deadline, latencies, errors))
+        for _ in range(args.clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{args.clients} clients for {elapsed:.1f}s against {url}")
+    print(f"Requests: {len(latencies)} ok, {len(errors)} failed")
+    if errors:
+        print(f"First errors: {errors[:3]}")
+    if latencies:
+        print(f"Throughput: {len(latencies) / elapsed:.1f} requests/s")
+        print(
+            "Latency: "
+            + "  ".join(
+                f"p{int(q * 100)} {_percentile(latencies, q) * 1000:.1f}ms" for q in (0.5, 0.95, 0.99)
+            )
+        )
+
+    parsed = urlparse(url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=10)
+    connection.request("GET", "/stats")
+    print(f"Server batching: {json.loads(connection.getresponse().read())}")
+
+    if server is not None:
+        server.shutdown()
+        batcher.close()
+
+
+if __name__ == "__main__":
+    main()
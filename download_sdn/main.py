@@ -5,6 +5,8 @@ import googleapiclient.discovery
 import os
 import logging
 import datetime
+import gzip
+import hashlib
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,14 +15,25 @@ logging.basicConfig(level=logging.INFO)
 def download_sdn_list(request):
     """
     Downloads the OFAC SDN Advanced XML file, uploads to GCS, and triggers Dataflow.
+
+    The download is conditional on the ETag/Last-Modified stored with the last
+    snapshot, and the content digest is compared with the snapshot's, so nothing
+    is uploaded or launched when the list has not changed. Pass ?force=true to
+    skip both checks.
     """
     # Configuration
     source_url = "https://sanctionslistservice.ofac.treas.gov/api/publicationpreview/exports/sdn_advanced.xml"
     bucket_name = os.environ.get("BUCKET_NAME")
     project_id = os.environ.get("PROJECT_ID")
     region = os.environ.get("REGION")
-    
-    destination_blob_name = "sdn_advanced.xml"
+    storage_format = os.environ.get("STORAGE_FORMAT", "xml").lower()
+    # Resumable upload chunks must be a multiple of 256 KB, which whole MBs always are
+    upload_chunk_size = int(os.environ.get("UPLOAD_CHUNK_SIZE_MB", "16")) * 1024 * 1024
+
+    compress = storage_format == "gzip"
+    destination_blob_name = "sdn_advanced.xml.gz" if compress else "sdn_advanced.xml"
+    # Uploads land here first so an unchanged download never replaces the snapshot
+    incoming_blob_name = f"{destination_blob_name}.incoming"
 
     if not all([bucket_name, project_id, region]):
         logging.error("Missing configuration environment variables.")
@@ -28,29 +41,78 @@ def download_sdn_list(request):
 
     logging.info(f"Starting download from {source_url} to gs://{bucket_name}/{destination_blob_name}")
 
+    force = request.args.get("force", "").lower() == "true"
+
     try:
-        # 1. Download and Upload
         storage_client = storage.Client()
         bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(destination_blob_name)
 
-        with requests.get(source_url, stream=True) as r:
+        # 1. Conditional request against the last snapshot we stored
+        previous = bucket.get_blob(destination_blob_name)
+        previous_metadata = (previous.metadata or {}) if previous is not None and not force else {}
+        headers = {}
+        if previous_metadata.get("source_etag"):
+            headers["If-None-Match"] = previous_metadata["source_etag"]
+        if previous_metadata.get("source_last_modified"):
+            headers["If-Modified-Since"] = previous_metadata["source_last_modified"]
+
+        with requests.get(source_url, headers=headers, stream=True) as r:
+            if r.status_code == 304:
+                logging.info("SDN list not modified since the last snapshot. Nothing to do.")
+                return "SDN list unchanged; no job triggered.", 200
             r.raise_for_status()
-            
-            tmp_file_path = "/tmp/sdn_advanced.xml"
-            with open(tmp_file_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            logging.info("Download to local temp complete. Uploading to GCS...")
-            blob.upload_from_filename(tmp_file_path)
-            os.remove(tmp_file_path)
-            logging.info("Upload complete.")
-
-        # 2. Trigger Dataflow
+
+            source_metadata = {
+                key: value
+                for key, value in (
+                    ("source_etag", r.headers.get("ETag")),
+                    ("source_last_modified", r.headers.get("Last-Modified")),
+                )
+                if value
+            }
+
+            # 2. Stream the body into a resumable upload, hashing the content as it arrives
+            digest = hashlib.sha256()
+            incoming = bucket.blob(incoming_blob_name)
+            with incoming.open(
+                "wb",
+                chunk_size=upload_chunk_size,
+                content_type="application/gzip" if compress else "application/xml",
+                ignore_flush=True,
+            ) as upload:
+                sink = gzip.GzipFile(fileobj=upload, mode="wb") if compress else upload
+                for chunk in r.iter_content(chunk_size=1024 * 1024):
+                    digest.update(chunk)
+                    sink.write(chunk)
+                if compress:
+                    sink.close()
+
+        sha256 = digest.hexdigest()
+        snapshot_metadata = {**source_metadata, "sha256": sha256}
+
+        # 3. Skip the job if the content is the same as last time
+        if previous_metadata.get("sha256") == sha256:
+            incoming.delete()
+            previous.metadata = {**previous_metadata, **snapshot_metadata}
+            previous.patch()
+            logging.info(f"SDN list content unchanged (sha256 {sha256}). Nothing to do.")
+            return "SDN list unchanged; no job triggered.", 200
+
+        # Same-bucket copies are done server side, so this does not re-send the data.
+        # The copy carries no digest or ETag yet, so until a job is launched for it
+        # the next run downloads and launches again instead of skipping.
+        blob = bucket.copy_blob(incoming, bucket, destination_blob_name)
+        incoming.delete()
+        logging.info(f"Upload complete (sha256 {sha256}).")
+
+        # 4. Trigger Dataflow
         logging.info("Triggering Dataflow Flex Template...")
         launch_dataflow_job(project_id, region, bucket_name, destination_blob_name)
 
+        # 5. Only a launched snapshot is recorded as processed
+        blob.metadata = snapshot_metadata
+        blob.patch()
+
         return f"Successfully processed and triggered job.", 200
 
     except Exception as e:
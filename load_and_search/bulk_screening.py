@@ -0,0 +1,475 @@
+import argparse
+import csv
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from edit_distance import bounded_levenshtein
+from local_search import _word_regex, contains_word, read_snapshot
+from normalization_logic import normalize_many
+from search_filters import FILTER_FIELDS, filter_values, search_filters
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_NGRAM_SIZE = 3
+# Aliases kept per name by cosine similarity, before the re-ranking rules
+DEFAULT_CANDIDATES = 20
+# Names scored together; the dense score block is chunk_size x aliases float64s
+DEFAULT_CHUNK_SIZE = 128
+# N-grams in more than this share of aliases are left out of the names' vectors
+DEFAULT_MAX_DF = 0.02
+
+
+def char_ngrams(text, n=DEFAULT_NGRAM_SIZE):
+    """Returns the character n-grams of text, padded with a space at both ends."""
+    padded = f" {text} "
+    return [padded[i:i + n] for i in range(max(1, len(padded) - n + 1))]
+
+
+class BulkScreener:
+    """
+    Screens many names against every alias of a snapshot at once.
+
+    Both sides are normalized with normalize_name and turned into L2-normalized
+    TF-IDF vectors over character n-grams. The alias matrix is stored by n-gram
+    (one posting list per column), so a chunk of names is scored against every
+    alias by expanding the postings of their n-grams and summing with bincount;
+    this is the sparse product of the chunk with the transposed alias matrix.
+    The candidates best by cosine similarity are then re-ranked with the
+    search rules: 0 for a whole-word match, otherwise the edit distance if it
+    is within threshold. Other candidates are dropped.
+
+    Expanding the postings of n-grams shared by many aliases dominates the cost
+    while adding little to the ranking, as their IDF is low, so a name's vector
+    leaves out n-grams in more than max_df of the aliases (unless that would
+    leave nothing).
+
+    screen_chunk takes the filters of search_filters.search_filters as keyword
+    arguments; aliases of entities failing them are masked out of the scores,
+    so they are never candidates.
+    """
+
+    def __init__(self, records, ngram_size=DEFAULT_NGRAM_SIZE, candidates=DEFAULT_CANDIDATES,
+                 max_df=DEFAULT_MAX_DF):
+        if candidates < 1:
+            raise ValueError(f"candidates must be at least 1, got {candidates}")
+        self.ngram_size = ngram_size
+        self.candidates = candidates
+        self.max_df = max_df
+        self.entity_ids = []
+        self.full_names = []
+        self.upper_full_names = []
+        self.normalized_names = []
+        alias_entities = []
+        # filter -> value -> the positions of the entities with that value
+        filter_positions = {name: {} for name in FILTER_FIELDS}
+        for record in records:
+            position = len(self.entity_ids)
+            self.entity_ids.append(record["entity_id"])
+            for name, values in filter_values(record).items():
+                for value in values:
+                    filter_positions[name].setdefault(value, []).append(position)
+            for name in record.get("names") or []:
+                if name.get("normalized_name") is None:
+                    continue
+                full_name = name.get("full_name") or ""
+                self.full_names.append(full_name)
+                # Non-ASCII names keep the case-insensitive regex, whose case folding differs from upper()
+                self.upper_full_names.append(full_name.upper() if full_name.isascii() else None)
+                self.normalized_names.append(name["normalized_name"])
+                alias_entities.append(position)
+        self.alias_entities = np.array(alias_entities, dtype=np.int64)
+        self._filter_positions = {
+            name: {value: np.array(positions, dtype=np.int64) for value, positions in by_value.items()}
+            for name, by_value in filter_positions.items()
+        }
+
+        # Term frequencies per alias, and document frequencies per n-gram
+        self.vocabulary = {}
+        alias_grams = []
+        document_frequency = []
+        for normalized in self.normalized_names:
+            counts = {}
+            for gram in char_ngrams(normalized, ngram_size):
+                column = self.vocabulary.get(gram)
+                if column is None:
+                    column = self.vocabulary[gram] = len(self.vocabulary)
+                    document_frequency.append(0)
+                counts[column] = counts.get(column, 0) + 1
+            for column in counts:
+                document_frequency[column] += 1
+            alias_grams.append(counts)
+        aliases = len(self.normalized_names)
+        self.idf = np.array(
+            [math.log((1 + aliases) / (1 + df)) + 1 for df in document_frequency], dtype=np.float64
+        )
+        self._common = np.array(document_frequency, dtype=np.int64) > max_df * aliases
+
+        # The alias matrix by column: the aliases holding each n-gram, and their weights
+        columns, rows, weights = [], [], []
+        for alias, counts in enumerate(alias_grams):
+            alias_columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * self.idf[alias_columns]
+            columns.append(alias_columns)
+            rows.append(np.full(len(counts), alias, dtype=np.int64))
+            weights.append(values / np.linalg.norm(values))
+        columns = np.concatenate(columns) if columns else np.zeros(0, dtype=np.int64)
+        order = np.argsort(columns, kind="stable")
+        self._posting_aliases = np.concatenate(rows)[order] if rows else np.zeros(0, dtype=np.int64)
+        self._posting_weights = np.concatenate(weights)[order] if weights else np.zeros(0)
+        self._posting_starts = np.searchsorted(columns[order], np.arange(len(self.vocabulary) + 1))
+
+    @classmethod
+    def from_jsonl(cls, paths, **kwargs):
+        return cls(read_snapshot(paths), **kwargs)
+
+    def _vectorize(self, normalized_term):
+        """Returns the columns and weights of the term's n-grams that occur in some alias."""
+        counts = {}
+        for gram in char_ngrams(normalized_term, self.ngram_size):
+            column = self.vocabulary.get(gram)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * self.idf[columns]
+        rare = ~self._common[columns]
+        if rare.any():
+            columns, values = columns[rare], values[rare]
+        norm = np.linalg.norm(values)
+        return columns, values / norm if norm else values
+
+    def _alias_mask(self, filters):
+        """
+        Returns a boolean mask of the aliases whose entity passes the filters, or
+        None if no filter is given and every alias passes.
+        """
+        filters = search_filters(**filters)
+        if not filters:
+            return None
+        allowed = np.ones(len(self.entity_ids), dtype=bool)
+        for name, values in filters.items():
+            passes = np.zeros(len(self.entity_ids), dtype=bool)
+            for value in values:
+                positions = self._filter_positions[name].get(value)
+                if positions is not None:
+                    passes[positions] = True
+            allowed &= passes
+        return allowed[self.alias_entities]
+
+    def top_candidates(self, normalized_terms, alias_mask=None):
+        """
+        Returns, for each term, the indexes and cosine similarities of the aliases
+        most similar to it, at most self.candidates of them, best first. With
+        alias_mask, only the aliases it marks can be returned.
+        """
+        aliases = len(self.normalized_names)
+        row_ids, columns, weights = [], [], []
+        for row, term in enumerate(normalized_terms):
+            if term:
+                term_columns, term_weights = self._vectorize(term)
+                row_ids.append(np.full(len(term_columns), row, dtype=np.int64))
+                columns.append(term_columns)
+                weights.append(term_weights)
+        if not columns or not aliases:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0))] * len(normalized_terms)
+        row_ids, columns, weights = np.concatenate(row_ids), np.concatenate(columns), np.concatenate(weights)
+
+        # Expand each (row, n-gram) into the n-gram's posting list
+        starts = self._posting_starts[columns]
+        lengths = self._posting_starts[columns + 1] - starts
+        total = int(lengths.sum())
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        flat = np.repeat(row_ids, lengths) * aliases + self._posting_aliases[offsets]
+        products = np.repeat(weights, lengths) * self._posting_weights[offsets]
+        scores = np.bincount(flat, weights=products, minlength=len(normalized_terms) * aliases)
+        scores = scores.reshape(len(normalized_terms), aliases)
+        if alias_mask is not None:
+            scores[:, ~alias_mask] = 0
+
+        k = min(self.candidates, aliases)
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        out = []
+        for row in range(len(normalized_terms)):
+            similarities = scores[row, best[row]]
+            order = np.argsort(-similarities, kind="stable")
+            keep = similarities[order] > 0
+            out.append((best[row][order][keep], similarities[order][keep]))
+        return out
+
+    def screen_chunk(self, names, threshold=2, top_k=5, **filters):
+        """
+        Screens a list of (input_id, name) pairs against the entities passing the
+        filters. Returns one result per name, in order, shaped like
+        search_bq.screen_batch's, with each match's similarity.
+        """
+        normalized_terms = normalize_many(name for _, name in names)
+        results = []
+        for (input_id, name), normalized_term, (aliases, similarities) in zip(
+            names, normalized_terms, self.top_candidates(normalized_terms, self._alias_mask(filters))
+        ):
+            best = {}
+            if normalized_term:
+                # Names are literals here, as in search_bq.screen_batch
+                upper_name = name.upper()
+                full_name_pattern = None
+                for alias, similarity in zip(aliases.tolist(), similarities.tolist()):
+                    upper_full_name = self.upper_full_names[alias]
+                    if upper_full_name is not None:
+                        word_match = contains_word(upper_full_name, upper_name)
+                    else:
+                        if full_name_pattern is None:
+                            full_name_pattern = _word_regex(re.escape(upper_name), re.IGNORECASE)
+                        word_match = full_name_pattern.search(self.full_names[alias]) is not None
+                    if word_match or contains_word(self.normalized_names[alias], normalized_term):
+                        score = 0
+                    else:
+                        score = bounded_levenshtein(self.normalized_names[alias], normalized_term, threshold)
+                        if score > threshold:
+                            continue
+                    position = int(self.alias_entities[alias])
+                    if position not in best or (score, -similarity) < best[position][:2]:
+                        best[position] = (score, -similarity, alias)
+            ranked = sorted(best.items(), key=lambda item: (item[1][0], item[1][1], self.entity_ids[item[0]]))
+            results.append(
+                {
+                    "input_id": input_id,
+                    "search_term": name,
+                    "normalized_term": normalized_term,
+                    "matches": [
+                        {
+                            "entity_id": self.entity_ids[position],
+                            "score": score,
+                            "matched_name": self.normalized_names[alias],
+                            "similarity": round(-negative_similarity, 4),
+                        }
+                        for position, (score, negative_similarity, alias) in ranked[:top_k]
+                    ],
+                }
+            )
+        return results
+
+
+_worker_screener = None
+
+
+def _init_worker(screener):
+    global _worker_screener
+    _worker_screener = screener
+
+
+def _screen_in_worker(names, threshold, top_k, filters):
+    return _worker_screener.screen_chunk(names, threshold, top_k, **filters)
+
+
+def _process_pool(screener, workers):
+    """
+    Starts worker processes that each hold the screener. Where fork is available
+    the workers inherit it, sharing its pages copy-on-write instead of each
+    unpickling a copy.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        _init_worker(screener)
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(screener,))
+
+
+def _chunks(names, chunk_size):
+    chunk = []
+    for item in names:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def screen_bulk(screener, names, threshold=2, top_k=5, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, **filters):
+    """
+    Screens an iterable of (input_id, name) pairs on a pool of worker processes
+    and yields the results in input order. Only a few chunks per worker are in
+    flight at once, so memory stays bounded however many names there are.
+    screener is a BulkScreener or anything else with the same screen_chunk,
+    such as a LocalSearchIndex; filters are passed on to it.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in _chunks(names, chunk_size):
+            yield from screener.screen_chunk(chunk, threshold, top_k, **filters)
+        return
+    with _process_pool(screener, workers) as pool:
+        pending = deque()
+        for chunk in _chunks(names, chunk_size):
+            pending.append(pool.submit(_screen_in_worker, chunk, threshold, top_k, filters))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+CSV_FIELDS = ["input_id", "search_term", "normalized_term", "rank", "entity_id", "score", "matched_name"]
+
+
+class _ResultWriter:
+    """Writes results as JSONL, one line per name, or as CSV, one row per match."""
+
+    def __init__(self, f, as_csv):
+        self.f = f
+        self.csv = csv.DictWriter(f, CSV_FIELDS, extrasaction="ignore") if as_csv else None
+
+    def write_header(self):
+        if self.csv is not None:
+            self.csv.writeheader()
+
+    def write(self, result):
+        if self.csv is None:
+            self.f.write(json.dumps(result) + "\n")
+            return
+        for rank, match in enumerate(result["matches"], 1):
+            self.csv.writerow(dict(result, rank=rank, **match))
+
+
+def _load_checkpoint(path, input_file, settings):
+    """
+    Returns the checkpoint at path, or None if there is none. A checkpoint for
+    another input file, or screened with other settings (engine, threshold,
+    top_k, filters), is refused, as resuming would mix results in one file.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input_file") != os.path.abspath(input_file):
+        raise ValueError(f"Checkpoint '{path}' belongs to '{checkpoint.get('input_file')}'; use --restart.")
+    for name, value in settings.items():
+        if checkpoint.get(name) != value:
+            raise ValueError(f"Checkpoint '{path}' was screened with {name} {checkpoint.get(name)}; use --restart.")
+    return checkpoint
+
+
+def _save_checkpoint(path, checkpoint):
+    # Written aside and renamed, so a crash never leaves a partial checkpoint
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def screen_file(screener, input_file, output_file, threshold=2, top_k=5, name_column="name", id_column=None,
+                chunk_size=DEFAULT_CHUNK_SIZE, workers=None, checkpoint_every=10000, checkpoint_path=None,
+                restart=False, **filters):
+    """
+    Streams the names of input_file through screen_bulk into output_file (CSV if
+    it ends in .csv, JSONL otherwise). Every checkpoint_every rows the output is
+    flushed to disk and the rows done and output size are recorded at
+    checkpoint_path. A later call with the same files, screener type,
+    threshold, top_k and filters resumes from the last checkpoint: the output
+    is cut back to that point and the rows already screened are skipped.
+    Returns (rows screened in this call, rows flagged).
+    """
+    from search_bq import iter_names
+
+    settings = {
+        "engine": type(screener).__name__,
+        "threshold": threshold,
+        "top_k": top_k,
+        "filters": search_filters(**filters),
+    }
+    checkpoint_path = checkpoint_path or output_file + ".checkpoint"
+    checkpoint = None if restart else _load_checkpoint(checkpoint_path, input_file, settings)
+    if checkpoint is None:
+        checkpoint = {"input_file": os.path.abspath(input_file), **settings, "rows_done": 0, "flagged": 0,
+                      "output_bytes": 0}
+        open(output_file, "w").close()
+    else:
+        # Drop anything written after the checkpoint; those rows are screened again
+        os.truncate(output_file, checkpoint["output_bytes"])
+        logging.info(f"Resuming '{input_file}' after {checkpoint['rows_done']} rows.")
+
+    names = itertools.islice(iter_names(input_file, name_column, id_column), checkpoint["rows_done"], None)
+    screened = flagged = 0
+    with open(output_file, "a", encoding="utf-8", newline="") as out:
+        writer = _ResultWriter(out, output_file.endswith(".csv"))
+        if checkpoint["rows_done"] == 0:
+            writer.write_header()
+        for result in screen_bulk(screener, names, threshold, top_k, chunk_size, workers, **filters):
+            writer.write(result)
+            screened += 1
+            flagged += bool(result["matches"])
+            if screened % checkpoint_every == 0:
+                out.flush()
+                os.fsync(out.fileno())
+                _save_checkpoint(checkpoint_path, dict(
+                    checkpoint, rows_done=checkpoint["rows_done"] + screened,
+                    flagged=checkpoint["flagged"] + flagged, output_bytes=out.tell(),
+                ))
+    if os.path.exists(checkpoint_path):
+        # Finished: there is nothing left to resume
+        os.remove(checkpoint_path)
+    return screened, flagged
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Screen a file of names against a snapshot in bulk.")
+    parser.add_argument("--input_file", required=True, help="CSV (with a header row) or JSONL of names.")
+    parser.add_argument("--snapshot", nargs="+", required=True,
+                        help="JSONL snapshot file(s), e.g. the local_loader shards.")
+    parser.add_argument("--output_file", default="screening_results.jsonl",
+                        help="Where results are written: CSV (one row per match) if it ends in .csv, else JSONL.")
+    parser.add_argument("--name_column", default="name", help="Column/field holding the name.")
+    parser.add_argument("--id_column", help="Column/field holding an input ID (defaults to row number).")
+    parser.add_argument("--engine", choices=["index", "tfidf"], default="tfidf",
+                        help="index matches each name exactly as search_data does; "
+                             "tfidf screens chunks with the TF-IDF product.")
+    parser.add_argument("--threshold", type=int, default=2, help="Maximum allowed typo distance.")
+    parser.add_argument("--top_k", type=int, default=5, help="Matches kept per name.")
+    parser.add_argument("--type", dest="entity_type", action="append",
+                        help="Only screen against entities of this type (Individual, Entity, Vessel, Aircraft). "
+                             "Repeatable.")
+    parser.add_argument("--program", dest="programs", action="append",
+                        help="Only screen against entities under this sanctions program, e.g. SDGT. Repeatable.")
+    parser.add_argument("--country", dest="country_iso2", action="append",
+                        help="Only screen against entities with an address in this country (ISO2 code). Repeatable.")
+    parser.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATES,
+                        help="Aliases re-ranked per name, chosen by TF-IDF cosine similarity.")
+    parser.add_argument("--chunk_size", type=int, default=DEFAULT_CHUNK_SIZE, help="Names scored together.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (defaults to all cores).")
+    parser.add_argument("--checkpoint_every", type=int, default=10000, help="Rows between checkpoints.")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over.")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.engine == "index":
+        from local_search import LocalSearchIndex
+
+        screener = LocalSearchIndex.from_jsonl(args.snapshot, fuzzy_index="qgram")
+        logging.info(f"Indexed {len(screener.entities)} entities in {time.perf_counter() - start:.2f}s.")
+    else:
+        screener = BulkScreener.from_jsonl(args.snapshot, candidates=args.candidates)
+        logging.info(f"Indexed {len(screener.normalized_names)} aliases in {time.perf_counter() - start:.2f}s.")
+
+    workers = args.workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    screened, flagged = screen_file(
+        screener, args.input_file, args.output_file, args.threshold, args.top_k, args.name_column,
+        args.id_column, args.chunk_size, workers, args.checkpoint_every, restart=args.restart,
+        **search_filters(args.entity_type, args.programs, args.country_iso2),
+    )
+    elapsed = time.perf_counter() - start
+    rate = screened / elapsed if elapsed else 0.0
+    logging.info(f"Screened {screened} names ({flagged} with matches) in {elapsed:.2f}s to '{args.output_file}': "
+                 f"{rate:.0f} rows/s, {rate / workers:.0f} rows/s per core.")
+
+
+if __name__ == "__main__":
+    run()
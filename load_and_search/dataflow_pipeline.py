@@ -1,102 +1,27 @@
 import apache_beam as beam
+from apache_beam.io.restriction_trackers import OffsetRange, OffsetRestrictionTracker
 from apache_beam.options.pipeline_options import PipelineOptions, WorkerOptions
 from apache_beam.io.gcp.bigquery import WriteToBigQuery
 from apache_beam.transforms.combiners import Sample
 
 import argparse
+import datetime
 import xml.etree.ElementTree as ET
 import json
+import logging
 import os
-import re
 import sys
+import time
 
-# Namespace map - must be global or passed to DoFn
-ns = {'ns': 'https://sanctionslistservice.ofac.treas.gov/api/PublicationPreview/exports/ADVANCED_XML'}
-
-from normalization_logic import normalize_name
-
-# --- Helper functions for XML parsing, extracted from parse_to_jsonl.py ---
-# These will run within the DoFn, so they need to be self-contained.
-
-
-def _parse_countries(xml_root):
-    country_map = {}
-    for country_elem in xml_root.findall(".//ns:Country", ns):
-        c_id = country_elem.attrib.get("ID")
-        iso2 = country_elem.attrib.get("ISO2")
-        name = country_elem.text.strip() if country_elem.text else None
-        if c_id:
-            country_map[c_id] = {"name": name, "iso2": iso2}
-    return country_map
-
-def _parse_locations(xml_root, country_map):
-    location_map = {}
-    for loc_elem in xml_root.findall(".//ns:Location", ns):
-        loc_id = loc_elem.attrib.get("ID")
-        loc_data = {
-            "address_line": None,
-            "city": None,
-            "state": None,
-            "postal_code": None,
-            "country": None,
-            "country_iso2": None,
-        }
-
-        # Country
-        loc_country = loc_elem.find("ns:LocationCountry", ns)
-        if loc_country is not None:
-            c_id = loc_country.attrib.get("CountryID")
-            c_data = country_map.get(c_id)
-            if c_data:
-                loc_data["country"] = c_data.get("name")
-                loc_data["country_iso2"] = c_data.get("iso2")
-
-        # Parts
-        address_lines = []
-        for part in loc_elem.findall("ns:LocationPart", ns):
-            type_id = part.attrib.get("LocPartTypeID")
-            loc_part_value = part.find("ns:LocationPartValue", ns)
-            
-            # The actual value is inside a <Value> child element
-            val_elem = loc_part_value.find("ns:Value", ns) if loc_part_value is not None else None
-            val = (
-                val_elem.text.strip()
-                if val_elem is not None and val_elem.text
-                else None
-            )
-
-            if val:
-                if type_id in ["1451", "1452", "1453"]:  # Address 1, 2, 3
-                    address_lines.append(val)
-                elif type_id == "1454":  # City
-                    loc_data["city"] = val
-                elif type_id == "1455":  # State
-                    loc_data["state"] = val
-                elif type_id == "1456":  # Postal Code
-                    loc_data["postal_code"] = val
-
-        loc_data["address_line"] = ", ".join(address_lines) if address_lines else None
-        location_map[loc_id] = loc_data
-    return location_map
-
-
-def _parse_sanctions_programs(xml_root):
-    profile_programs = {}
-    for sanctions_entry_elem in xml_root.findall(".//ns:SanctionsEntry", ns):
-        profile_id = sanctions_entry_elem.attrib.get("ProfileID")
-        if profile_id:
-            # Extract program from SanctionsMeasure
-            for measure in sanctions_entry_elem.findall("ns:SanctionsMeasure", ns):
-                comment = measure.find("ns:Comment", ns)
-                if comment is not None and comment.text:
-                    if profile_id not in profile_programs:
-                        profile_programs[profile_id] = (
-                            set()
-                        )  # Use set to avoid duplicates
-                    profile_programs[profile_id].add(comment.text.strip())
-
-    # Convert sets to lists for JSON serialization
-    return {pid: list(programs) for pid, programs in profile_programs.items()}
+from sdn_parser import (
+    index_distinct_parties,
+    iter_entities_streaming,
+    parse_party_fragment,
+    parse_sanctions_document,
+    read_reference_data,
+)
+from table_layout import CLUSTERING_FIELDS, refresh_alias_table
+from token_stats import refresh_token_stats
 
 
 class ParseSanctionsXmlDoFn(beam.DoFn):
@@ -104,94 +29,447 @@ class ParseSanctionsXmlDoFn(beam.DoFn):
         # 'element' here is the entire XML content as a string
         xml_string = element
         root = ET.fromstring(xml_string.encode("utf-8"))
+        yield from parse_sanctions_document(root)
+
+
+class StreamParseSanctionsXmlDoFn(beam.DoFn):
+    """Parses the XML straight from its path, so the full document is never held in memory."""
+
+    def process(self, file_path):
+        from apache_beam.io.filesystems import FileSystems
+        yield from iter_entities_streaming(lambda: FileSystems.open(file_path))
+
+
+# --- Splittable parser ---
+# The file is indexed once to find the byte range of every DistinctParty. The
+# ranges are then handed out to workers by a splittable DoFn, and each worker
+# parses its parties against reference data shared as a side input.
+
+_PARTIES_PER_SPLIT = 500
+
+
+class ReadReferenceDataDoFn(beam.DoFn):
+    """Streams the Country, Location and SanctionsEntry lookups out of the file."""
+
+    def process(self, file_path):
+        from apache_beam.io.filesystems import FileSystems
+        with FileSystems.open(file_path) as f:
+            _, location_map, profile_programs = read_reference_data(f)
+        yield {"locations": location_map, "programs": profile_programs}
+
+
+class IndexDistinctPartiesDoFn(beam.DoFn):
+    """Emits the file path together with the byte ranges of its DistinctParty elements."""
+
+    def process(self, file_path):
+        from apache_beam.io.filesystems import FileSystems
+        with FileSystems.open(file_path) as f:
+            root_open_tag, root_close_tag, ranges = index_distinct_parties(f)
+        yield {
+            "file_path": file_path,
+            "root_open_tag": root_open_tag,
+            "root_close_tag": root_close_tag,
+            "party_ranges": ranges,
+        }
+
+
+class _PartyRangesRestrictionProvider(beam.transforms.core.RestrictionProvider):
+    """Restrictions are ranges of positions in the element's party_ranges list."""
 
-        # Pass 1: Reference Data (Countries)
-        country_map = _parse_countries(root)
-
-        # Pass 2: Locations
-        location_map = _parse_locations(root, country_map)
-
-        # Pass 3: Sanctions Entries (Programs)
-        profile_programs = _parse_sanctions_programs(root)
-
-        # Pass 4: Distinct Parties (Main Output)
-        for elem in root.findall(".//ns:DistinctParty", ns):
-            entity_id = elem.attrib.get('FixedRef')
-            profile = elem.find("ns:Profile", ns)
-            
-            if profile is not None and entity_id:
-                profile_id = profile.attrib.get('ID')
-                party_sub_type_id = profile.attrib.get("PartySubTypeID")
-
-                # Determine Type
-                entity_type = "Unknown"
-                if party_sub_type_id == "1":
-                    entity_type = "Vessel"
-                elif party_sub_type_id == "2":
-                    entity_type = "Aircraft"
-                elif party_sub_type_id == "3":
-                    entity_type = "Entity"
-                elif party_sub_type_id == "4":
-                    entity_type = "Individual"
-
-                # Get Programs
-                programs = profile_programs.get(profile_id, [])
-
-                # Get Names
-                aliases = []
-                identity = profile.find("ns:Identity", ns)
-                if identity is not None:
-                    for alias in identity.findall(".//ns:Alias", ns):
-                        is_primary = alias.attrib.get("Primary") == "true"
-
-                        full_name_parts = []
-                        doc_name = alias.find(".//ns:DocumentedName", ns)
-                        if doc_name is not None:
-                            for part in doc_name.findall(
-                                ".//ns:DocumentedNamePart", ns
-                            ):
-                                val = part.find(".//ns:NamePartValue", ns)
-                                if val is not None and val.text:
-                                    full_name_parts.append(val.text.strip())
-
-                        full_name = " ".join(full_name_parts)
-                        if full_name:
-                            aliases.append(
-                                {
-                                    "full_name": full_name,
-                                    "normalized_name": normalize_name(full_name),
-                                    "is_primary": is_primary,
-                                    "type_id": alias.attrib.get("AliasTypeID"),
-                                }
-                            )
-
-                # Get Addresses (Locations)
-                entity_addresses = []
-                for feature in profile.findall("ns:Feature", ns):
-                    if feature.attrib.get("FeatureTypeID") == "25":  # Location Feature
-                        ver_loc = feature.find(".//ns:VersionLocation", ns)
-                        if ver_loc is not None:
-                            loc_id = ver_loc.attrib.get("LocationID")
-                            if loc_id in location_map:
-                                entity_addresses.append(location_map[loc_id])
-
-                # Remarks/Comment
-                comment_elem = elem.find("ns:Comment", ns)
-                remarks = (
-                    comment_elem.text.strip()
-                    if comment_elem is not None and comment_elem.text
-                    else None
+    def __init__(self, parties_per_split=_PARTIES_PER_SPLIT):
+        self._parties_per_split = parties_per_split
+
+    def initial_restriction(self, element):
+        return OffsetRange(0, len(element["party_ranges"]))
+
+    def create_tracker(self, restriction):
+        return OffsetRestrictionTracker(restriction)
+
+    def split(self, element, restriction):
+        yield from restriction.split(self._parties_per_split)
+
+    def restriction_size(self, element, restriction):
+        # Sized in bytes so the runner balances shards by the work they hold
+        if restriction.size() == 0:
+            return 0
+        ranges = element["party_ranges"]
+        return ranges[restriction.stop - 1][1] - ranges[restriction.start][0]
+
+
+class ParseDistinctPartyRangesDoFn(beam.DoFn):
+    """Splittable DoFn that parses the DistinctParty elements in its claimed range."""
+
+    def process(
+        self,
+        element,
+        reference_data,
+        tracker=beam.DoFn.RestrictionParam(_PartyRangesRestrictionProvider()),
+    ):
+        from apache_beam.io.filesystems import FileSystems
+
+        location_map = reference_data["locations"]
+        profile_programs = reference_data["programs"]
+        ranges = element["party_ranges"]
+
+        with FileSystems.open(element["file_path"]) as f:
+            index = tracker.current_restriction().start
+            while tracker.try_claim(index):
+                start, end = ranges[index]
+                f.seek(start)
+                record = parse_party_fragment(
+                    f.read(end - start),
+                    element["root_open_tag"],
+                    element["root_close_tag"],
+                    location_map,
+                    profile_programs,
                 )
+                if record is not None:
+                    yield record
+                index += 1
+
+
+# --- Write methods ---
+
+WRITE_METHODS = ["FILE_LOADS", "STORAGE_WRITE_API", "LOCAL_JSONL", "LOCAL_PARQUET"]
+LOCAL_WRITE_METHODS = ["LOCAL_JSONL", "LOCAL_PARQUET"]
+
+
+class CountRecordBytesDoFn(beam.DoFn):
+    """
+    Passes records through, counting them and their serialized size for the
+    write report, and noting when each was handed to the writer.
+    """
+
+    def __init__(self):
+        self.entities = beam.metrics.Metrics.counter(self.__class__, "entities")
+        self.record_bytes = beam.metrics.Metrics.counter(self.__class__, "record_bytes")
+        self.handed_to_writer = beam.metrics.Metrics.distribution(self.__class__, "handed_to_writer_ms")
+
+    def process(self, record):
+        self.entities.inc()
+        self.record_bytes.inc(len(json.dumps(record)))
+        self.handed_to_writer.update(int(time.time() * 1000))
+        yield record
+
+
+def bq_schema_to_arrow(fields):
+    """Converts a BigQuery JSON schema into the equivalent pyarrow schema."""
+    import pyarrow as pa
+
+    type_map = {
+        "STRING": pa.string(),
+        "INTEGER": pa.int64(),
+        "FLOAT": pa.float64(),
+        "BOOLEAN": pa.bool_(),
+    }
+
+    def to_field(field):
+        if field["type"] == "RECORD":
+            field_type = pa.struct([to_field(f) for f in field["fields"]])
+        else:
+            field_type = type_map[field["type"]]
+        mode = field.get("mode", "NULLABLE")
+        if mode == "REPEATED":
+            return pa.field(field["name"], pa.list_(field_type))
+        return pa.field(field["name"], field_type, nullable=mode != "REQUIRED")
+
+    return pa.schema([to_field(f) for f in fields])
+
+
+def _write_entities(parsed_entities, args, bigquery_schema, table=None):
+    if args.write_method == "LOCAL_JSONL":
+        return (
+            parsed_entities
+            | "ToJson" >> beam.Map(json.dumps)
+            | "WriteJsonl" >> beam.io.WriteToText(args.output_path, file_name_suffix=".jsonl")
+        )
+    if args.write_method == "LOCAL_PARQUET":
+        return parsed_entities | "WriteParquet" >> beam.io.WriteToParquet(
+            args.output_path,
+            schema=bq_schema_to_arrow(bigquery_schema),
+            file_name_suffix=".parquet",
+        )
+
+    if args.write_method == "STORAGE_WRITE_API":
+        method_kwargs = {"method": WriteToBigQuery.Method.STORAGE_WRITE_API}
+    else:
+        # Batch load jobs are free; staging as Avro keeps the files compact
+        # and avoids JSON's type coercion on load.
+        method_kwargs = {
+            "method": WriteToBigQuery.Method.FILE_LOADS,
+            "temp_file_format": "AVRO",
+        }
+
+    return parsed_entities | "WriteToBigQuery" >> WriteToBigQuery(
+        table=table or args.output_table,
+        schema={"fields": bigquery_schema},
+        # Searches filter on type and join on entity_id, so blocks outside them are pruned
+        additional_bq_parameters={"clustering": {"fields": CLUSTERING_FIELDS}},
+        write_disposition=beam.io.BigQueryDisposition.WRITE_TRUNCATE,
+        create_disposition=beam.io.BigQueryDisposition.CREATE_IF_NEEDED,
+        **method_kwargs,
+    )
+
+
+# --- Incremental load ---
+# Instead of truncating the table, the parsed entities are diffed against the
+# content hashes already in BigQuery. Only inserted, updated and deleted
+# entities are written to a changes table, which is then MERGEd into the
+# target keyed on entity_id.
+
+CHANGE_TYPE_FIELD = {"name": "change_type", "type": "STRING", "mode": "REQUIRED"}
+
 
-                record = {
-                    'entity_id': int(entity_id),
-                    'names': aliases,
-                    'type': entity_type,
-                    'programs': programs,
-                    'addresses': entity_addresses,
-                    'remarks': remarks,
-                }
-                yield record
+class DiffAgainstExistingDoFn(beam.DoFn):
+    """
+    Takes (entity_id, {"new": [record], "existing": [content_hash]}) and emits
+    the record tagged with its change_type, or nothing if it is unchanged.
+    """
+
+    def __init__(self):
+        self.counters = {
+            change: beam.metrics.Metrics.counter(self.__class__, change)
+            for change in ("inserted", "updated", "deleted", "unchanged")
+        }
+
+    def process(self, element):
+        entity_id, grouped = element
+        new_records = list(grouped["new"])
+        existing_hashes = list(grouped["existing"])
+
+        if not new_records:
+            self.counters["deleted"].inc()
+            yield {
+                "entity_id": entity_id,
+                "names": [],
+                "programs": [],
+                "addresses": [],
+                "change_type": "DELETE",
+            }
+            return
+
+        record = new_records[0]
+        if not existing_hashes:
+            self.counters["inserted"].inc()
+            yield dict(record, change_type="INSERT")
+        elif existing_hashes[0] != record["content_hash"]:
+            self.counters["updated"].inc()
+            yield dict(record, change_type="UPDATE")
+        else:
+            self.counters["unchanged"].inc()
+
+
+def build_merge_query(target_table, changes_table, bigquery_schema):
+    """Builds the MERGE statement that applies the changes table to the target table."""
+    columns = [field["name"] for field in bigquery_schema]
+    updates = ",\n        ".join(f"{c} = S.{c}" for c in columns if c != "entity_id")
+    return f"""
+    MERGE `{target_table}` AS T
+    USING `{changes_table}` AS S
+    ON T.entity_id = S.entity_id
+    WHEN MATCHED AND S.change_type = 'DELETE' THEN
+      DELETE
+    WHEN MATCHED THEN
+      UPDATE SET
+        {updates}
+    WHEN NOT MATCHED AND S.change_type != 'DELETE' THEN
+      INSERT ({", ".join(columns)})
+      VALUES ({", ".join(f"S.{c}" for c in columns)})
+    """
+
+
+def _diff_entities(p, parsed_entities, args):
+    existing_hashes = (
+        p
+        | "ReadExistingHashes" >> beam.io.ReadFromBigQuery(
+            table=args.output_table,
+            method=beam.io.ReadFromBigQuery.Method.DIRECT_READ,
+            selected_fields=["entity_id", "content_hash"],
+        )
+        | "KeyExisting" >> beam.Map(lambda row: (row["entity_id"], row["content_hash"]))
+    )
+    new_entities = parsed_entities | "KeyNew" >> beam.Map(lambda r: (r["entity_id"], r))
+    return (
+        {"new": new_entities, "existing": existing_hashes}
+        | "JoinOnEntityId" >> beam.CoGroupByKey()
+        | "DiffAgainstExisting" >> beam.ParDo(DiffAgainstExistingDoFn())
+    )
+
+
+def _apply_merge(result, args, bigquery_schema):
+    """Runs the MERGE once the pipeline has written the changes table, and logs its cost."""
+    from google.cloud import bigquery
+
+    changes = _sum_counters(result, "DiffAgainstExisting")
+    logging.info(f"Entity changes: {json.dumps(changes)}")
+
+    # With no changes the changes table is not rewritten, so it must not be replayed
+    if not any(changes.get(c) for c in ("inserted", "updated", "deleted")):
+        logging.info("No entities changed; skipping MERGE.")
+        return None
+
+    client = bigquery.Client(project=args.project)
+    query = build_merge_query(
+        args.output_table.replace(":", "."), args.changes_table.replace(":", "."), bigquery_schema
+    )
+    merge_job = client.query(query)
+    merge_job.result()
+    report = {
+        "affected_rows": merge_job.num_dml_affected_rows,
+        "bytes_processed": merge_job.total_bytes_processed,
+        "slot_millis": merge_job.slot_millis,
+    }
+    logging.info(f"MERGE report: {json.dumps(report)}")
+    return merge_job
+
+
+def _refresh_derived_tables(args):
+    """
+    Rewrites the tables searches read besides the entities, from the loaded
+    table: the token statistics the weighted search ranks by, and the alias
+    table with the search index. Logs the cost of each.
+    """
+    from google.cloud import bigquery
+
+    client = bigquery.Client(project=args.project)
+    entities_table = args.output_table.replace(":", ".")
+    jobs = {
+        args.token_stats_table: refresh_token_stats(client, entities_table, args.token_stats_table.replace(":", ".")),
+        args.alias_table: refresh_alias_table(client, entities_table, args.alias_table.replace(":", ".")),
+    }
+    for table, job in jobs.items():
+        report = {
+            "table": table,
+            "bytes_processed": job.total_bytes_processed,
+            "slot_millis": job.slot_millis,
+        }
+        logging.info(f"Derived table report: {json.dumps(report)}")
+    return jobs
+
+
+def _sum_counters(result, step):
+    """Returns {counter name: total} for the counters reported by the given step."""
+    from apache_beam.metrics.metric import MetricsFilter
+
+    totals = {}
+    for counter in result.metrics().query(MetricsFilter().with_step(step))["counters"]:
+        value = counter.committed if counter.committed is not None else counter.attempted
+        totals[counter.key.metric.name] = totals.get(counter.key.metric.name, 0) + value
+    return totals
+
+
+def _first_handed_to_writer(result):
+    """Returns when the first record reached the writer, or None if none did."""
+    from apache_beam.metrics.metric import MetricsFilter
+
+    firsts = []
+    for distribution in result.metrics().query(MetricsFilter().with_step("CountRecordBytes"))["distributions"]:
+        value = distribution.committed if distribution.committed is not None else distribution.attempted
+        if value is not None and value.count:
+            firsts.append(value.min)
+    if not firsts:
+        return None
+    return datetime.datetime.fromtimestamp(min(firsts) / 1000, datetime.timezone.utc)
+
+
+def _load_job_report(client, table, started_at):
+    """
+    Reports the load jobs Beam ran for FILE_LOADS since started_at: the Avro
+    files they staged, and when the first started and the last ended.
+    """
+    dataset_id = table.replace(":", ".").split(".")[-2]
+    jobs = [
+        job for job in client.list_jobs(min_creation_time=started_at, all_users=False)
+        if job.job_type == "load" and job.job_id.startswith("beam_bq_job_LOAD")
+        and job.destination is not None and job.destination.dataset_id == dataset_id
+    ]
+    if not jobs:
+        return {"load_jobs": 0}
+    load_started = min(job.started for job in jobs)
+    load_ended = max(job.ended for job in jobs)
+    return {
+        "load_jobs": len(jobs),
+        "staged_files": sum(job.input_files or 0 for job in jobs),
+        "staged_bytes": sum(job.input_file_bytes or 0 for job in jobs),
+        "load_started": load_started.isoformat(),
+        "load_ended": load_ended.isoformat(),
+        "load_seconds": round((load_ended - load_started).total_seconds(), 1),
+    }
+
+
+def _write_api_report(client, table, started_at, first_handed, finished_at):
+    """
+    Reports the bytes and rows appended to table through the Storage Write API
+    since started_at, from the project's WRITE_API_TIMELINE (which can lag a
+    few minutes), and the write's duration: from the first record reaching the
+    writer until the pipeline, which commits the appends, finished.
+    """
+    from google.cloud import bigquery
+
+    project_id, dataset_id, table_id = table.replace(":", ".").split(".")
+    location = client.get_dataset(f"{project_id}.{dataset_id}").location.lower()
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("dataset_id", "STRING", dataset_id),
+            bigquery.ScalarQueryParameter("table_id", "STRING", table_id),
+            # The timeline is bucketed by minute
+            bigquery.ScalarQueryParameter(
+                "started_at", "TIMESTAMP", started_at.replace(second=0, microsecond=0)
+            ),
+        ]
+    )
+    row = next(iter(client.query(
+        f"""
+        SELECT SUM(total_input_bytes) AS appended_bytes, SUM(total_rows) AS appended_rows
+        FROM `{project_id}`.`region-{location}`.INFORMATION_SCHEMA.WRITE_API_TIMELINE_BY_PROJECT
+        WHERE dataset_id = @dataset_id AND table_id = @table_id AND start_timestamp >= @started_at
+        """,
+        job_config=job_config,
+    ).result()))
+    report = {"appended_bytes": row["appended_bytes"] or 0, "appended_rows": row["appended_rows"] or 0}
+    if first_handed is not None:
+        report.update(
+            write_started=first_handed.isoformat(),
+            write_ended=finished_at.isoformat(),
+            write_seconds=round((finished_at - first_handed).total_seconds(), 1),
+        )
+    return report
+
+
+def _report_write(result, args, elapsed, started_at=None):
+    """
+    Logs the records written and the pipeline duration, with what the chosen
+    write method staged and how long the write took: the Avro files and load
+    jobs for FILE_LOADS, the appended bytes and write time for
+    STORAGE_WRITE_API, and the output size for local sinks.
+    """
+    totals = _sum_counters(result, "CountRecordBytes")
+    report = {
+        "write_method": args.write_method,
+        "entities": totals.get("entities", 0),
+        "record_bytes": totals.get("record_bytes", 0),
+        "duration_seconds": round(elapsed, 1),
+    }
+    if args.write_method in LOCAL_WRITE_METHODS:
+        from apache_beam.io.filesystems import FileSystems
+
+        matches = FileSystems.match([args.output_path + "*"])[0].metadata_list
+        report["output_bytes"] = sum(m.size_in_bytes for m in matches)
+    elif started_at is not None:
+        from google.cloud import bigquery
+
+        client = bigquery.Client(project=args.project)
+        table = args.changes_table if args.load_mode == "incremental" else args.output_table
+        if args.write_method == "FILE_LOADS":
+            report.update(_load_job_report(client, table, started_at))
+        else:
+            finished_at = datetime.datetime.now(datetime.timezone.utc)
+            report.update(
+                _write_api_report(client, table, started_at, _first_handed_to_writer(result), finished_at)
+            )
+
+    logging.info(f"Write report: {json.dumps(report)}")
+    return report
 
 
 class ReadFileContent(beam.DoFn):
@@ -211,9 +489,47 @@ def run(argv=None, save_main_session=True):
     parser.add_argument(
         "--output_table",
         dest="output_table",
-        required=True,
         help="Output BigQuery table to write to, in the format PROJECT:DATASET.TABLE.",
     )
+    parser.add_argument(
+        "--write_method",
+        dest="write_method",
+        choices=WRITE_METHODS,
+        default="FILE_LOADS",
+        help="FILE_LOADS stages Avro files and runs a load job; STORAGE_WRITE_API "
+        "streams through the Storage Write API; LOCAL_JSONL and LOCAL_PARQUET "
+        "write files under --output_path instead of BigQuery (for tests).",
+    )
+    parser.add_argument(
+        "--load_mode",
+        dest="load_mode",
+        choices=["truncate", "incremental"],
+        default="truncate",
+        help="'truncate' rewrites the whole table; 'incremental' MERGEs only the "
+        "entities whose content hash changed (the table must already exist).",
+    )
+    parser.add_argument(
+        "--changes_table",
+        dest="changes_table",
+        help="Table for the incremental changes (defaults to OUTPUT_TABLE_changes).",
+    )
+    parser.add_argument(
+        "--token_stats_table",
+        dest="token_stats_table",
+        help="Table for the per-token document frequencies the weighted search uses "
+        "(defaults to OUTPUT_TABLE_token_stats). Rewritten after every BigQuery load.",
+    )
+    parser.add_argument(
+        "--alias_table",
+        dest="alias_table",
+        help="Table with one row per name and a search index on its words "
+        "(defaults to OUTPUT_TABLE_aliases). Rewritten after every BigQuery load.",
+    )
+    parser.add_argument(
+        "--output_path",
+        dest="output_path",
+        help="Path prefix for the local sinks, e.g. /tmp/sdn_entities.",
+    )
     parser.add_argument(
         "--runner",
         dest="runner",
@@ -229,9 +545,36 @@ def run(argv=None, save_main_session=True):
         required=True,
         help="GCS path for temporary files (e.g., gs://your-bucket/tmp).",  # Made required
     )
+    parser.add_argument(
+        "--parse_mode",
+        dest="parse_mode",
+        choices=["split", "stream", "document"],
+        default="split",
+        help="'split' shards the DistinctParty elements across workers; "
+        "'stream' parses the file incrementally with iterparse on one worker; "
+        "'document' reads the whole XML into memory first. "
+        "Gzip-compressed (.gz) input is decompressed as it is read and always streamed.",
+    )
 
     args, pipeline_args = parser.parse_known_args(argv)
 
+    if args.write_method in LOCAL_WRITE_METHODS and not args.output_path:
+        parser.error(f"--output_path is required with --write_method {args.write_method}")
+    if args.write_method not in LOCAL_WRITE_METHODS and not args.output_table:
+        parser.error(f"--output_table is required with --write_method {args.write_method}")
+    if args.load_mode == "incremental":
+        if args.write_method in LOCAL_WRITE_METHODS:
+            parser.error("--load_mode incremental needs a BigQuery write method")
+        args.changes_table = args.changes_table or f"{args.output_table}_changes"
+    if args.write_method not in LOCAL_WRITE_METHODS:
+        args.token_stats_table = args.token_stats_table or f"{args.output_table}_token_stats"
+        args.alias_table = args.alias_table or f"{args.output_table}_aliases"
+    if args.input_file.endswith(".gz") and args.parse_mode == "split":
+        # FileSystems.open decompresses .gz transparently, but every split would
+        # have to decompress from the start of the file to reach its byte range
+        logging.warning("Compressed input cannot be split by byte range; using --parse_mode stream.")
+        args.parse_mode = "stream"
+
     pipeline_args.extend([
         "--sdk_container_image=asia-southeast1-docker.pkg.dev/agentspace-krozario/dataflow-templates/sanctions-pipeline:latest",
         "--sdk_location=container"
@@ -245,31 +588,61 @@ def run(argv=None, save_main_session=True):
         region="asia-southeast1",
     )
 
-    with beam.Pipeline(options=pipeline_options) as p:
-        # 1. Read XML
-        xml_content = (
-            p 
-            | "CreateInputPath" >> beam.Create([args.input_file])
-            | "ReadWholeXML" >> beam.ParDo(ReadFileContent())
-        )
+    p = beam.Pipeline(options=pipeline_options)
+
+    # 1. Read & Parse XML
+    input_path = p | "CreateInputPath" >> beam.Create([args.input_file])
 
-        # 2. Parse XML
+    if args.parse_mode == "split":
+        reference_data = input_path | "ReadReferenceData" >> beam.ParDo(
+            ReadReferenceDataDoFn()
+        )
+        parsed_entities = (
+            input_path
+            | "IndexDistinctParties" >> beam.ParDo(IndexDistinctPartiesDoFn())
+            | "ParseDistinctParties" >> beam.ParDo(
+                ParseDistinctPartyRangesDoFn(),
+                reference_data=beam.pvalue.AsSingleton(reference_data),
+            )
+        )
+    elif args.parse_mode == "stream":
+        parsed_entities = input_path | "StreamParseXML" >> beam.ParDo(
+            StreamParseSanctionsXmlDoFn()
+        )
+    else:
+        xml_content = input_path | "ReadWholeXML" >> beam.ParDo(ReadFileContent())
         parsed_entities = xml_content | "ParseXML" >> beam.ParDo(
             ParseSanctionsXmlDoFn()
         )
 
-        # 3. Write Entities to Main Table
-        schema_path = os.path.join(os.path.dirname(__file__), '../queries/bq_schema.json')
-        with open(schema_path, "r") as f:
-            bigquery_schema = json.load(f)
+    # 2. Write Entities
+    schema_path = os.path.join(os.path.dirname(__file__), '../queries/bq_schema.json')
+    with open(schema_path, "r") as f:
+        bigquery_schema = json.load(f)
 
-        parsed_entities | "WriteToBigQuery" >> WriteToBigQuery(
-            table=args.output_table,
-            schema={"fields": bigquery_schema},
-            write_disposition=beam.io.BigQueryDisposition.WRITE_TRUNCATE,
-            create_disposition=beam.io.BigQueryDisposition.CREATE_IF_NEEDED,
+    if args.load_mode == "incremental":
+        changed_entities = _diff_entities(p, parsed_entities, args)
+        counted_entities = changed_entities | "CountRecordBytes" >> beam.ParDo(CountRecordBytesDoFn())
+        _write_entities(
+            counted_entities, args, bigquery_schema + [CHANGE_TYPE_FIELD], table=args.changes_table
         )
+    else:
+        counted_entities = parsed_entities | "CountRecordBytes" >> beam.ParDo(CountRecordBytesDoFn())
+        _write_entities(counted_entities, args, bigquery_schema)
+
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    start = time.perf_counter()
+    result = p.run()
+    result.wait_until_finish()
+    _report_write(result, args, time.perf_counter() - start, started_at)
+
+    if args.load_mode == "incremental":
+        if _apply_merge(result, args, bigquery_schema) is None:
+            return
+    if args.write_method not in LOCAL_WRITE_METHODS:
+        _refresh_derived_tables(args)
 
 
 if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
     run()
\ No newline at end of file
@@ -0,0 +1,180 @@
+import numpy as np
+
+# Patterns up to this long fit one uint64 bit-vector in the batched kernel
+WORD_BITS = 64
+
+
+def levenshtein(a, b):
+    """The textbook dynamic-programming Levenshtein distance; the reference for the faster versions."""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def bounded_levenshtein(a, b, limit):
+    """
+    Returns the Levenshtein distance between a and b, or limit + 1 once it must
+    exceed limit. Uses Myers' bit-parallel algorithm (in Hyyrö's formulation),
+    with the shorter string as the pattern held in one Python int, so each
+    character of the longer string costs a handful of integer operations.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    m = len(a)
+    if m == 0:
+        return min(len(b), limit + 1)
+
+    peq = {}
+    for i, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    remaining = len(b)
+    for char in b:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        remaining -= 1
+        # Each remaining character lowers the final distance by at most one
+        if score - remaining > limit:
+            return limit + 1
+    return min(score, limit + 1)
+
+
+class PackedStrings:
+    """
+    A list of strings packed into one padded array of character codes, sorted
+    by length, for scoring a query against all of them at once with NumPy.
+
+    distances() runs Myers' algorithm over every string in lock step, one
+    column per character position, with the query as a uint64 bit-vector.
+    Queries longer than 64 characters use a vectorized DP instead. Only strings
+    within limit characters of the query's length are scored.
+    """
+
+    def __init__(self, strings):
+        self.strings = list(strings)
+        lengths = np.fromiter((len(s) for s in self.strings), dtype=np.int64, count=len(self.strings))
+        # Longest first, so the strings still running at any column are a prefix
+        self._order = np.argsort(-lengths, kind="stable")
+        self._lengths = lengths[self._order]
+        self._alphabet = {}
+        width = int(self._lengths[0]) if len(self.strings) else 0
+        # Code 0 is padding and any character the alphabet hasn't seen
+        self._codes = np.zeros((len(self.strings), width), dtype=np.int32)
+        for row, position in enumerate(self._order):
+            string = self.strings[position]
+            self._codes[row, :len(string)] = [self._code(char) for char in string]
+        # Column-major, so each column is contiguous
+        self._codes = np.asfortranarray(self._codes)
+
+    def _code(self, char):
+        code = self._alphabet.get(char)
+        if code is None:
+            code = self._alphabet[char] = len(self._alphabet) + 1
+        return code
+
+    def __len__(self):
+        return len(self.strings)
+
+    def distances(self, query, limit):
+        """Returns the distance from query to every string, in input order, capped at limit + 1."""
+        out = np.full(len(self.strings), limit + 1, dtype=np.int64)
+        if limit < 0 or not self.strings:
+            return out
+        # Rows are sorted by descending length: find those within limit of len(query)
+        start = int(np.searchsorted(-self._lengths, -(len(query) + limit), side="left"))
+        stop = int(np.searchsorted(-self._lengths, -(len(query) - limit), side="right"))
+        if start >= stop:
+            return out
+        if not query:
+            scores = self._lengths[start:stop]
+        elif len(query) <= WORD_BITS:
+            scores = self._myers(query, start, stop)
+        else:
+            scores = self._dp(query, start, stop)
+        out[self._order[start:stop]] = np.minimum(scores, limit + 1)
+        return out
+
+    def within(self, query, limit):
+        """Returns [(index, distance)] for the strings within limit edits of query."""
+        distances = self.distances(query, limit)
+        hits = np.flatnonzero(distances <= limit)
+        return list(zip(hits.tolist(), distances[hits].tolist()))
+
+    def _query_codes(self, query):
+        # Characters the packed strings never use can't match; -1 never equals a code
+        return [self._alphabet.get(char, -1) for char in query]
+
+    def _myers(self, query, start, stop):
+        m = len(query)
+        peq = np.zeros(len(self._alphabet) + 1, dtype=np.uint64)
+        for i, code in enumerate(self._query_codes(query)):
+            if code > 0:
+                peq[code] |= np.uint64(1 << i)
+        mask = np.uint64((1 << m) - 1)
+        high = np.uint64(1 << (m - 1))
+        one, zero = np.uint64(1), np.uint64(0)
+
+        lengths = self._lengths[start:stop]
+        count = stop - start
+        pv = np.full(count, mask, dtype=np.uint64)
+        mv = np.zeros(count, dtype=np.uint64)
+        score = np.full(count, m, dtype=np.int64)
+        result = np.empty(count, dtype=np.int64)
+        # Rows [0, active[c]) are still running at column c; rows [ending[c], active[c]) end there
+        ends = -np.arange(1, int(lengths[0]) + 1)
+        actives = np.searchsorted(-lengths, ends, side="right").tolist()
+        endings = np.searchsorted(-lengths, ends, side="left").tolist()
+        # Strings of length 0 end before the first column
+        result[int(np.searchsorted(-lengths, 0, side="left")):] = m
+
+        for column, (active, ending) in enumerate(zip(actives, endings)):
+            eq = peq[self._codes[start:start + active, column]]
+            p, n = pv[:active], mv[:active]
+            xv = eq | n
+            xh = (((eq & p) + p) ^ p) | eq
+            ph = n | (~(xh | p) & mask)
+            mh = p & xh
+            s = score[:active]
+            s += (ph & high) != zero
+            s -= (mh & high) != zero
+            ph = ((ph << one) | one) & mask
+            mh = (mh << one) & mask
+            pv[:active] = mh | (~(xv | ph) & mask)
+            mv[:active] = ph & xv
+            result[ending:active] = s[ending:active]
+        return result
+
+    def _dp(self, query, start, stop):
+        lengths = self._lengths[start:stop]
+        width = int(lengths[0])
+        codes = self._codes[start:stop, :width]
+        previous = np.broadcast_to(np.arange(width + 1, dtype=np.int64), (stop - start, width + 1)).copy()
+        offsets = np.arange(width + 1)
+        for i, code in enumerate(self._query_codes(query), 1):
+            current = np.empty_like(previous)
+            current[:, 0] = i
+            substitution = previous[:, :-1] + (codes != code)
+            current[:, 1:] = np.minimum(previous[:, 1:] + 1, substitution)
+            # Insertions chain along the row: a running minimum of current[j] - j
+            current = np.minimum.accumulate(current - offsets, axis=1) + offsets
+            previous = current
+        return previous[np.arange(stop - start), lengths]
@@ -0,0 +1,266 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sdn_parser import index_distinct_parties, parse_party_fragment, read_reference_data
+from table_layout import CLUSTERING_FIELDS, refresh_alias_table
+from token_stats import refresh_token_stats
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '../queries/bq_schema.json')
+
+# Target number of shards per worker, so a slow shard does not hold up the pool
+SHARDS_PER_WORKER = 4
+
+# Set in each pool worker by _init_worker
+_worker_state = {}
+
+
+def load_bigquery_schema():
+    with open(SCHEMA_PATH, "r") as f:
+        return json.load(f)
+
+
+def bq_schema_to_avro(fields, name="sdn_entity"):
+    """Converts a BigQuery JSON schema into the equivalent Avro record schema."""
+    type_map = {
+        "STRING": "string",
+        "INTEGER": "long",
+        "INT64": "long",
+        "FLOAT": "double",
+        "FLOAT64": "double",
+        "BOOLEAN": "boolean",
+        "BOOL": "boolean",
+    }
+    avro_fields = []
+    for field in fields:
+        if field["type"] == "RECORD":
+            field_type = bq_schema_to_avro(field["fields"], name=f"{name}_{field['name']}")
+        else:
+            field_type = type_map[field["type"]]
+
+        mode = field.get("mode", "NULLABLE")
+        if mode == "REPEATED":
+            avro_fields.append({"name": field["name"], "type": {"type": "array", "items": field_type}})
+        elif mode == "REQUIRED":
+            avro_fields.append({"name": field["name"], "type": field_type})
+        else:
+            avro_fields.append({"name": field["name"], "type": ["null", field_type], "default": None})
+
+    return {"type": "record", "name": name, "fields": avro_fields}
+
+
+def _init_worker(input_file, root_open_tag, root_close_tag, location_map, profile_programs, avro_schema):
+    _worker_state.update(
+        input_file=input_file,
+        root_open_tag=root_open_tag,
+        root_close_tag=root_close_tag,
+        location_map=location_map,
+        profile_programs=profile_programs,
+        avro_schema=avro_schema,
+    )
+
+
+def _iter_shard_records(ranges):
+    state = _worker_state
+    with open(state["input_file"], "rb") as f:
+        for start, end in ranges:
+            f.seek(start)
+            record = parse_party_fragment(
+                f.read(end - start),
+                state["root_open_tag"],
+                state["root_close_tag"],
+                state["location_map"],
+                state["profile_programs"],
+            )
+            if record is not None:
+                yield record
+
+
+def _write_shard(output_path, ranges):
+    """Parses one shard of parties and writes it to output_path. Runs in a pool worker."""
+    count = 0
+    if output_path.endswith(".avro"):
+        import fastavro
+
+        records = list(_iter_shard_records(ranges))
+        with open(output_path, "wb") as out:
+            fastavro.writer(out, _worker_state["avro_schema"], records, codec="deflate")
+        count = len(records)
+    else:
+        with open(output_path, "w", encoding="utf-8") as out:
+            for record in _iter_shard_records(ranges):
+                out.write(json.dumps(record) + "\n")
+                count += 1
+    return output_path, count
+
+
+def _split_into_shards(ranges, num_shards):
+    shard_size = max(1, -(-len(ranges) // num_shards))
+    return [ranges[i:i + shard_size] for i in range(0, len(ranges), shard_size)]
+
+
+def parse_to_shards(input_file, output_dir, file_format="jsonl", workers=None):
+    """
+    Parses the SDN XML across a process pool and writes one file per shard.
+    Returns the list of shard paths and the total number of entities written.
+    A .gz snapshot is decompressed once to a temporary file first.
+    """
+    if input_file.endswith(".gz"):
+        # Seeking in a gzip stream decompresses from the start of the file, so
+        # every shard would decompress it again; split a plain copy instead
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plain_file = os.path.join(tmp_dir, os.path.basename(input_file)[:-len(".gz")])
+            with gzip.open(input_file, "rb") as f, open(plain_file, "wb") as out:
+                shutil.copyfileobj(f, out, 1 << 20)
+            return parse_to_shards(plain_file, output_dir, file_format, workers)
+
+    workers = workers or os.cpu_count()
+    os.makedirs(output_dir, exist_ok=True)
+
+    with open(input_file, "rb") as f:
+        _, location_map, profile_programs = read_reference_data(f)
+    with open(input_file, "rb") as f:
+        root_open_tag, root_close_tag, ranges = index_distinct_parties(f)
+
+    avro_schema = bq_schema_to_avro(load_bigquery_schema()) if file_format == "avro" else None
+    shards = _split_into_shards(ranges, workers * SHARDS_PER_WORKER)
+    logging.info(f"Parsing {len(ranges)} parties in {len(shards)} shards across {workers} processes...")
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(input_file, root_open_tag, root_close_tag, location_map, profile_programs, avro_schema),
+    ) as pool:
+        futures = [
+            pool.submit(_write_shard, os.path.join(output_dir, f"part-{i:05d}.{file_format}"), shard)
+            for i, shard in enumerate(shards)
+        ]
+        results = [future.result() for future in futures]
+
+    shard_paths = [path for path, _ in results]
+    total = sum(count for _, count in results)
+    return shard_paths, total
+
+
+def _upload_shards(shard_paths, staging_uri):
+    from google.cloud import storage
+
+    bucket_name, _, prefix = staging_uri[len("gs://"):].partition("/")
+    bucket = storage.Client().bucket(bucket_name)
+    uris = []
+    for path in shard_paths:
+        blob_name = "/".join(p for p in (prefix.rstrip("/"), os.path.basename(path)) if p)
+        bucket.blob(blob_name).upload_from_filename(path)
+        uris.append(f"gs://{bucket_name}/{blob_name}")
+    return uris
+
+
+def _concatenate_shards(shard_paths, output_path):
+    with open(output_path, "wb") as out:
+        for path in shard_paths:
+            with open(path, "rb") as f:
+                while chunk := f.read(1 << 20):
+                    out.write(chunk)
+    return output_path
+
+
+def load_shards(shard_paths, output_table, file_format="jsonl", staging_uri=None):
+    """Loads all shards into output_table (PROJECT:DATASET.TABLE) with a single load job."""
+    from google.cloud import bigquery
+
+    project_id = output_table.split(":", 1)[0] if ":" in output_table else None
+    table_ref = output_table.replace(":", ".")
+    if not shard_paths:
+        # WRITE_TRUNCATE would otherwise replace the table with nothing
+        raise ValueError(f"No shards to load into {table_ref}; the input has no DistinctParty elements.")
+    client = bigquery.Client(project=project_id)
+
+    job_config = bigquery.LoadJobConfig(
+        source_format=(
+            bigquery.SourceFormat.AVRO
+            if file_format == "avro"
+            else bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
+        ),
+        schema=[bigquery.SchemaField.from_api_repr(f) for f in load_bigquery_schema()],
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
+        clustering_fields=CLUSTERING_FIELDS,
+    )
+
+    if staging_uri:
+        uris = _upload_shards(shard_paths, staging_uri)
+        load_job = client.load_table_from_uri(uris, table_ref, job_config=job_config)
+    elif file_format == "jsonl":
+        # Newline-delimited JSON shards can simply be joined into one upload
+        combined = _concatenate_shards(
+            shard_paths, os.path.join(os.path.dirname(shard_paths[0]), "sdn_entities.jsonl")
+        )
+        with open(combined, "rb") as f:
+            load_job = client.load_table_from_file(f, table_ref, job_config=job_config)
+    else:
+        raise ValueError("Avro shards can only be loaded from GCS; set --staging_uri.")
+
+    logging.info(f"Started load job {load_job.job_id} into {table_ref}...")
+    load_job.result()
+    return load_job
+
+
+def refresh_derived_tables(output_table, stats_table, alias_table):
+    """Rewrites the token statistics and alias tables from the loaded table, as the Dataflow pipeline does."""
+    from google.cloud import bigquery
+
+    project_id = output_table.split(":", 1)[0] if ":" in output_table else None
+    client = bigquery.Client(project=project_id)
+    entities_table = output_table.replace(":", ".")
+    for table, refresh in ((stats_table, refresh_token_stats), (alias_table, refresh_alias_table)):
+        job = refresh(client, entities_table, table.replace(":", "."))
+        logging.info(f"Rewrote {table} ({job.total_bytes_processed} bytes processed).")
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Parse the SDN XML locally across a process pool and load it into BigQuery."
+    )
+    parser.add_argument("--input_file", required=True, help="Local SDN Advanced XML file (.xml or .xml.gz).")
+    parser.add_argument("--output_table", help="BigQuery table to load (PROJECT:DATASET.TABLE). Omit to only write shards.")
+    parser.add_argument("--output_dir", default="sdn_shards", help="Directory for the shard files.")
+    parser.add_argument("--format", dest="file_format", choices=["jsonl", "avro"], default="jsonl",
+                        help="Shard file format.")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (defaults to CPU count).")
+    parser.add_argument("--staging_uri", help="gs:// prefix to stage shards at before loading (required for Avro).")
+    parser.add_argument("--token_stats_table",
+                        help="Table for the per-token document frequencies the weighted search uses "
+                             "(defaults to OUTPUT_TABLE_token_stats).")
+    parser.add_argument("--alias_table",
+                        help="Table with one row per name and a search index on its words "
+                             "(defaults to OUTPUT_TABLE_aliases).")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    shard_paths, total = parse_to_shards(args.input_file, args.output_dir, args.file_format, args.workers)
+    logging.info(f"Wrote {total} entities to {len(shard_paths)} shards in {time.perf_counter() - start:.1f}s.")
+
+    if args.output_table:
+        load_start = time.perf_counter()
+        load_job = load_shards(shard_paths, args.output_table, args.file_format, args.staging_uri)
+        logging.info(
+            f"Loaded {load_job.output_rows} rows into {args.output_table} "
+            f"in {time.perf_counter() - load_start:.1f}s."
+        )
+        refresh_derived_tables(
+            args.output_table,
+            args.token_stats_table or f"{args.output_table}_token_stats",
+            args.alias_table or f"{args.output_table}_aliases",
+        )
+
+
+if __name__ == "__main__":
+    run()
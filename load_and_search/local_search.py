@@ -0,0 +1,539 @@
+import argparse
+import bisect
+import json
+import logging
+import re
+import time
+
+from edit_distance import PackedStrings, bounded_levenshtein as bounded_edit_distance
+from normalization_logic import normalize_name
+from qgram_index import QGramIndex
+from search_filters import FILTER_FIELDS, filter_values, search_filters
+from token_index import DEFAULT_MIN_OVERLAP, DEFAULT_MIN_SIMILARITY, TokenSetIndex
+from token_stats import DEFAULT_MIN_SCORE, TokenStats
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# RE2, which BigQuery uses, only treats ASCII letters, digits and _ as word characters
+_WORD_CHAR = "[A-Za-z0-9_]"
+_WORD = re.compile(f"{_WORD_CHAR}+")
+_BOUNDARY = f"(?:(?<={_WORD_CHAR})(?!{_WORD_CHAR})|(?<!{_WORD_CHAR})(?={_WORD_CHAR}))"
+_REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+# How fuzzy candidates are found before their edit distance is computed
+FUZZY_INDEXES = ("pigeonhole", "qgram", "scan")
+
+
+_WORD_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_")
+
+
+def _word_regex(term, flags=0):
+    """Compiles the whole-word pattern search_bq builds, with RE2's ASCII word boundaries."""
+    return re.compile(f"{_BOUNDARY}{term}{_BOUNDARY}", flags)
+
+
+def contains_word(text, word):
+    """
+    Returns whether the literal word occurs in text between RE2 word boundaries,
+    as _word_regex(re.escape(word)) would find, without compiling a pattern.
+    """
+    def boundary(position):
+        before = position > 0 and text[position - 1] in _WORD_CHARS
+        after = position < len(text) and text[position] in _WORD_CHARS
+        return before != after
+
+    start = text.find(word)
+    while start != -1:
+        if boundary(start) and boundary(start + len(word)):
+            return True
+        start = text.find(word, start + 1)
+    return False
+
+
+def _required_tokens(term):
+    """
+    Returns the words a name must contain for a whole-word match of term, or None
+    if term is not a literal and every name has to be checked.
+    """
+    if _REGEX_METACHARACTERS.intersection(term):
+        return None
+    tokens = _WORD.findall(term)
+    return tokens or None
+
+
+def _word_pattern(term, literal=False, flags=0):
+    """
+    Returns the whole-word pattern for term and the words a matching name must
+    contain (see _required_tokens). A literal term is escaped, so its regex
+    syntax matches itself.
+    """
+    if literal:
+        return _word_regex(re.escape(term), flags), _WORD.findall(term) or None
+    return _word_regex(term, flags), _required_tokens(term)
+
+
+def _pigeonhole_pieces(term, max_edits):
+    """
+    Splits term into max_edits + 1 pieces. A string within max_edits edits of term
+    contains at least one of them unchanged.
+    """
+    pieces = max_edits + 1
+    size, extra = divmod(len(term), pieces)
+    out, start = [], 0
+    for i in range(pieces):
+        end = start + size + (i < extra)
+        out.append(term[start:end])
+        start = end
+    return out
+
+
+def _bitset(positions, size):
+    """Returns an int with the bits at positions set."""
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+def read_snapshot(paths):
+    """Yields the records of a snapshot written as newline-delimited JSON."""
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class _LengthBucket:
+    """The normalized names of one length, joined so they can be scanned in one regex pass."""
+
+    def __init__(self, name_ids, names):
+        self.name_ids = name_ids
+        self.starts = []
+        parts, offset = [], 0
+        for name_id in name_ids:
+            self.starts.append(offset)
+            parts.append(names[name_id])
+            offset += len(names[name_id]) + 1
+        self.text = "\n".join(parts)
+
+    def containing(self, pattern):
+        found = set()
+        for match in pattern.finditer(self.text):
+            found.add(self.name_ids[bisect.bisect_right(self.starts, match.start()) - 1])
+        return found
+
+
+class LocalSearchIndex:
+    """
+    An in-memory copy of the sdn_entities table that answers the same search as
+    search_bq.query_entities without a BigQuery job. An entity matches when any of its
+    names is within threshold edits of the normalized term, or contains the term
+    as a whole word in full_name (case-insensitive) or normalized_name. Entities are
+    ranked by their best name: 0 for a word match, otherwise the edit distance.
+
+    fuzzy_index picks how fuzzy candidates are found: "pigeonhole" scans the
+    names of nearby lengths for unchanged pieces of the term, "qgram" looks them
+    up in a QGramIndex, and "scan" computes the edit distance to every name in
+    one vectorized pass. fuzzy_stats() reports how many candidates each query
+    examined. match_tokens() finds names with the term's words in any order,
+    and match_weighted() ranks them by the IDF of the words they share.
+
+    Every search takes the filters of search_filters.search_filters as keyword
+    arguments (entity_type, programs, country_iso2). Each value of each filter
+    has a bitset of the entities holding it, so the entities a search may
+    return are found with a few integer ORs and ANDs, and names are only
+    matched if one of their entities is among them.
+    """
+
+    def __init__(self, records, fuzzy_index="pigeonhole"):
+        if fuzzy_index not in FUZZY_INDEXES:
+            raise ValueError(f"Unknown fuzzy_index '{fuzzy_index}', expected one of {FUZZY_INDEXES}")
+        self.fuzzy_index = fuzzy_index
+        self.fuzzy_queries = 0
+        self.candidates_examined = 0
+        self.entities = list(records)
+
+        # Every alias, for the full_name word match
+        self._full_names = []
+        self._full_name_entities = []
+        self._full_name_postings = {}
+        self._unindexed_full_names = []
+
+        # Each distinct normalized name once, for the normalized matches
+        self._normalized_names = []
+        self._normalized_entities = []
+        self._normalized_postings = {}
+        normalized_ids = {}
+
+        for position, entity in enumerate(self.entities):
+            for name in entity.get("names") or []:
+                full_name = name.get("full_name") or ""
+                alias_id = len(self._full_names)
+                self._full_names.append(full_name)
+                self._full_name_entities.append(position)
+                if full_name.isascii():
+                    for token in set(_WORD.findall(full_name.upper())):
+                        self._full_name_postings.setdefault(token, []).append(alias_id)
+                else:
+                    # Case folding of non-ASCII characters can match ASCII ones
+                    self._unindexed_full_names.append(alias_id)
+
+                normalized = name.get("normalized_name")
+                if normalized is None:
+                    continue
+                name_id = normalized_ids.get(normalized)
+                if name_id is None:
+                    name_id = normalized_ids[normalized] = len(self._normalized_names)
+                    self._normalized_names.append(normalized)
+                    self._normalized_entities.append(set())
+                    for token in set(_WORD.findall(normalized)):
+                        self._normalized_postings.setdefault(token, []).append(name_id)
+                self._normalized_entities[name_id].add(position)
+
+        # filter -> value -> bitset of the entity positions with that value
+        positions_by_value = {name: {} for name in FILTER_FIELDS}
+        for position, entity in enumerate(self.entities):
+            for name, values in filter_values(entity).items():
+                for value in values:
+                    positions_by_value[name].setdefault(value, []).append(position)
+        self._filter_bits = {
+            name: {value: _bitset(positions, len(self.entities)) for value, positions in by_value.items()}
+            for name, by_value in positions_by_value.items()
+        }
+
+        self._length_buckets = {}
+        self._qgram_index = None
+        self._token_index = None
+        self._token_stats = None
+        self._packed_names = None
+        if fuzzy_index == "scan":
+            self._packed_names = PackedStrings(self._normalized_names)
+        elif fuzzy_index == "qgram":
+            self._qgram_index = QGramIndex(self._normalized_names)
+        elif fuzzy_index == "pigeonhole":
+            by_length = {}
+            for name_id, normalized in enumerate(self._normalized_names):
+                by_length.setdefault(len(normalized), []).append(name_id)
+            self._length_buckets = {
+                length: _LengthBucket(name_ids, self._normalized_names)
+                for length, name_ids in by_length.items()
+            }
+
+    @classmethod
+    def from_jsonl(cls, paths, fuzzy_index="pigeonhole"):
+        """Loads a snapshot written as newline-delimited JSON (LOCAL_JSONL or local_loader shards)."""
+        return cls(read_snapshot(paths), fuzzy_index)
+
+    @classmethod
+    def from_bigquery(cls, project_id, dataset_id, table_id, client=None, fuzzy_index="pigeonhole"):
+        """Loads a snapshot of the BigQuery table."""
+        from google.cloud import bigquery
+
+        client = client or bigquery.Client(project=project_id)
+        rows = client.list_rows(f"{project_id}.{dataset_id}.{table_id}")
+        records = []
+        for row in rows:
+            record = dict(row)
+            record["names"] = [dict(name) for name in record.get("names") or []]
+            record["addresses"] = [dict(address) for address in record.get("addresses") or []]
+            records.append(record)
+        return cls(records, fuzzy_index)
+
+    def _allowed(self, filters):
+        """
+        Returns the bitset of the entity positions passing the filters, or None
+        if no filter is given and every entity passes.
+        """
+        filters = search_filters(**filters)
+        if not filters:
+            return None
+        allowed = -1
+        for name, values in filters.items():
+            bits = 0
+            for value in values:
+                bits |= self._filter_bits[name].get(value, 0)
+            allowed &= bits
+        return allowed
+
+    def _name_allowed(self, name_id, allowed):
+        return allowed is None or any(allowed >> position & 1 for position in self._normalized_entities[name_id])
+
+    def _candidates(self, postings, tokens):
+        """Returns the ids that are in the postings of every token."""
+        lists = sorted((postings.get(token, ()) for token in tokens), key=len)
+        candidates = set(lists[0])
+        for ids in lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(ids)
+        return candidates
+
+    def _fuzzy_candidates(self, term, threshold):
+        if self.fuzzy_index == "qgram":
+            return self._qgram_index.candidates(term, threshold)
+        lengths = range(max(0, len(term) - threshold), len(term) + threshold + 1)
+        buckets = [self._length_buckets[n] for n in lengths if n in self._length_buckets]
+        if len(term) <= threshold:
+            return {name_id for bucket in buckets for name_id in bucket.name_ids}
+        pieces = sorted(set(_pigeonhole_pieces(term, threshold)), key=len, reverse=True)
+        pattern = re.compile("|".join(re.escape(piece) for piece in pieces))
+        candidates = set()
+        for bucket in buckets:
+            candidates |= bucket.containing(pattern)
+        return candidates
+
+    def _edit_distance_matches(self, term, threshold, allowed=None):
+        """
+        Yields (name_id, distance) for the normalized names within threshold edits
+        of term, among the names of the allowed entities.
+        """
+        if threshold < 0:
+            return
+        if self.fuzzy_index == "scan":
+            # Every name, scored in one vectorized pass
+            self.fuzzy_queries += 1
+            self.candidates_examined += len(self._normalized_names)
+            for name_id, distance in self._packed_names.within(term, threshold):
+                if self._name_allowed(name_id, allowed):
+                    yield name_id, distance
+            return
+        candidates = [
+            name_id for name_id in self._fuzzy_candidates(term, threshold) if self._name_allowed(name_id, allowed)
+        ]
+        self.fuzzy_queries += 1
+        self.candidates_examined += len(candidates)
+        for name_id in candidates:
+            distance = bounded_edit_distance(self._normalized_names[name_id], term, threshold)
+            if distance <= threshold:
+                yield name_id, distance
+
+    def match(self, search_term, threshold=2, literal=False, **filters):
+        """
+        Returns [(entity_id, score)] for the matching entities passing the filters,
+        best first. The term is a regex, as in search_bq.search_data, unless
+        literal is set.
+        """
+        if search_term is None:
+            return []
+        normalized_term = normalize_name(search_term)
+        allowed = self._allowed(filters)
+        passes = (lambda position: True) if allowed is None else (lambda position: allowed >> position & 1)
+        best = {}
+
+        # Whole-word match on the original name, case-insensitive
+        term = search_term.upper()
+        pattern, tokens = _word_pattern(term, literal, re.IGNORECASE)
+        if tokens is None:
+            candidates = range(len(self._full_names))
+        elif tokens == [term]:
+            # A single word matches exactly the indexed names that contain it
+            for alias_id in self._full_name_postings.get(term, ()):
+                if passes(self._full_name_entities[alias_id]):
+                    best[self._full_name_entities[alias_id]] = 0
+            candidates = self._unindexed_full_names
+        else:
+            candidates = self._candidates(self._full_name_postings, tokens)
+            candidates.update(self._unindexed_full_names)
+        for alias_id in candidates:
+            if passes(self._full_name_entities[alias_id]) and pattern.search(self._full_names[alias_id]):
+                best[self._full_name_entities[alias_id]] = 0
+
+        if normalized_term is not None:
+            # Whole-word match on the normalized name
+            pattern, tokens = _word_pattern(normalized_term, literal)
+            if tokens is None:
+                candidates = range(len(self._normalized_names))
+            else:
+                candidates = self._candidates(self._normalized_postings, tokens)
+            single_word = tokens == [normalized_term]
+            for name_id in candidates:
+                if not self._name_allowed(name_id, allowed):
+                    continue
+                if single_word or pattern.search(self._normalized_names[name_id]):
+                    for position in self._normalized_entities[name_id]:
+                        if passes(position):
+                            best[position] = 0
+
+            # Fuzzy match on the normalized name
+            for name_id, distance in self._edit_distance_matches(normalized_term, threshold, allowed):
+                for position in self._normalized_entities[name_id]:
+                    if passes(position) and distance < best.get(position, threshold + 1):
+                        best[position] = distance
+
+        ranked = sorted((score, self.entities[position]["entity_id"]) for position, score in best.items())
+        return [(entity_id, score) for score, entity_id in ranked]
+
+    def screen_chunk(self, names, threshold=2, top_k=5, **filters):
+        """
+        Matches a list of (input_id, name) pairs one at a time against the
+        entities passing the filters. Returns one result per name, shaped like
+        search_bq.screen_batch's, so the index can stand in for a BulkScreener in
+        bulk_screening.screen_bulk. Names are literals, and a name that
+        normalizes to nothing matches nothing.
+        """
+        results = []
+        for input_id, name in names:
+            normalized_term = normalize_name(name) if name else None
+            matches = self.match(name, threshold, literal=True, **filters)[:top_k] if normalized_term else []
+            results.append(
+                {
+                    "input_id": input_id,
+                    "search_term": name,
+                    "normalized_term": normalized_term,
+                    "matches": [{"entity_id": entity_id, "score": score} for entity_id, score in matches],
+                }
+            )
+        return results
+
+    def fuzzy_stats(self):
+        """Reports the edit distances computed per fuzzy query, against the number a scan would compute."""
+        names = len(self._normalized_names)
+        mean = self.candidates_examined / self.fuzzy_queries if self.fuzzy_queries else 0.0
+        return {
+            "fuzzy_index": self.fuzzy_index,
+            "queries": self.fuzzy_queries,
+            "candidates_examined": self.candidates_examined,
+            "mean_candidates": mean,
+            "names": names,
+            "candidate_fraction": mean / names if names else 0.0,
+        }
+
+    def match_tokens(self, search_term, min_similarity=DEFAULT_MIN_SIMILARITY, min_overlap=DEFAULT_MIN_OVERLAP,
+                     **filters):
+        """
+        Returns [(entity_id, similarity)] for the entities passing the filters
+        with a name whose words match the normalized term's in any order (see
+        TokenSetIndex), most similar first.
+        """
+        normalized_term = normalize_name(search_term) if search_term else None
+        if normalized_term is None:
+            return []
+        if self._token_index is None:
+            self._token_index = TokenSetIndex(self._normalized_names)
+        allowed = self._allowed(filters)
+        accept = None if allowed is None else (lambda name_id: self._name_allowed(name_id, allowed))
+        best = {}
+        for name_id, similarity in self._token_index.search(normalized_term, min_similarity, min_overlap, accept):
+            for position in self._normalized_entities[name_id]:
+                if allowed is None or allowed >> position & 1:
+                    best[position] = max(similarity, best.get(position, 0.0))
+        ranked = sorted((-similarity, self.entities[position]["entity_id"]) for position, similarity in best.items())
+        return [(entity_id, -negative) for negative, entity_id in ranked]
+
+    def match_weighted(self, search_term, top_k=10, min_score=DEFAULT_MIN_SCORE, **filters):
+        """
+        Returns up to top_k [(entity_id, score)] for the entities passing the
+        filters, best first, scoring names by the IDF-weighted Jaccard similarity
+        of their words and the term's (see TokenStats), so a broad term like
+        "Bank" ranks the names it makes up most of first instead of matching
+        them all equally.
+        """
+        normalized_term = normalize_name(search_term) if search_term else None
+        if normalized_term is None:
+            return []
+        if self._token_index is None:
+            self._token_index = TokenSetIndex(self._normalized_names)
+        if self._token_stats is None:
+            self._token_stats = TokenStats.from_records(self.entities)
+        allowed = self._allowed(filters)
+        accept = None if allowed is None else (lambda name_id: self._name_allowed(name_id, allowed))
+        # Entities can share names and have several, so ask for more names until top_k entities are found
+        names_wanted = top_k
+        while True:
+            matches = self._token_index.search_weighted(
+                normalized_term, self._token_stats, names_wanted, min_score, accept
+            )
+            best = {}
+            for name_id, score in matches:
+                for position in self._normalized_entities[name_id]:
+                    if allowed is None or allowed >> position & 1:
+                        best[position] = max(score, best.get(position, 0.0))
+            if len(best) >= top_k or len(matches) < names_wanted:
+                break
+            names_wanted *= 2
+        ranked = sorted((-score, self.entities[position]["entity_id"]) for position, score in best.items())
+        return [(entity_id, -negative) for negative, entity_id in ranked[:top_k]]
+
+    def search(self, search_term, threshold=2, **filters):
+        """Returns the matching entity records passing the filters, best first."""
+        by_id = {entity_id: score for entity_id, score in self.match(search_term, threshold, **filters)}
+        entities = [e for e in self.entities if e["entity_id"] in by_id]
+        return sorted(entities, key=lambda e: (by_id[e["entity_id"]], e["entity_id"]))
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Search a local snapshot of the sanctions data.")
+    parser.add_argument("search_term", type=str, help="The term to search for.")
+    parser.add_argument("--threshold", type=int, default=2, help="Maximum allowed typo distance.")
+    parser.add_argument("--snapshot", nargs="+", required=True,
+                        help="JSONL snapshot file(s), e.g. the local_loader shards.")
+    parser.add_argument("--fuzzy_index", choices=FUZZY_INDEXES, default="pigeonhole",
+                        help="How fuzzy candidates are found before computing edit distances.")
+    parser.add_argument("--token_set", action="store_true",
+                        help="Match names with the term's words in any order instead of by edit distance.")
+    parser.add_argument("--min_similarity", type=float, default=DEFAULT_MIN_SIMILARITY,
+                        help="With --token_set, the minimum Jaccard similarity of the word sets.")
+    parser.add_argument("--min_overlap", type=int, default=DEFAULT_MIN_OVERLAP,
+                        help="With --token_set, the minimum number of shared words.")
+    parser.add_argument("--weighted", action="store_true",
+                        help="Rank names by the IDF of the words they share with the term and keep the top_k.")
+    parser.add_argument("--min_score", type=float, default=DEFAULT_MIN_SCORE,
+                        help="With --weighted, the minimum IDF-weighted similarity.")
+    parser.add_argument("--top_k", type=int, default=10, help="With --weighted, the entities returned.")
+    parser.add_argument("--type", dest="entity_type", action="append",
+                        help="Only search entities of this type (Individual, Entity, Vessel, Aircraft). Repeatable.")
+    parser.add_argument("--program", dest="programs", action="append",
+                        help="Only search entities under this sanctions program, e.g. SDGT. Repeatable.")
+    parser.add_argument("--country", dest="country_iso2", action="append",
+                        help="Only search entities with an address in this country (ISO2 code). Repeatable.")
+    parser.add_argument("--compare_scan", action="store_true",
+                        help="Also time the search with a brute-force scan and report the speedup.")
+    args = parser.parse_args(argv)
+    filters = search_filters(args.entity_type, args.programs, args.country_iso2)
+
+    start = time.perf_counter()
+    index = LocalSearchIndex.from_jsonl(args.snapshot, args.fuzzy_index)
+    logging.info(f"Loaded {len(index.entities)} entities in {time.perf_counter() - start:.2f}s.")
+
+    if args.token_set or args.weighted:
+        print(f"Searching for the words of '{normalize_name(args.search_term)}' in any order...")
+        start = time.perf_counter()
+        if args.weighted:
+            matches = index.match_weighted(args.search_term, args.top_k, args.min_score, **filters)
+        else:
+            matches = index.match_tokens(args.search_term, args.min_similarity, args.min_overlap, **filters)
+        logging.info(f"Token search took {(time.perf_counter() - start) * 1000:.2f}ms.")
+        if not matches:
+            print("No matching entities found.")
+        by_id = {entity["entity_id"]: entity for entity in index.entities}
+        for entity_id, similarity in matches:
+            print(json.dumps({"similarity": round(similarity, 3), **by_id[entity_id]}, indent=2))
+        return
+
+    print(f"Searching for '{args.search_term}' (Normalized: '{normalize_name(args.search_term)}') "
+          f"with threshold {args.threshold}...")
+    start = time.perf_counter()
+    entities = index.search(args.search_term, args.threshold, **filters)
+    elapsed = time.perf_counter() - start
+    stats = index.fuzzy_stats()
+    logging.info(f"Search took {elapsed * 1000:.2f}ms, computing {stats['candidates_examined']} of "
+                 f"{stats['names']} edit distances ({args.fuzzy_index}).")
+    if args.compare_scan:
+        scan = LocalSearchIndex(index.entities, fuzzy_index="scan")
+        start = time.perf_counter()
+        scan.search(args.search_term, args.threshold, **filters)
+        scan_elapsed = time.perf_counter() - start
+        logging.info(f"Brute-force scan took {scan_elapsed * 1000:.2f}ms: "
+                     f"{scan_elapsed / elapsed:.1f}x slower.")
+
+    if entities:
+        for entity in entities:
+            print(json.dumps(entity, indent=2))
+    else:
+        print("No matching entities found.")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,75 @@
+import re
+
+# Word characters as RE2 (and so BigQuery's REGEXP_CONTAINS) sees them
+_WORD = re.compile(r"[A-Za-z0-9_]+")
+_REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+_SOUNDEX_DIGITS = {
+    letter: digit
+    for letters, digit in (("BFPV", "1"), ("CGJKQSXZ", "2"), ("DT", "3"), ("L", "4"), ("MN", "5"), ("R", "6"))
+    for letter in letters
+}
+
+
+def soundex(word):
+    """
+    Returns the four-character American Soundex code of word, as BigQuery's
+    SOUNDEX() computes it: non-Latin characters are ignored, and a word with no
+    Latin letters has the empty code.
+    """
+    letters = [char for char in word.upper() if "A" <= char <= "Z"]
+    if not letters:
+        return ""
+    code = letters[0]
+    previous = _SOUNDEX_DIGITS.get(letters[0])
+    for letter in letters[1:]:
+        digit = _SOUNDEX_DIGITS.get(letter)
+        if digit is not None and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W don't separate letters with the same digit; vowels do
+        if letter not in "HW":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def word_tokens(text):
+    """Returns the upper-cased words of text, split where RE2's \\b would split them."""
+    return _WORD.findall(text.upper()) if text else []
+
+
+def literal_word_tokens(term):
+    """
+    Returns the words a name must contain for a whole-word match of term, or []
+    if term holds regex syntax and no words can be required.
+    """
+    if not term or _REGEX_METACHARACTERS.intersection(term):
+        return []
+    return word_tokens(term)
+
+
+def sorted_token_key(normalized_name):
+    """Returns the name's distinct words in sorted order, so reordered names share a key."""
+    return " ".join(sorted(set(normalized_name.split()))) if normalized_name else None
+
+
+def phonetic_key(normalized_name):
+    """Returns the Soundex codes of the name's words, in order, so names that sound alike share a key."""
+    if not normalized_name:
+        return None
+    return " ".join(code for code in (soundex(token) for token in normalized_name.split()) if code) or None
+
+
+def search_keys(full_name, normalized_name):
+    """
+    Returns the per-alias fields stored at ingest so searches can filter rows
+    without recomputing them: the full name's words, the normalized name's
+    length, and its sorted-token and phonetic keys.
+    """
+    return {
+        "name_tokens": word_tokens(full_name),
+        "name_length": len(normalized_name) if normalized_name is not None else None,
+        "sorted_token_key": sorted_token_key(normalized_name),
+        "phonetic_key": phonetic_key(normalized_name),
+    }
@@ -1,33 +1,137 @@
+import functools
+import itertools
+import json
+import os
 import re
 
-# Define the normalization rules as a list of (regex_pattern, replacement_string) tuples.
-# Order matters! More specific or context-sensitive rules should generally come first.
-NORMALIZATION_RULES = [
-    (r"[^A-Z0-9\s&]", ""),  # 1. Remove punctuation (keep &) - global
-    (
-        r"\b(PRIVATE|PVT|PTE)\s+(LIMITED|LTD)\b",
-        "PVT LTD",
-    ),  # 2. Handle PRIVATE LIMITED combo
-    (r"\bPTE\b", "PVT"),  # 3. Handle PTE specifically (often safe as suffix)
-    (r"\bLIMITED$", "LTD"),  # 4. LIMITED at end of string
-    (r"\bCORPORATION\b", "CORP"),  # 5. CORPORATION anywhere
-    (r"\bINCORPORATED\b", "INC"),  # 6. INCORPORATED anywhere
-    (r"\bCOMPANY$", "CO"),  # 7. COMPANY at end only
-    (r"\bDEPARTMENT\b", "DEPT"),  # 8. DEPARTMENT anywhere
-    (r"\bBROTHERS$", "BROS"),  # 9. BROTHERS at end
-    (r"\bAND\b", "&"),  # 10. AND anywhere
-    (r"\s+", " "),  # 11. Cleanup multiple spaces to single space
-]
+# The abbreviation dictionary. Bump "version" whenever an entry changes, since the
+# version is stamped on every loaded row and stored names must be re-normalized.
+ABBREVIATIONS_PATH = os.path.join(os.path.dirname(__file__), "abbreviations.json")
+
+_PUNCTUATION = re.compile(r"[^A-Z0-9\s&]")  # Remove punctuation (keep &)
+_TOKENS = re.compile(r"([A-Z0-9]+)")  # Split into [gap, token, gap, token, ..., gap]
+_WHITESPACE = re.compile(r"\s+")
+_PHRASE_END = None  # Trie key marking the end of a phrase
+
+# Distinct names kept per normalizer. The SDN list has roughly 40k aliases.
+DEFAULT_CACHE_SIZE = 65536
+
+
+def load_abbreviations(path=ABBREVIATIONS_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _build_phrase_trie(phrases):
+    trie = {}
+    for phrase in phrases:
+        for tokens in itertools.product(*phrase["match"]):
+            node = trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[_PHRASE_END] = phrase["replace"]
+    return trie
+
+
+class NameNormalizer:
+    """
+    Normalizes names with a data-defined abbreviation dictionary. The name is
+    tokenized once and each token is rewritten through hash lookups, so the cost
+    does not grow with the number of entries. The dictionary has three kinds:
+
+    * phrases: whitespace-separated token sequences, e.g. PRIVATE LIMITED -> PVT LTD
+    * anywhere: single tokens replaced wherever they appear, e.g. CORPORATION -> CORP
+    * at_end: single tokens replaced only when they end the name, e.g. COMPANY -> CO
+
+    Results are memoized in a bounded LRU cache.
+    """
+
+    def __init__(self, abbreviations=None, cache_size=DEFAULT_CACHE_SIZE):
+        if abbreviations is None:
+            abbreviations = load_abbreviations()
+        self.version = str(abbreviations["version"])
+        self._phrases = _build_phrase_trie(abbreviations.get("phrases", []))
+        self._anywhere = dict(abbreviations.get("anywhere", {}))
+        self._at_end = dict(abbreviations.get("at_end", {}))
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._normalize_uncached)
+
+    def _match_phrase(self, pieces, i):
+        """Returns (index of the last token, replacement) of the longest phrase at pieces[i]."""
+        node = self._phrases.get(pieces[i])
+        match = None
+        while node is not None:
+            if _PHRASE_END in node:
+                match = (i, node[_PHRASE_END])
+            # Phrase tokens may only be separated by whitespace
+            if i + 2 >= len(pieces) or not pieces[i + 1].isspace():
+                break
+            i += 2
+            node = node.get(pieces[i])
+        return match
+
+    def _normalize_uncached(self, name):
+        pieces = _TOKENS.split(_PUNCTUATION.sub("", name.upper().strip()))
+        last = len(pieces) - 2
+        # Like a regex "$", the end also allows a single trailing newline
+        ends_cleanly = pieces[-1] in ("", "\n")
+
+        out = [pieces[0]]
+        i = 1
+        while i <= last:
+            token = pieces[i]
+            phrase = self._match_phrase(pieces, i) if token in self._phrases else None
+            if phrase is not None:
+                i, replacement = phrase
+            elif i == last and ends_cleanly and token in self._at_end:
+                replacement = self._at_end[token]
+            else:
+                replacement = self._anywhere.get(token, token)
+            out.append(replacement)
+            out.append(pieces[i + 1])
+            i += 2
+
+        return _WHITESPACE.sub(" ", "".join(out)).strip()
+
+    def normalize(self, name):
+        if not name:
+            return None
+        return self._cached(name)
+
+    __call__ = normalize
+
+    def normalize_many(self, names):
+        """Normalizes an iterable of names, returning a list in the same order."""
+        cached = self._cached
+        return [cached(name) if name else None for name in names]
+
+    def cache_info(self):
+        """Returns hits, misses, current size, max size and hit rate of the memo."""
+        info = self._cached.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+        }
+
+    def clear_cache(self):
+        self._cached.cache_clear()
+
+
+_default_normalizer = NameNormalizer()
+
+NORMALIZATION_VERSION = _default_normalizer.version
 
 
 def normalize_name(name):
-    if not name:
-        return None
+    return _default_normalizer.normalize(name)
 
-    norm = name.upper().strip()
 
-    for pattern, replacement in NORMALIZATION_RULES:
-        norm = re.sub(pattern, replacement, norm)
+def normalize_many(names):
+    return _default_normalizer.normalize_many(names)
 
-    return norm.strip()
 
+def cache_info():
+    return _default_normalizer.cache_info()
@@ -0,0 +1,77 @@
+from collections import Counter
+
+DEFAULT_Q = 3
+# Pads both ends so every character starts and ends q - 1 grams; never occurs in a name
+_PAD = "\x00"
+
+
+def qgrams(text, q=DEFAULT_Q):
+    """Returns the len(text) + q - 1 overlapping q-grams of text, padded at both ends."""
+    padded = _PAD * (q - 1) + text + _PAD * (q - 1)
+    return [padded[i:i + q] for i in range(len(padded) - q + 1)]
+
+
+class QGramIndex:
+    """
+    An inverted index from padded q-grams to the strings containing them, for
+    finding the strings that may be within a few edits of a term.
+
+    One edit changes at most q of a string's q-grams, so strings s and t within
+    k edits share at least max(|s|, |t|) + q - 1 - k * q q-grams (the count
+    filter). Candidates are gathered from the postings of the rarest q-grams of
+    the term, enough that any string meeting the count must appear in one, and
+    then checked against the count. Only those need an exact edit distance.
+    """
+
+    def __init__(self, strings, q=DEFAULT_Q):
+        self.q = q
+        self._lengths = []
+        self._grams = []
+        self._postings = {}
+        self._by_length = {}
+        for string_id, string in enumerate(strings):
+            grams = Counter(qgrams(string, q))
+            self._lengths.append(len(string))
+            self._grams.append(grams)
+            self._by_length.setdefault(len(string), []).append(string_id)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(string_id)
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def candidates(self, term, max_edits):
+        """Returns the ids of the strings that pass the length and count filters for term."""
+        if max_edits < 0:
+            return []
+        min_length = len(term) - max_edits
+        max_length = len(term) + max_edits
+        term_grams = qgrams(term, self.q)
+        # The count needed by the shortest possible candidate, which is |term|
+        min_shared = len(term_grams) - max_edits * self.q
+        if min_shared <= 0:
+            # Short term: the count filter can't exclude anything
+            return [
+                string_id
+                for length in range(max(0, min_length), max_length + 1)
+                for string_id in self._by_length.get(length, ())
+            ]
+
+        # A string sharing min_shared of the term's q-grams has one among any
+        # len(term_grams) - min_shared + 1 of them; take the rarest
+        term_grams.sort(key=lambda gram: len(self._postings.get(gram, ())))
+        seen = set()
+        for gram in term_grams[:len(term_grams) - min_shared + 1]:
+            seen.update(self._postings.get(gram, ()))
+
+        term_counts = Counter(term_grams)
+        out = []
+        for string_id in seen:
+            length = self._lengths[string_id]
+            if length < min_length or length > max_length:
+                continue
+            grams = self._grams[string_id]
+            shared = sum(min(count, grams[gram]) for gram, count in term_counts.items())
+            if shared >= max(length, len(term)) + self.q - 1 - max_edits * self.q:
+                out.append(string_id)
+        return out
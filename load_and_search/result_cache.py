@@ -0,0 +1,177 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 24 * 3600
+# How long a looked-up table version is trusted before asking BigQuery again
+DEFAULT_VERSION_REFRESH_SECONDS = 60
+
+
+def table_snapshot_version(client, table):
+    """
+    Returns a version string for a BigQuery table that changes whenever it is
+    reloaded or MERGEd into: its last modification time and etag.
+    """
+    metadata = client.get_table(table)
+    modified = metadata.modified.isoformat() if metadata.modified else ""
+    return f"{modified}/{metadata.etag or ''}"
+
+
+class SnapshotVersion:
+    """Caches table_snapshot_version for refresh_seconds, so not every search pays a metadata call."""
+
+    def __init__(self, client, table, refresh_seconds=DEFAULT_VERSION_REFRESH_SECONDS):
+        self.client = client
+        self.table = table
+        self.refresh_seconds = refresh_seconds
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        with self._lock:
+            if self._version is None or time.monotonic() - self._checked_at >= self.refresh_seconds:
+                self._version = table_snapshot_version(self.client, self.table)
+                self._checked_at = time.monotonic()
+            return self._version
+
+
+class ResultCache:
+    """
+    Caches search results in an in-process LRU with a TTL, optionally backed by
+    a SQLite file shared across processes and CLI runs. Entries are keyed on the
+    search inputs and the table's snapshot version. Whenever set_snapshot_version
+    sees a new version, every entry is dropped, so a new ingest never serves
+    stale matches.
+
+    Values must be JSON-serializable. Each entry can record the bytes its query
+    processed, so stats() reports how many bytes cache hits avoided.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self._memory = OrderedDict()
+        self._snapshot_version = None
+        self._lock = threading.RLock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, cost INTEGER,"
+                " expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'snapshot_version'").fetchone()
+            self._snapshot_version = row[0] if row else None
+
+    @staticmethod
+    def key(normalized_term, threshold, snapshot_version, search_term=None, kind="search", **options):
+        """
+        Builds a cache key. The raw term is folded to upper case and included
+        because the full_name word match uses it, not just the normalized term.
+        """
+        return json.dumps(
+            [kind, normalized_term, (search_term or "").upper(), threshold, snapshot_version, options],
+            sort_keys=True,
+        )
+
+    def set_snapshot_version(self, version):
+        """Records the table's current version, dropping every entry if it changed."""
+        with self._lock:
+            if version == self._snapshot_version:
+                return
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('snapshot_version', ?)", (version,)
+                )
+            self._snapshot_version = version
+
+    def get(self, key):
+        """Returns (True, value) on a hit and (False, None) on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[2] <= now:
+                del self._memory[key]
+                entry = None
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, cost, expires_at FROM results WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    entry = (json.loads(row[0]), row[1], row[2])
+                    self._remember(key, entry)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            if self._db is not None:
+                self._db.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+            self._memory.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += entry[1] or 0
+            return True, entry[0]
+
+    def put(self, key, value, cost=None):
+        now = time.time()
+        entry = (value, cost, now + self.ttl_seconds)
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, cost, expires_at, last_used)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(value, default=str), cost, entry[2], now),
+                )
+                self._db.execute(
+                    "DELETE FROM results WHERE expires_at <= ? OR key IN ("
+                    " SELECT key FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (now, self.max_entries),
+                )
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for key, or calls compute() and caches what it
+        returns. compute returns (value, cost), where cost is the bytes processed.
+        """
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value, cost = compute()
+        self.put(key, value, cost)
+        return value
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._memory),
+            "bytes_saved": self.bytes_saved,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,259 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from local_search import FUZZY_INDEXES, LocalSearchIndex
+from normalization_logic import normalize_name
+from search_filters import FILTER_FIELDS, search_filters
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class MicroBatcher:
+    """
+    Collects concurrent submissions and hands them to process_batch together. A
+    batch is closed when max_batch_size items are waiting, or max_wait_ms after
+    its first item arrived. process_batch takes a list of items and returns one
+    result per item, in order; each submitter gets its own result (or the batch's
+    exception) through a Future. A result that is an exception fails only its
+    own item.
+    """
+
+    def __init__(self, process_batch, max_batch_size=100, max_wait_ms=10):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._pending = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._pending.append((item, future))
+            self._condition.notify()
+        return future
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = self.process_batch([item for item, _ in batch])
+            except Exception as e:
+                logging.exception("Batch of %d failed.", len(batch))
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._worker.join()
+
+
+class BigQueryBackend:
+    """Screens each batch with one search_bq.screen_batch query per threshold and set of filters."""
+
+    def __init__(self, project_id, dataset_id, table_id, top_k=5):
+        from google.cloud import bigquery
+
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.table_id = table_id
+        self.top_k = top_k
+        self.client = bigquery.Client(project=project_id)
+
+    def __call__(self, requests):
+        from search_bq import screen_batch
+
+        results = [None] * len(requests)
+        groups = {}
+        for position, (name, threshold, filters) in enumerate(requests):
+            key = (threshold, tuple((field, tuple(values)) for field, values in sorted(filters.items())))
+            groups.setdefault(key, []).append((str(position), name))
+        for (threshold, filters), names in groups.items():
+            for row in screen_batch(self.project_id, self.dataset_id, self.table_id, names,
+                                    threshold, self.top_k, client=self.client,
+                                    **{field: list(values) for field, values in filters}):
+                results[int(row["input_id"])] = row["matches"]
+        return results
+
+
+class LocalIndexBackend:
+    """
+    Screens each batch in one pass over a LocalSearchIndex. Names are literals,
+    as in the BigQuery backend, and a request that fails gets its own error
+    without failing the rest of the batch.
+    """
+
+    def __init__(self, index, top_k=5):
+        self.index = index
+        self.top_k = top_k
+
+    def _screen(self, name, threshold, filters):
+        if not normalize_name(name):
+            # A punctuation-only name would match every alias, as in screen_chunk
+            return []
+        return [
+            {"entity_id": entity_id, "score": score}
+            for entity_id, score in self.index.match(name, threshold, literal=True, **filters)[:self.top_k]
+        ]
+
+    def __call__(self, requests):
+        results = []
+        for name, threshold, filters in requests:
+            try:
+                results.append(self._screen(name, threshold, filters))
+            except Exception as e:
+                logging.exception("Screening %r failed.", name)
+                results.append(e)
+        return results
+
+
+class _ScreeningHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Bursts open many connections at once; the default backlog of 5 refuses them
+    request_queue_size = 1024
+
+
+def make_server(batcher, host="127.0.0.1", port=8080, default_threshold=2):
+    """
+    Builds the HTTP server. POST /screen takes {"name": ..., "threshold": ...},
+    optionally with the filters of search_filters.search_filters ("entity_type",
+    "programs", "country_iso2"; a string or a list of strings each), and
+    returns {"name": ..., "matches": [...]}; GET /stats reports batching counters.
+    """
+
+    class ScreeningHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._reply(200, batcher.stats())
+            elif self.path == "/healthz":
+                self._reply(200, {"status": "ok"})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/screen":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                name = request["name"]
+                threshold = int(request.get("threshold", default_threshold))
+                if not isinstance(name, str) or not name.strip():
+                    raise ValueError("blank name")
+                filters = search_filters(*(request.get(field) for field in FILTER_FIELDS))
+                if not all(isinstance(value, str) for values in filters.values() for value in values):
+                    raise TypeError("filter values must be strings")
+            except (ValueError, KeyError, TypeError):
+                self._reply(400, {"error": "expected a JSON body with a non-blank string 'name' "
+                                           "and string filter values"})
+                return
+            try:
+                matches = batcher.submit((name, threshold, filters)).result()
+            except Exception as e:
+                self._reply(502, {"error": str(e)})
+                return
+            self._reply(200, {"name": name, "matches": matches})
+
+    return _ScreeningHTTPServer((host, port), ScreeningHandler)
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Serve sanctions screening over HTTP with request micro-batching.")
+    parser.add_argument("--backend", choices=["bigquery", "local"], default="bigquery",
+                        help="Screen batches with one BigQuery query, or against a local snapshot.")
+    parser.add_argument("--project", help="Google Cloud project (bigquery backend).")
+    parser.add_argument("--table", default="sanctions_data.sdn_entities", help="DATASET.TABLE to screen against.")
+    parser.add_argument("--snapshot", nargs="+", help="JSONL snapshot file(s) (local backend).")
+    parser.add_argument("--fuzzy_index", choices=FUZZY_INDEXES, default="pigeonhole",
+                        help="How the local backend finds fuzzy candidates.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max_batch_size", type=int, default=100, help="Requests per batch at most.")
+    parser.add_argument("--max_wait_ms", type=float, default=10,
+                        help="How long the first request of a batch waits for others.")
+    parser.add_argument("--threshold", type=int, default=2, help="Default maximum typo distance.")
+    parser.add_argument("--top_k", type=int, default=5, help="Matches returned per name.")
+    args = parser.parse_args(argv)
+
+    if args.backend == "local":
+        if not args.snapshot:
+            parser.error("--snapshot is required with --backend local")
+        backend = LocalIndexBackend(LocalSearchIndex.from_jsonl(args.snapshot, args.fuzzy_index), args.top_k)
+    else:
+        if not args.project:
+            parser.error("--project is required with --backend bigquery")
+        dataset_id, table_id = args.table.split(".")
+        backend = BigQueryBackend(args.project, dataset_id, table_id, args.top_k)
+
+    batcher = MicroBatcher(backend, args.max_batch_size, args.max_wait_ms)
+    server = make_server(batcher, args.host, args.port, args.threshold)
+    logging.info(f"Screening on http://{args.host}:{server.server_port} ({args.backend} backend)...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == "__main__":
+    run()
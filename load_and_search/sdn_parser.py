@@ -0,0 +1,406 @@
+import hashlib
+import json
+import re
+import xml.etree.ElementTree as ET
+
+# Namespace map - must be global or passed to DoFn
+ns = {'ns': 'https://sanctionslistservice.ofac.treas.gov/api/PublicationPreview/exports/ADVANCED_XML'}
+
+from name_keys import search_keys
+from normalization_logic import NORMALIZATION_VERSION, normalize_name
+
+# --- Helper functions for XML parsing, extracted from parse_to_jsonl.py ---
+# These run inside the Dataflow DoFns and the local loader, so they must not
+# depend on Beam.
+
+
+def _parse_country(country_elem):
+    c_id = country_elem.attrib.get("ID")
+    iso2 = country_elem.attrib.get("ISO2")
+    name = country_elem.text.strip() if country_elem.text else None
+    return c_id, {"name": name, "iso2": iso2}
+
+
+def _parse_countries(xml_root):
+    country_map = {}
+    for country_elem in xml_root.findall(".//ns:Country", ns):
+        c_id, c_data = _parse_country(country_elem)
+        if c_id:
+            country_map[c_id] = c_data
+    return country_map
+
+
+def _parse_location(loc_elem, country_map):
+    loc_id = loc_elem.attrib.get("ID")
+    loc_data = {
+        "address_line": None,
+        "city": None,
+        "state": None,
+        "postal_code": None,
+        "country": None,
+        "country_iso2": None,
+    }
+
+    # Country
+    loc_country = loc_elem.find("ns:LocationCountry", ns)
+    if loc_country is not None:
+        c_id = loc_country.attrib.get("CountryID")
+        c_data = country_map.get(c_id)
+        if c_data:
+            loc_data["country"] = c_data.get("name")
+            loc_data["country_iso2"] = c_data.get("iso2")
+
+    # Parts
+    address_lines = []
+    for part in loc_elem.findall("ns:LocationPart", ns):
+        type_id = part.attrib.get("LocPartTypeID")
+        loc_part_value = part.find("ns:LocationPartValue", ns)
+
+        # The actual value is inside a <Value> child element
+        val_elem = loc_part_value.find("ns:Value", ns) if loc_part_value is not None else None
+        val = (
+            val_elem.text.strip()
+            if val_elem is not None and val_elem.text
+            else None
+        )
+
+        if val:
+            if type_id in ["1451", "1452", "1453"]:  # Address 1, 2, 3
+                address_lines.append(val)
+            elif type_id == "1454":  # City
+                loc_data["city"] = val
+            elif type_id == "1455":  # State
+                loc_data["state"] = val
+            elif type_id == "1456":  # Postal Code
+                loc_data["postal_code"] = val
+
+    loc_data["address_line"] = ", ".join(address_lines) if address_lines else None
+    return loc_id, loc_data
+
+
+def _parse_locations(xml_root, country_map):
+    location_map = {}
+    for loc_elem in xml_root.findall(".//ns:Location", ns):
+        loc_id, loc_data = _parse_location(loc_elem, country_map)
+        location_map[loc_id] = loc_data
+    return location_map
+
+
+def _add_sanctions_entry(sanctions_entry_elem, profile_programs):
+    profile_id = sanctions_entry_elem.attrib.get("ProfileID")
+    if profile_id:
+        # Extract program from SanctionsMeasure
+        for measure in sanctions_entry_elem.findall("ns:SanctionsMeasure", ns):
+            comment = measure.find("ns:Comment", ns)
+            if comment is not None and comment.text:
+                if profile_id not in profile_programs:
+                    profile_programs[profile_id] = (
+                        set()
+                    )  # Use set to avoid duplicates
+                profile_programs[profile_id].add(comment.text.strip())
+
+
+def _parse_sanctions_programs(xml_root):
+    profile_programs = {}
+    for sanctions_entry_elem in xml_root.findall(".//ns:SanctionsEntry", ns):
+        _add_sanctions_entry(sanctions_entry_elem, profile_programs)
+
+    # Convert sets to sorted lists so the output is the same on every worker
+    return {pid: sorted(programs) for pid, programs in profile_programs.items()}
+
+
+def _parse_distinct_party(elem, location_map, profile_programs):
+    """Builds the entity record for one DistinctParty element, or None if it has no profile."""
+    entity_id = elem.attrib.get('FixedRef')
+    profile = elem.find("ns:Profile", ns)
+    
+    if profile is not None and entity_id:
+        profile_id = profile.attrib.get('ID')
+        party_sub_type_id = profile.attrib.get("PartySubTypeID")
+
+        # Determine Type
+        entity_type = "Unknown"
+        if party_sub_type_id == "1":
+            entity_type = "Vessel"
+        elif party_sub_type_id == "2":
+            entity_type = "Aircraft"
+        elif party_sub_type_id == "3":
+            entity_type = "Entity"
+        elif party_sub_type_id == "4":
+            entity_type = "Individual"
+
+        # Get Programs
+        programs = profile_programs.get(profile_id, [])
+
+        # Get Names
+        aliases = []
+        identity = profile.find("ns:Identity", ns)
+        if identity is not None:
+            for alias in identity.findall("ns:Alias", ns):
+                is_primary = alias.attrib.get("Primary") == "true"
+
+                full_name_parts = []
+                doc_name = alias.find("ns:DocumentedName", ns)
+                if doc_name is not None:
+                    for part in doc_name.findall("ns:DocumentedNamePart", ns):
+                        val = part.find("ns:NamePartValue", ns)
+                        if val is not None and val.text:
+                            full_name_parts.append(val.text.strip())
+
+                full_name = " ".join(full_name_parts)
+                if full_name:
+                    normalized_name = normalize_name(full_name)
+                    aliases.append(
+                        {
+                            "full_name": full_name,
+                            "normalized_name": normalized_name,
+                            "is_primary": is_primary,
+                            "type_id": alias.attrib.get("AliasTypeID"),
+                            **search_keys(full_name, normalized_name),
+                        }
+                    )
+
+        # Get Addresses (Locations)
+        entity_addresses = []
+        for feature in profile.findall("ns:Feature", ns):
+            if feature.attrib.get("FeatureTypeID") == "25":  # Location Feature
+                ver_loc = feature.find("ns:FeatureVersion/ns:VersionLocation", ns)
+                if ver_loc is not None:
+                    loc_id = ver_loc.attrib.get("LocationID")
+                    if loc_id in location_map:
+                        entity_addresses.append(location_map[loc_id])
+
+        # Remarks/Comment
+        comment_elem = elem.find("ns:Comment", ns)
+        remarks = (
+            comment_elem.text.strip()
+            if comment_elem is not None and comment_elem.text
+            else None
+        )
+
+        record = {
+            'entity_id': int(entity_id),
+            'names': aliases,
+            'type': entity_type,
+            'programs': programs,
+            'addresses': entity_addresses,
+            'remarks': remarks,
+            'normalization_version': NORMALIZATION_VERSION,
+        }
+        record['content_hash'] = compute_content_hash(record)
+        return record
+    return None
+
+
+def compute_content_hash(record):
+    """
+    Returns a SHA-256 hex digest of the record's content. Keys are sorted, so the
+    hash only changes when the entity itself does; the hash field is ignored.
+    """
+    content = {key: value for key, value in record.items() if key != "content_hash"}
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+_REFERENCE_VALUE_SETS_TAG = "{%s}ReferenceValueSets" % ns["ns"]
+_LOCATIONS_TAG = "{%s}Locations" % ns["ns"]
+_DISTINCT_PARTIES_TAG = "{%s}DistinctParties" % ns["ns"]
+_SANCTIONS_ENTRIES_TAG = "{%s}SanctionsEntries" % ns["ns"]
+
+
+def parse_sanctions_document(xml_root):
+    """
+    Builds the country, location and program maps and the entity records in a
+    single ordered walk over the top-level sections of the document.
+
+    Only the direct children of each section are visited, so no section is
+    scanned more than once. SanctionsEntries are listed after DistinctParties
+    in the export, so the parties are turned into records once the walk ends.
+    """
+    country_map = {}
+    location_map = {}
+    profile_programs = {}
+    party_elems = []
+
+    for section in xml_root:
+        if section.tag == _REFERENCE_VALUE_SETS_TAG:
+            country_values = section.find("ns:CountryValues", ns)
+            if country_values is not None:
+                for country_elem in country_values:
+                    c_id, c_data = _parse_country(country_elem)
+                    if c_id:
+                        country_map[c_id] = c_data
+        elif section.tag == _LOCATIONS_TAG:
+            for loc_elem in section:
+                loc_id, loc_data = _parse_location(loc_elem, country_map)
+                location_map[loc_id] = loc_data
+        elif section.tag == _DISTINCT_PARTIES_TAG:
+            party_elems.extend(section)
+        elif section.tag == _SANCTIONS_ENTRIES_TAG:
+            for sanctions_entry_elem in section:
+                _add_sanctions_entry(sanctions_entry_elem, profile_programs)
+
+    programs = {pid: sorted(values) for pid, values in profile_programs.items()}
+    records = []
+    for party_elem in party_elems:
+        record = _parse_distinct_party(party_elem, location_map, programs)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+# --- Streaming parser ---
+# Instead of building the whole tree, these helpers walk the file with iterparse
+# and throw each element away once it has been consumed.
+
+_COUNTRY_TAG = "{%s}Country" % ns["ns"]
+_LOCATION_TAG = "{%s}Location" % ns["ns"]
+_SANCTIONS_ENTRY_TAG = "{%s}SanctionsEntry" % ns["ns"]
+_DISTINCT_PARTY_TAG = "{%s}DistinctParty" % ns["ns"]
+
+
+def _iter_xml_records(file_obj, record_tags):
+    """
+    Yields (tag, element) for every element in record_tags as soon as it closes.
+
+    Elements are detached from the tree once they are no longer needed, so only
+    the record currently being read is held in memory. The yielded element is
+    cleared when the generator resumes, so callers must finish with it first.
+    """
+    stack = []
+    open_records = 0
+    for event, elem in ET.iterparse(file_obj, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if elem.tag in record_tags:
+                open_records += 1
+            continue
+
+        stack.pop()
+        if elem.tag in record_tags:
+            open_records -= 1
+            yield elem.tag, elem
+
+        # Anything that is not part of an unfinished record can go. Detaching it
+        # from its parent keeps the (otherwise empty) root from growing.
+        if open_records == 0 and stack:
+            elem.clear()
+            stack[-1].remove(elem)
+
+
+def read_reference_data(file_obj):
+    """
+    Streams the document once and collects the Country, Location and
+    SanctionsEntry lookups. DistinctParty subtrees are skipped.
+
+    Relies on the schema order of the export: countries (ReferenceValueSets)
+    come before Locations.
+    """
+    country_map = {}
+    location_map = {}
+    profile_programs = {}
+
+    reference_tags = {_COUNTRY_TAG, _LOCATION_TAG, _SANCTIONS_ENTRY_TAG}
+    for tag, elem in _iter_xml_records(file_obj, reference_tags):
+        if tag == _COUNTRY_TAG:
+            c_id, c_data = _parse_country(elem)
+            if c_id:
+                country_map[c_id] = c_data
+        elif tag == _LOCATION_TAG:
+            loc_id, loc_data = _parse_location(elem, country_map)
+            location_map[loc_id] = loc_data
+        else:
+            _add_sanctions_entry(elem, profile_programs)
+
+    programs = {pid: sorted(values) for pid, values in profile_programs.items()}
+    return country_map, location_map, programs
+
+
+def iter_entities_streaming(open_file):
+    """
+    Yields entity records from the SDN XML without loading the whole document.
+
+    'open_file' is a zero-argument callable returning a new binary file object.
+    SanctionsEntries come after DistinctParties in the export, so the file is
+    read twice: once for the reference data, then once for the parties, each
+    record being yielded as soon as its DistinctParty closes.
+    """
+    with open_file() as f:
+        _, location_map, profile_programs = read_reference_data(f)
+
+    with open_file() as f:
+        for _, elem in _iter_xml_records(f, {_DISTINCT_PARTY_TAG}):
+            record = _parse_distinct_party(elem, location_map, profile_programs)
+            if record is not None:
+                yield record
+
+
+# --- Byte-range index ---
+# The file is indexed once to find the byte range of every DistinctParty, so
+# that parties can be parsed independently of each other, in any order and by
+# any number of workers, against the reference data read separately.
+
+_PARTY_OPEN = b"<DistinctParty"
+_PARTY_CLOSE = b"</DistinctParty>"
+_ROOT_TAG_RE = re.compile(rb"<(?![?!])([^\s/>]+)[^>]*>")
+_INDEX_CHUNK_SIZE = 1 << 20
+
+
+def index_distinct_parties(file_obj, chunk_size=_INDEX_CHUNK_SIZE):
+    """
+    Scans the raw bytes of the document and returns the root element's start
+    tag and the (start, end) byte offsets of every DistinctParty element.
+    """
+    root_open_tag = None
+    ranges = []
+    buf = b""
+    buf_offset = 0  # File offset of buf[0]
+    pos = 0
+    party_start = None
+
+    while True:
+        chunk = file_obj.read(chunk_size)
+        buf += chunk
+
+        if root_open_tag is None:
+            match = _ROOT_TAG_RE.search(buf)
+            if match is None:
+                if chunk:
+                    continue
+                raise ValueError("Could not find the root element of the SDN XML.")
+            root_open_tag = match.group(0)
+            root_close_tag = b"</" + match.group(1) + b">"
+
+        while True:
+            if party_start is None:
+                i = buf.find(_PARTY_OPEN, pos)
+                if i == -1 or i + len(_PARTY_OPEN) >= len(buf):
+                    break
+                pos = i + len(_PARTY_OPEN)
+                # Skip <DistinctParties>, which shares the prefix
+                if buf[pos:pos + 1] in (b" ", b">", b"\t", b"\r", b"\n"):
+                    party_start = buf_offset + i
+            else:
+                j = buf.find(_PARTY_CLOSE, pos)
+                if j == -1:
+                    break
+                pos = j + len(_PARTY_CLOSE)
+                ranges.append((party_start, buf_offset + pos))
+                party_start = None
+
+        if not chunk:
+            break
+
+        # Drop what has been scanned, keeping enough to complete a split marker
+        keep_from = max(pos, len(buf) - len(_PARTY_CLOSE))
+        buf = buf[keep_from:]
+        buf_offset += keep_from
+        pos = 0
+
+    return root_open_tag, root_close_tag, ranges
+
+
+def parse_party_fragment(fragment, root_open_tag, root_close_tag, location_map, profile_programs):
+    # Wrap the fragment in the root element so the default namespace resolves
+    wrapper = ET.fromstring(root_open_tag + fragment + root_close_tag)
+    return _parse_distinct_party(wrapper[0], location_map, profile_programs)
@@ -1,11 +1,59 @@
 import os
+import sys
 import argparse
+import csv
+import datetime
 import json
+import re
+import uuid
 from google.cloud import bigquery
-from normalization_logic import normalize_name
+from normalization_logic import normalize_name, normalize_many
+from name_keys import literal_word_tokens, phonetic_key, sorted_token_key
+from result_cache import ResultCache, table_snapshot_version
+from search_filters import search_filters
+from token_index import tokens
+from token_stats import DEFAULT_MIN_SCORE
 
-def search_data(project_id, dataset_id, table_id, search_term, threshold):
-    client = bigquery.Client(project=project_id)
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '../queries/bq_schema.json')
+
+# Order of match types when two matches have the same distance
+MATCH_TYPES = ["WORD", "NORMALIZED_WORD", "FUZZY", "TOKEN_SET", "PHONETIC"]
+
+# Batches up to this size are sent as a query parameter; larger ones go through a temporary table
+MAX_PARAMETER_INPUTS = 10000
+
+
+def _filter_condition(filters, alias="t"):
+    """Returns the SQL predicate for the filters on the entity row `alias`, testing @filter_<name>."""
+    conditions = []
+    if "entity_type" in filters:
+        conditions.append(f"{alias}.type IN UNNEST(@filter_entity_type)")
+    if "programs" in filters:
+        conditions.append(
+            f"EXISTS (SELECT 1 FROM UNNEST({alias}.programs) AS program WHERE program IN UNNEST(@filter_programs))"
+        )
+    if "country_iso2" in filters:
+        conditions.append(
+            f"EXISTS (SELECT 1 FROM UNNEST({alias}.addresses) AS address "
+            f"WHERE address.country_iso2 IN UNNEST(@filter_country_iso2))"
+        )
+    return " AND ".join(conditions)
+
+
+def _filter_parameters(filters):
+    return [bigquery.ArrayQueryParameter(f"filter_{name}", "STRING", values) for name, values in filters.items()]
+
+
+def query_entities(project_id, dataset_id, table_id, search_term, threshold, client=None,
+                   entity_type=None, programs=None, country_iso2=None):
+    """
+    Runs the search query and returns the matching entities as dictionaries.
+    Only entities passing the filters (see search_filters) are searched.
+    """
+    client = client or bigquery.Client(project=project_id)
+    filters = search_filters(entity_type, programs, country_iso2)
+    # The filters run before any name is matched; a type filter prunes blocks of the clustered table
+    filter_clause = f"{_filter_condition(filters, 'e')}\n                AND " if filters else ""
     
     # Normalize the search term in Python
     normalized_search_term = normalize_name(search_term)
@@ -28,22 +76,24 @@ def search_data(project_id, dataset_id, table_id, search_term, threshold):
             SELECT 
                 entity_id
             FROM 
-                `{{project_id}}.{dataset_id}.{table_id}`,
-                UNNEST(names) AS n
+                `{{project_id}}.{dataset_id}.{table_id}` AS e,
+                UNNEST(e.names) AS n
             WHERE 
-                (
-                    -- Normalized Fuzzy Match
-                    EDIT_DISTANCE(n.normalized_name, normalized_search_term) <= threshold
-                )
-                OR
-                (
-                    -- Exact Word Match (Substring) on Original Name
-                    REGEXP_CONTAINS(n.full_name, regex_pattern)
-                )
-                OR
-                (
-                    -- Exact Word Match (Substring) on Normalized Name
-                    REGEXP_CONTAINS(n.normalized_name, normalized_regex_pattern)
+                {filter_clause}(
+                    (
+                        -- Normalized Fuzzy Match
+                        EDIT_DISTANCE(n.normalized_name, normalized_search_term) <= threshold
+                    )
+                    OR
+                    (
+                        -- Exact Word Match (Substring) on Original Name
+                        REGEXP_CONTAINS(n.full_name, regex_pattern)
+                    )
+                    OR
+                    (
+                        -- Exact Word Match (Substring) on Normalized Name
+                        REGEXP_CONTAINS(n.normalized_name, normalized_regex_pattern)
+                    )
                 )
             GROUP BY entity_id
             ORDER BY 
@@ -69,36 +119,697 @@ def search_data(project_id, dataset_id, table_id, search_term, threshold):
             bigquery.ScalarQueryParameter("threshold", "INT64", threshold),
             bigquery.ScalarQueryParameter("regex_pattern", "STRING", regex_pattern),
             bigquery.ScalarQueryParameter("normalized_regex_pattern", "STRING", r'\b' + normalized_search_term + r'\b'), # Pass the fully constructed regex for normalized search
-        ]
+        ] + _filter_parameters(filters)
     )
 
-    print(f"Searching for '{search_term}' (Normalized: '{normalized_search_term}') with threshold {threshold}...")
     query_job = client.query(query, job_config=job_config)
     
-    results = query_job.result()
-    
-    if results.total_rows > 0:
-        for row in results:
-            # Convert BigQuery Row to a dictionary and then to JSON
-            entity_dict = dict(row)
-            # The 'names' field is a list of Row objects, convert them to dicts too
-            entity_dict['names'] = [dict(name_row) for name_row in entity_dict['names']]
-            
-            # The 'addresses' field is also a list of Row objects
-            if 'addresses' in entity_dict and entity_dict['addresses']:
-                entity_dict['addresses'] = [dict(addr_row) for addr_row in entity_dict['addresses']]
+    entities = []
+    for row in query_job.result():
+        # Convert BigQuery Row to a dictionary
+        entity_dict = dict(row)
+        # The 'names' field is a list of Row objects, convert them to dicts too
+        entity_dict['names'] = [dict(name_row) for name_row in entity_dict['names']]
+        
+        # The 'addresses' field is also a list of Row objects
+        if 'addresses' in entity_dict and entity_dict['addresses']:
+            entity_dict['addresses'] = [dict(addr_row) for addr_row in entity_dict['addresses']]
+        entities.append(entity_dict)
+    return entities
+
+def cached_search(cache, snapshot_version, search_term, threshold, search, kind="search", **options):
+    """
+    Returns search()'s results through a ResultCache, querying only on a miss.
+    search takes no arguments and returns (query_job, results); the job, if any,
+    supplies the bytes a later hit saves. options holds anything else that
+    changes the results, such as top_k.
+    """
+    cache.set_snapshot_version(snapshot_version)
+    key = cache.key(normalize_name(search_term), threshold, snapshot_version, search_term, kind, **options)
+
+    def compute():
+        query_job, results = search()
+        return results, query_job.total_bytes_processed if query_job is not None else None
+
+    return cache.get_or_compute(key, compute)
+
 
+def search_data(project_id, dataset_id, table_id, search_term, threshold, cache=None,
+                entity_type=None, programs=None, country_iso2=None):
+    print(f"Searching for '{search_term}' (Normalized: '{normalize_name(search_term)}') with threshold {threshold}...")
+    filters = search_filters(entity_type, programs, country_iso2)
+    if filters:
+        print(f"Filters: {json.dumps(filters)}")
+    if cache is None:
+        entities = query_entities(project_id, dataset_id, table_id, search_term, threshold, **filters)
+    else:
+        client = bigquery.Client(project=project_id)
+        entities = cached_search(
+            cache, table_snapshot_version(client, f"{project_id}.{dataset_id}.{table_id}"),
+            search_term, threshold,
+            lambda: (None, query_entities(project_id, dataset_id, table_id, search_term, threshold, client=client,
+                                          **filters)),
+            kind="entities", **filters,
+        )
+    
+    if entities:
+        for entity_dict in entities:
             print(json.dumps(entity_dict, indent=2))
     else:
         print("No matching entities found.")
 
+def _to_python(value):
+    """Converts BigQuery Rows, including nested and repeated ones, into dicts and lists."""
+    if isinstance(value, list):
+        return [_to_python(item) for item in value]
+    if hasattr(value, "items"):
+        return {key: _to_python(item) for key, item in value.items()}
+    return value
+
+
+def load_column_names():
+    with open(SCHEMA_PATH, "r") as f:
+        return [field["name"] for field in json.load(f)]
+
+
+# How the ranked query scores a name: straight from the name columns...
+_NAME_SCORES = """
+                        n.full_name,
+                        IFNULL(REGEXP_CONTAINS(n.full_name, @regex_pattern), FALSE) AS word_match,
+                        IFNULL(REGEXP_CONTAINS(n.normalized_name, @normalized_regex_pattern), FALSE)
+                            AS normalized_word_match,
+                        -- Only names of a similar length can be within the threshold
+                        IF(
+                            ABS(LENGTH(n.normalized_name) - LENGTH(@normalized_search_term)) <= @threshold,
+                            EDIT_DISTANCE(n.normalized_name, @normalized_search_term),
+                            NULL
+                        ) AS edit_distance,
+                        FALSE AS token_set_match,
+                        FALSE AS phonetic_match"""
+
+# ...or filtered on the keys stored at ingest, so the regexes and edit distance
+# only run on the names that can match
+_KEYED_NAME_SCORES = """
+                        n.full_name,
+                        -- A whole-word match needs every word of the term among the name's words
+                        IF(
+                            (SELECT LOGICAL_AND(word IN UNNEST(n.name_tokens)) FROM UNNEST(@term_tokens) AS word)
+                                IS NOT FALSE,
+                            IFNULL(REGEXP_CONTAINS(n.full_name, @regex_pattern), FALSE),
+                            FALSE
+                        ) AS word_match,
+                        IF(
+                            n.name_length >= LENGTH(@normalized_search_term),
+                            IFNULL(REGEXP_CONTAINS(n.normalized_name, @normalized_regex_pattern), FALSE),
+                            FALSE
+                        ) AS normalized_word_match,
+                        IF(
+                            n.name_length BETWEEN LENGTH(@normalized_search_term) - @threshold
+                                AND LENGTH(@normalized_search_term) + @threshold,
+                            EDIT_DISTANCE(n.normalized_name, @normalized_search_term),
+                            NULL
+                        ) AS edit_distance,
+                        IFNULL(n.sorted_token_key = @sorted_token_key, FALSE) AS token_set_match,
+                        IFNULL(n.phonetic_key = @phonetic_key, FALSE) AS phonetic_match"""
+
+
+def build_ranked_query(table, columns=(), use_keys=False, filters=()):
+    """
+    Builds a query that reads the table once. It scores every name of an entity
+    once, keeps the entity's best name, and returns the top @top_k entities with
+    their match type and distance. Only entity_id and `columns` are selected.
+
+    With use_keys, names are pre-filtered on the keys stored at ingest
+    (name_tokens, name_length), and names with the same words in another order
+    (TOKEN_SET) or that sound alike (PHONETIC) also match, ranked after FUZZY
+    with distance @threshold + 1.
+
+    Entities failing the filters (see search_filters) are dropped before
+    their names are scored.
+    """
+    known_columns = load_column_names()
+    unknown = [column for column in columns if column not in known_columns]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    selected = "".join(f"\n            t.{column}," for column in columns if column != "entity_id")
+    name_scores = _KEYED_NAME_SCORES if use_keys else _NAME_SCORES
+    where = f"\n        WHERE {_filter_condition(filters)}" if filters else ""
+
+    return f"""
+    SELECT
+        * EXCEPT (best),
+        best.match_type,
+        best.distance,
+        best.matched_name
+    FROM (
+        SELECT
+            t.entity_id,{selected}
+            (
+                SELECT AS STRUCT
+                    CASE
+                        WHEN word_match THEN 'WORD'
+                        WHEN normalized_word_match THEN 'NORMALIZED_WORD'
+                        WHEN edit_distance <= @threshold THEN 'FUZZY'
+                        WHEN token_set_match THEN 'TOKEN_SET'
+                        ELSE 'PHONETIC'
+                    END AS match_type,
+                    CASE
+                        WHEN word_match OR normalized_word_match THEN 0
+                        WHEN edit_distance <= @threshold THEN edit_distance
+                        ELSE @threshold + 1
+                    END AS distance,
+                    full_name AS matched_name
+                FROM (
+                    SELECT{name_scores}
+                    FROM UNNEST(t.names) AS n
+                )
+                WHERE word_match OR normalized_word_match OR edit_distance <= @threshold
+                    OR token_set_match OR phonetic_match
+                ORDER BY distance, match_type = 'PHONETIC', match_type = 'FUZZY', match_type = 'NORMALIZED_WORD'
+                LIMIT 1
+            ) AS best
+        FROM `{table}` AS t{where}
+    )
+    WHERE best IS NOT NULL
+    ORDER BY
+        best.distance,
+        best.match_type = 'PHONETIC',
+        best.match_type = 'FUZZY',
+        best.match_type = 'NORMALIZED_WORD',
+        entity_id
+    LIMIT @top_k
+    """
+
+
+def _search_filter(column, parameter_prefix, count):
+    """Returns a condition requiring each of count @parameter_prefix_N words among column's, through its search index."""
+    if not count:
+        # Regex terms require no words, so every name is checked
+        return "TRUE"
+    return " AND ".join(
+        f"SEARCH(a.{column}, @{parameter_prefix}_{i}, analyzer => 'NO_OP_ANALYZER')" for i in range(count)
+    )
+
+
+def build_indexed_query(alias_table, table, columns=(), use_keys=False, word_count=0, normalized_word_count=0,
+                        filters=()):
+    """
+    Builds the ranked search against the alias table (see table_layout), with
+    the same match types and ranking as build_ranked_query. The whole-word
+    branches look up the term's words (@word_token_N, @normalized_token_N)
+    with SEARCH() on the indexed token columns, so the regexes only run on
+    names holding all of them. The fuzzy branch reads the names within
+    @threshold of the term's length, which the alias table is clustered on.
+    `columns` are read from `table` for the top_k entities only.
+
+    The type filter runs on the alias table, which is clustered on it. The
+    program and country filters select the passing entity_ids from `table`
+    first, and every branch only reads their names.
+    """
+    known_columns = load_column_names()
+    unknown = [column for column in columns if column not in known_columns]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    selected = "".join(f"\n        t.{column}," for column in columns if column != "entity_id")
+    from_table = f"\n    JOIN `{table}` AS t USING (entity_id)" if selected else ""
+    alias_filters = []
+    if "entity_type" in filters:
+        alias_filters.append("a.type IN UNNEST(@filter_entity_type)")
+    entity_filters = [name for name in filters if name != "entity_type"]
+    allowed = ""
+    if entity_filters:
+        allowed = f"""
+    allowed AS (
+        SELECT t.entity_id FROM `{table}` AS t WHERE {_filter_condition(entity_filters)}
+    ),"""
+        alias_filters.append("a.entity_id IN (SELECT entity_id FROM allowed)")
+    alias_filter = "".join(f"\n            AND {condition}" for condition in alias_filters)
+    keyed_matches = f"""
+        UNION ALL
+        SELECT a.entity_id, a.full_name, 'TOKEN_SET' AS match_type, @threshold + 1 AS distance
+        FROM `{alias_table}` AS a
+        WHERE a.sorted_token_key = @sorted_token_key{alias_filter}
+        UNION ALL
+        SELECT a.entity_id, a.full_name, 'PHONETIC' AS match_type, @threshold + 1 AS distance
+        FROM `{alias_table}` AS a
+        WHERE a.phonetic_key = @phonetic_key{alias_filter}""" if use_keys else ""
+
+    return f"""
+    WITH{allowed}
+    matches AS (
+        SELECT a.entity_id, a.full_name, 'WORD' AS match_type, 0 AS distance
+        FROM `{alias_table}` AS a
+        WHERE {_search_filter("name_tokens", "word_token", word_count)}{alias_filter}
+            AND REGEXP_CONTAINS(a.full_name, @regex_pattern)
+        UNION ALL
+        SELECT a.entity_id, a.full_name, 'NORMALIZED_WORD' AS match_type, 0 AS distance
+        FROM `{alias_table}` AS a
+        WHERE {_search_filter("normalized_tokens", "normalized_token", normalized_word_count)}{alias_filter}
+            AND REGEXP_CONTAINS(a.normalized_name, @normalized_regex_pattern)
+        UNION ALL
+        SELECT a.entity_id, a.full_name, 'FUZZY' AS match_type,
+            EDIT_DISTANCE(a.normalized_name, @normalized_search_term) AS distance
+        FROM `{alias_table}` AS a
+        WHERE a.name_length BETWEEN LENGTH(@normalized_search_term) - @threshold
+                AND LENGTH(@normalized_search_term) + @threshold{alias_filter}
+            AND EDIT_DISTANCE(a.normalized_name, @normalized_search_term) <= @threshold{keyed_matches}
+    ),
+    best AS (
+        SELECT
+            entity_id,
+            ARRAY_AGG(
+                STRUCT(match_type, distance, full_name AS matched_name)
+                ORDER BY distance, match_type = 'PHONETIC', match_type = 'TOKEN_SET', match_type = 'FUZZY',
+                    match_type = 'NORMALIZED_WORD', full_name
+                LIMIT 1
+            )[OFFSET(0)] AS best
+        FROM matches
+        GROUP BY entity_id
+    ),
+    top AS (
+        SELECT * FROM best
+        ORDER BY
+            best.distance,
+            best.match_type = 'PHONETIC',
+            best.match_type = 'TOKEN_SET',
+            best.match_type = 'FUZZY',
+            best.match_type = 'NORMALIZED_WORD',
+            entity_id
+        LIMIT @top_k
+    )
+    SELECT
+        top.entity_id,{selected}
+        top.best.match_type,
+        top.best.distance,
+        top.best.matched_name
+    FROM top{from_table}
+    ORDER BY
+        top.best.distance,
+        top.best.match_type = 'PHONETIC',
+        top.best.match_type = 'TOKEN_SET',
+        top.best.match_type = 'FUZZY',
+        top.best.match_type = 'NORMALIZED_WORD',
+        top.entity_id
+    """
+
+
+def ranked_search(project_id, dataset_id, table_id, search_term, threshold, top_k=10, columns=(),
+                  client=None, use_keys=False, use_search_index=False, alias_table_id=None,
+                  entity_type=None, programs=None, country_iso2=None):
+    """
+    Runs the single-scan ranked search. Returns the query job and up to top_k
+    results, best first. Each result has entity_id, match_type (WORD,
+    NORMALIZED_WORD or FUZZY, and with use_keys TOKEN_SET or PHONETIC),
+    distance, matched_name and the requested columns.
+
+    With use_search_index, names are read from the alias table
+    (alias_table_id defaults to TABLE_aliases) through its search index.
+    Only entities passing the filters (see search_filters) are ranked.
+    """
+    client = client or bigquery.Client(project=project_id)
+    filters = search_filters(entity_type, programs, country_iso2)
+    normalized_search_term = normalize_name(search_term)
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("normalized_search_term", "STRING", normalized_search_term),
+            bigquery.ScalarQueryParameter("threshold", "INT64", threshold),
+            bigquery.ScalarQueryParameter("top_k", "INT64", top_k),
+            bigquery.ScalarQueryParameter(
+                "regex_pattern", "STRING", r'(?i)\b{}\b'.format(search_term.upper() if search_term else "")
+            ),
+            bigquery.ScalarQueryParameter(
+                "normalized_regex_pattern", "STRING",
+                r'\b{}\b'.format(normalized_search_term) if normalized_search_term else None,
+            ),
+        ] + _filter_parameters(filters)
+    )
+    if use_keys:
+        job_config.query_parameters += [
+            bigquery.ScalarQueryParameter("sorted_token_key", "STRING", sorted_token_key(normalized_search_term)),
+            bigquery.ScalarQueryParameter("phonetic_key", "STRING", phonetic_key(normalized_search_term)),
+        ]
+    table = f"{project_id}.{dataset_id}.{table_id}"
+    if use_search_index:
+        words = literal_word_tokens(search_term)
+        normalized_words = literal_word_tokens(normalized_search_term)
+        job_config.query_parameters += [
+            bigquery.ScalarQueryParameter(f"word_token_{i}", "STRING", word) for i, word in enumerate(words)
+        ] + [
+            bigquery.ScalarQueryParameter(f"normalized_token_{i}", "STRING", word)
+            for i, word in enumerate(normalized_words)
+        ]
+        query = build_indexed_query(
+            f"{project_id}.{dataset_id}.{alias_table_id or f'{table_id}_aliases'}", table, columns, use_keys,
+            len(words), len(normalized_words), filters,
+        )
+    else:
+        if use_keys:
+            job_config.query_parameters += [
+                bigquery.ArrayQueryParameter("term_tokens", "STRING", literal_word_tokens(search_term))
+            ]
+        query = build_ranked_query(table, columns, use_keys, filters)
+    query_job = client.query(query, job_config=job_config)
+    return query_job, [_to_python(row) for row in query_job.result()]
+
+
+def build_weighted_query(table, stats_table, columns=(), filters=()):
+    """
+    Builds a query that ranks names by the IDF-weighted Jaccard similarity of
+    their words and @term_tokens, with the IDFs stats_table holds (see
+    token_stats), and returns the top @top_k entities scoring at least
+    @min_score with their score and matched_name.
+
+    Only names holding one of the term's essential words are scored: the
+    commonest words, while their IDFs add up to less than @min_score of the
+    term's, can't make a match on their own. `columns` are read for the top_k
+    entities only, and entities failing the filters (see search_filters) are
+    never scored.
+    """
+    known_columns = load_column_names()
+    unknown = [column for column in columns if column not in known_columns]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    selected = "".join(f"\n        t.{column}," for column in columns if column != "entity_id")
+    from_table = f"\n    JOIN `{table}` AS t USING (entity_id)" if selected else ""
+    where = f"\n        WHERE {_filter_condition(filters)}" if filters else ""
+
+    return f"""
+    WITH term AS (
+        -- Words the snapshot has never seen get the highest weight
+        SELECT
+            token,
+            IFNULL(s.idf, LN(1 + (SELECT MAX(documents) FROM `{stats_table}`)) + 1) AS idf
+        FROM UNNEST(@term_tokens) AS token
+        LEFT JOIN `{stats_table}` AS s USING (token)
+    ),
+    term_weight AS (
+        SELECT SUM(idf) AS weight FROM term
+    ),
+    essential AS (
+        SELECT token
+        FROM (
+            SELECT token, SUM(idf) OVER (ORDER BY idf, token ROWS UNBOUNDED PRECEDING) AS cumulative FROM term
+        )
+        WHERE cumulative >= @min_score * (SELECT weight FROM term_weight) - 1e-9
+    ),
+    candidates AS (
+        SELECT DISTINCT t.entity_id, n.full_name, n.normalized_name
+        FROM `{table}` AS t, UNNEST(t.names) AS n, UNNEST(SPLIT(n.normalized_name, ' ')) AS word
+        JOIN essential ON essential.token = word{where}
+    ),
+    scored AS (
+        SELECT
+            c.entity_id,
+            c.full_name,
+            SUM(term.idf) / (ANY_VALUE(term_weight.weight) + SUM(s.idf) - SUM(term.idf)) AS score
+        FROM candidates AS c,
+            UNNEST(ARRAY(SELECT DISTINCT word FROM UNNEST(SPLIT(c.normalized_name, ' ')) AS word WHERE word != ''))
+                AS word
+        JOIN `{stats_table}` AS s ON s.token = word
+        LEFT JOIN term ON term.token = word
+        CROSS JOIN term_weight
+        GROUP BY c.entity_id, c.full_name, c.normalized_name
+    ),
+    best AS (
+        SELECT entity_id, MAX(score) AS score, ARRAY_AGG(full_name ORDER BY score DESC, full_name LIMIT 1)[OFFSET(0)]
+            AS matched_name
+        FROM scored
+        WHERE score >= @min_score - 1e-9
+        GROUP BY entity_id
+        ORDER BY score DESC, entity_id
+        LIMIT @top_k
+    )
+    SELECT
+        best.entity_id,{selected}
+        best.score,
+        best.matched_name
+    FROM best{from_table}
+    ORDER BY best.score DESC, best.entity_id
+    """
+
+
+def weighted_search(project_id, dataset_id, table_id, search_term, top_k=10, min_score=DEFAULT_MIN_SCORE,
+                    columns=(), client=None, stats_table_id=None, entity_type=None, programs=None,
+                    country_iso2=None):
+    """
+    Runs the IDF-weighted search against the token statistics written at ingest
+    (stats_table_id defaults to TABLE_token_stats). Returns the query job and
+    up to top_k results, best first, each with entity_id, score, matched_name
+    and the requested columns. Only entities passing the filters (see
+    search_filters) are ranked.
+    """
+    client = client or bigquery.Client(project=project_id)
+    filters = search_filters(entity_type, programs, country_iso2)
+    stats_table_id = stats_table_id or f"{table_id}_token_stats"
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter("term_tokens", "STRING", sorted(tokens(normalize_name(search_term)))),
+            bigquery.ScalarQueryParameter("min_score", "FLOAT64", min_score),
+            bigquery.ScalarQueryParameter("top_k", "INT64", top_k),
+        ] + _filter_parameters(filters)
+    )
+    query_job = client.query(
+        build_weighted_query(
+            f"{project_id}.{dataset_id}.{table_id}", f"{project_id}.{dataset_id}.{stats_table_id}", columns,
+            filters,
+        ),
+        job_config=job_config,
+    )
+    return query_job, [_to_python(row) for row in query_job.result()]
+
+
+def iter_names(input_file, name_column="name", id_column=None):
+    """
+    Yields (input_id, name) pairs from a CSV file with a header row or from JSONL,
+    one row at a time. Without id_column, the input_id is the row number.
+    """
+    with open(input_file, "r", encoding="utf-8", newline="") as f:
+        if input_file.endswith((".jsonl", ".json")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for i, row in enumerate(rows):
+            yield str(row[id_column]) if id_column else str(i), row.get(name_column) or ""
+
+
+def read_names(input_file, name_column="name", id_column=None):
+    """Reads every (input_id, name) pair of input_file; see iter_names."""
+    return list(iter_names(input_file, name_column, id_column))
+
+
+def build_batch_query(table, inputs_source, top_k, filters=()):
+    """
+    Builds the query that screens every input against every name in one job and
+    returns the top_k entities per input, scored as in query_entities. Entities
+    failing the filters (see search_filters) are dropped before the cross join.
+    """
+    entities = f"(SELECT * FROM `{table}` AS t WHERE {_filter_condition(filters)})" if filters else f"`{table}`"
+    return f"""
+    WITH inputs AS (
+        SELECT * FROM {inputs_source}
+    ),
+    scored AS (
+        SELECT
+            i.input_id,
+            t.entity_id,
+            n.full_name,
+            CASE
+                WHEN REGEXP_CONTAINS(n.full_name, i.regex_pattern) THEN 0
+                WHEN REGEXP_CONTAINS(n.normalized_name, i.normalized_regex_pattern) THEN 0
+                ELSE EDIT_DISTANCE(n.normalized_name, i.normalized_term)
+            END AS score
+        FROM inputs AS i
+        CROSS JOIN {entities} AS t, UNNEST(t.names) AS n
+        WHERE
+            REGEXP_CONTAINS(n.full_name, i.regex_pattern)
+            OR REGEXP_CONTAINS(n.normalized_name, i.normalized_regex_pattern)
+            OR (
+                -- Only names of a similar length can be within the threshold
+                ABS(LENGTH(n.normalized_name) - LENGTH(i.normalized_term)) <= @threshold
+                AND EDIT_DISTANCE(n.normalized_name, i.normalized_term) <= @threshold
+            )
+    ),
+    best_per_entity AS (
+        SELECT
+            input_id,
+            entity_id,
+            ARRAY_AGG(STRUCT(score, full_name) ORDER BY score LIMIT 1)[OFFSET(0)] AS best
+        FROM scored
+        GROUP BY input_id, entity_id
+    ),
+    ranked AS (
+        SELECT
+            input_id,
+            ARRAY_AGG(
+                STRUCT(entity_id, best.score AS score, best.full_name AS matched_name)
+                ORDER BY best.score, entity_id
+                LIMIT {int(top_k)}
+            ) AS matches
+        FROM best_per_entity
+        GROUP BY input_id
+    )
+    SELECT
+        i.input_id,
+        i.search_term,
+        i.normalized_term,
+        IFNULL(r.matches, []) AS matches
+    FROM inputs AS i
+    LEFT JOIN ranked AS r USING (input_id)
+    """
+
+
+def _batch_inputs(names):
+    normalized = normalize_many(name for _, name in names)
+    for (input_id, name), normalized_term in zip(names, normalized):
+        if not normalized_term:
+            # A blank name would match every alias (\b\b); with NULL patterns it matches nothing
+            yield {
+                "input_id": input_id,
+                "search_term": name,
+                "normalized_term": None,
+                "regex_pattern": None,
+                "normalized_regex_pattern": None,
+            }
+            continue
+        yield {
+            "input_id": input_id,
+            "search_term": name,
+            "normalized_term": normalized_term,
+            # Names are matched literally, so one name with regex syntax cannot fail the whole job
+            "regex_pattern": r"(?i)\b{}\b".format(re.escape(name.upper())),
+            "normalized_regex_pattern": r"\b{}\b".format(normalized_term) if normalized_term else None,
+        }
+
+
+_INPUT_FIELDS = ["input_id", "search_term", "normalized_term", "regex_pattern", "normalized_regex_pattern"]
+
+
+def _inputs_parameter(rows):
+    return bigquery.ArrayQueryParameter(
+        "inputs",
+        "STRUCT",
+        [
+            bigquery.StructQueryParameter(
+                None, *(bigquery.ScalarQueryParameter(field, "STRING", row[field]) for field in _INPUT_FIELDS)
+            )
+            for row in rows
+        ],
+    )
+
+
+def _create_inputs_table(client, project_id, dataset_id, rows):
+    table = bigquery.Table(
+        f"{project_id}.{dataset_id}._screening_inputs_{uuid.uuid4().hex}",
+        schema=[bigquery.SchemaField(field, "STRING") for field in _INPUT_FIELDS],
+    )
+    # Cleaned up after the query, with an expiry in case that never happens
+    table.expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+    table = client.create_table(table)
+    client.load_table_from_json(rows, table, job_config=bigquery.LoadJobConfig(schema=table.schema)).result()
+    return table
+
+
+def screen_batch(project_id, dataset_id, table_id, names, threshold=2, top_k=5, client=None,
+                 entity_type=None, programs=None, country_iso2=None):
+    """
+    Screens a list of (input_id, name) pairs with a single query job and yields one
+    result per input: its normalized term and up to top_k matches as
+    {"entity_id", "score", "matched_name"}, best first. Rows are yielded as they
+    are paged in, so large batches do not have to fit in memory. Only entities
+    passing the filters (see search_filters) are matched.
+    """
+    client = client or bigquery.Client(project=project_id)
+    filters = search_filters(entity_type, programs, country_iso2)
+    rows = list(_batch_inputs(names))
+    table = f"{project_id}.{dataset_id}.{table_id}"
+    parameters = [bigquery.ScalarQueryParameter("threshold", "INT64", threshold)] + _filter_parameters(filters)
+
+    inputs_table = None
+    if len(rows) <= MAX_PARAMETER_INPUTS:
+        inputs_source = "UNNEST(@inputs)"
+        parameters.append(_inputs_parameter(rows))
+    else:
+        inputs_table = _create_inputs_table(client, project_id, dataset_id, rows)
+        inputs_source = f"`{inputs_table.project}.{inputs_table.dataset_id}.{inputs_table.table_id}`"
+
+    try:
+        query_job = client.query(
+            build_batch_query(table, inputs_source, top_k, filters),
+            job_config=bigquery.QueryJobConfig(query_parameters=parameters),
+        )
+        for row in query_job.result():
+            yield {
+                "input_id": row["input_id"],
+                "search_term": row["search_term"],
+                "normalized_term": row["normalized_term"],
+                "matches": [dict(match) for match in row["matches"]],
+            }
+    finally:
+        if inputs_table is not None:
+            client.delete_table(inputs_table, not_found_ok=True)
+
+
+def screen_file(project_id, dataset_id, table_id, input_file, output_file, threshold=2, top_k=5,
+                name_column="name", id_column=None, **filters):
+    """
+    Screens the names in input_file and streams the results to output_file as
+    JSONL. filters are passed on to screen_batch.
+    """
+    names = read_names(input_file, name_column, id_column)
+    print(f"Screening {len(names)} names from '{input_file}' with threshold {threshold}...")
+    screened = flagged = 0
+    with open(output_file, "w", encoding="utf-8") as out:
+        for result in screen_batch(project_id, dataset_id, table_id, names, threshold, top_k, **filters):
+            out.write(json.dumps(result) + "\n")
+            screened += 1
+            flagged += bool(result["matches"])
+    print(f"Wrote {screened} results ({flagged} with matches) to '{output_file}'.")
+    return screened, flagged
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Search BigQuery Sanctions Data.")
-    parser.add_argument("search_term", type=str, help="The term to search for.")
+    parser.add_argument("search_term", type=str, nargs="?", help="The term to search for.")
     parser.add_argument("--threshold", type=int, default=2, help="Maximum allowed typo distance.")
+    parser.add_argument("--input_file", type=str,
+                        help="CSV (with a header row) or JSONL of names to screen in one batch job.")
+    parser.add_argument("--output_file", type=str, default="screening_results.jsonl",
+                        help="Where batch results are written as JSONL.")
+    parser.add_argument("--name_column", type=str, default="name", help="Column/field holding the name.")
+    parser.add_argument("--id_column", type=str, help="Column/field holding an input ID (defaults to row number).")
+    parser.add_argument("--top_k", type=int, default=None,
+                        help="Results kept per name (defaults to 5 in batch mode and 10 with --ranked "
+                             "or --weighted).")
+    parser.add_argument("--ranked", action="store_true",
+                        help="Use the single-scan ranked query, returning match types and distances.")
+    parser.add_argument("--use_keys", action="store_true",
+                        help="With --ranked, filter names on the keys stored at ingest and also match "
+                             "reordered (TOKEN_SET) and sound-alike (PHONETIC) names.")
+    parser.add_argument("--search_index", action="store_true",
+                        help="With --ranked, read names from the alias table written at ingest and look "
+                             "whole words up through its search index.")
+    parser.add_argument("--weighted", action="store_true",
+                        help="Rank names by the IDF of the words they share with the term, from the "
+                             "token statistics written at ingest, and return the top_k.")
+    parser.add_argument("--min_score", type=float, default=DEFAULT_MIN_SCORE,
+                        help="With --weighted, the minimum IDF-weighted similarity.")
+    parser.add_argument("--columns", type=str, default="",
+                        help="Comma-separated table columns to return with --ranked or --weighted, "
+                             "e.g. names,programs.")
+    parser.add_argument("--type", dest="entity_type", action="append",
+                        help="Only search entities of this type (Individual, Entity, Vessel, Aircraft). Repeatable.")
+    parser.add_argument("--program", dest="programs", action="append",
+                        help="Only search entities under this sanctions program, e.g. SDGT. Repeatable.")
+    parser.add_argument("--country", dest="country_iso2", action="append",
+                        help="Only search entities with an address in this country (ISO2 code). Repeatable.")
     parser.add_argument("--output_table", type=str, default="sanctions_data.sdn_entities", 
                         help="Output BigQuery table to search (format: DATASET.TABLE).")
+    parser.add_argument("--cache_path", type=str,
+                        help="SQLite file caching single-term results until the table is next loaded.")
+    parser.add_argument("--cache_ttl", type=int, default=24 * 3600, help="Seconds a cached result stays valid.")
     args = parser.parse_args()
+    if not args.search_term and not args.input_file:
+        parser.error("Give a search_term or --input_file.")
 
     PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT_ID", "your-project-id") 
     
@@ -109,7 +820,46 @@ if __name__ == "__main__":
         print("Error: --output_table must be in the format DATASET.TABLE")
         sys.exit(1)
 
+    cache = ResultCache(ttl_seconds=args.cache_ttl, path=args.cache_path) if args.cache_path else None
+    filters = search_filters(args.entity_type, args.programs, args.country_iso2)
+
     if PROJECT_ID == "your-project-id":
         print("Please set GOOGLE_CLOUD_PROJECT_ID env var or edit the script with your Project ID.")
+    elif args.input_file:
+        screen_file(PROJECT_ID, DATASET_ID, TABLE_ID, args.input_file, args.output_file, args.threshold,
+                    args.top_k or 5, args.name_column, args.id_column, **filters)
+    elif args.ranked or args.weighted:
+        columns = [column for column in args.columns.split(",") if column]
+        print(f"Searching for '{args.search_term}' (Normalized: '{normalize_name(args.search_term)}') "
+              f"with threshold {args.threshold}...")
+        client = bigquery.Client(project=PROJECT_ID)
+        if args.weighted:
+            search = lambda: weighted_search(PROJECT_ID, DATASET_ID, TABLE_ID, args.search_term, args.top_k or 10,
+                                             args.min_score, columns, client=client, **filters)
+            kind, options = "weighted", {"min_score": args.min_score, **filters}
+        else:
+            search = lambda: ranked_search(PROJECT_ID, DATASET_ID, TABLE_ID, args.search_term, args.threshold,
+                                           args.top_k or 10, columns, client=client, use_keys=args.use_keys,
+                                           use_search_index=args.search_index, **filters)
+            kind = "keyed" if args.use_keys else "ranked"
+            options = {"search_index": args.search_index, **filters}
+        if cache is None:
+            query_job, results = search()
+        else:
+            query_job = None
+            results = cached_search(
+                cache, table_snapshot_version(client, f"{PROJECT_ID}.{args.output_table}"),
+                args.search_term, args.threshold, search, kind=kind,
+                top_k=args.top_k or 10, columns=columns, **options,
+            )
+        for result in results:
+            print(json.dumps(result, indent=2))
+        if not results:
+            print("No matching entities found.")
+        if query_job is not None:
+            print(f"Bytes processed: {query_job.total_bytes_processed}, billed: {query_job.total_bytes_billed}")
     else:
-        search_data(PROJECT_ID, DATASET_ID, TABLE_ID, args.search_term, args.threshold)
+        search_data(PROJECT_ID, DATASET_ID, TABLE_ID, args.search_term, args.threshold, cache, **filters)
+    if cache is not None:
+        print(f"Cache: {cache.stats()}")
+        cache.close()
@@ -0,0 +1,26 @@
+# The filters a search accepts, each testing one attribute of an entity
+FILTER_FIELDS = ("entity_type", "programs", "country_iso2")
+
+
+def search_filters(entity_type=None, programs=None, country_iso2=None):
+    """
+    Returns {filter: [values]} for the filters given. Each takes one value or a
+    list, and an entity passes when it has any of the values: its type, one of
+    its programs, or the country_iso2 of one of its addresses.
+    """
+    filters = {}
+    for name, values in zip(FILTER_FIELDS, (entity_type, programs, country_iso2)):
+        if values:
+            filters[name] = [values] if isinstance(values, str) else list(values)
+    return filters
+
+
+def filter_values(entity):
+    """Returns {filter: set of values} for an entity record, as the filters test them."""
+    return {
+        "entity_type": {entity["type"]} if entity.get("type") else set(),
+        "programs": set(entity.get("programs") or ()),
+        "country_iso2": {
+            address["country_iso2"] for address in entity.get("addresses") or () if address.get("country_iso2")
+        },
+    }
@@ -0,0 +1,114 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from result_cache import DEFAULT_VERSION_REFRESH_SECONDS, SnapshotVersion
+from search_bq import cached_search, query_entities, ranked_search
+from search_filters import search_filters
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+def _pooled_client(project_id, max_concurrency):
+    """
+    Builds a BigQuery client on an authorized session whose connection pool can
+    hold one connection per concurrent search, instead of the default 10.
+    """
+    import google.auth
+    import requests
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud import bigquery
+
+    credentials, default_project = google.auth.default(scopes=bigquery.Client.SCOPE)
+    session = AuthorizedSession(credentials)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+    session.mount("https://", adapter)
+    return bigquery.Client(project=project_id or default_project, credentials=credentials, _http=session)
+
+
+class SearchService:
+    """
+    A long-lived search front end. It creates the BigQuery client, its credentials
+    and its HTTP session once, and runs searches concurrently on a bounded thread
+    pool. search() and search_many() are coroutines that return the results as
+    Python objects; close() releases the pool and the session, unless the client
+    was passed in, in which case closing it is left to the caller.
+
+    Given a ResultCache, repeated searches are answered from it until the table's
+    snapshot version changes; the version is re-read at most every
+    version_refresh_seconds. Cached results are shared, so don't mutate them.
+
+    Searches take the filters of search_bq.search_filters as keyword arguments
+    (entity_type, programs, country_iso2), which are pushed into the query.
+    """
+
+    def __init__(self, project_id, dataset_id="sanctions_data", table_id="sdn_entities",
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, ranked=True, top_k=10, columns=(), client=None,
+                 cache=None, version_refresh_seconds=DEFAULT_VERSION_REFRESH_SECONDS):
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.table_id = table_id
+        self.ranked = ranked
+        self.top_k = top_k
+        self.columns = tuple(columns)
+        self.max_concurrency = max_concurrency
+        self._owns_client = client is None
+        self.client = client or _pooled_client(project_id, max_concurrency)
+        self.cache = cache
+        self._snapshot = SnapshotVersion(
+            self.client, f"{project_id}.{dataset_id}.{table_id}", version_refresh_seconds
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="search")
+
+    def _query(self, search_term, threshold, filters):
+        if self.ranked:
+            return ranked_search(
+                self.project_id, self.dataset_id, self.table_id, search_term, threshold,
+                self.top_k, self.columns, client=self.client, **filters,
+            )
+        return None, query_entities(
+            self.project_id, self.dataset_id, self.table_id, search_term, threshold, client=self.client, **filters
+        )
+
+    def search_sync(self, search_term, threshold=2, **filters):
+        """Runs one search on the calling thread."""
+        filters = search_filters(**filters)
+        if self.cache is None:
+            _, results = self._query(search_term, threshold, filters)
+            return results
+        return cached_search(
+            self.cache, self._snapshot.current(), search_term, threshold,
+            lambda: self._query(search_term, threshold, filters),
+            kind="ranked" if self.ranked else "entities", top_k=self.top_k, columns=self.columns, **filters,
+        )
+
+    async def search(self, search_term, threshold=2, **filters):
+        loop = asyncio.get_running_loop()
+        # The executor's size is the concurrency limit; excess searches queue for a thread
+        return await loop.run_in_executor(
+            self._executor, functools.partial(self.search_sync, search_term, threshold, **filters)
+        )
+
+    async def search_many(self, search_terms, threshold=2, return_exceptions=False, **filters):
+        """Runs the searches concurrently and returns their results in input order."""
+        return await asyncio.gather(
+            *(self.search(term, threshold, **filters) for term in search_terms),
+            return_exceptions=return_exceptions,
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        if self._owns_client:
+            self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -0,0 +1,80 @@
+import json
+import os
+
+ALIAS_SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '../queries/alias_schema.json')
+
+# sdn_entities is clustered on the columns searches filter and join on
+CLUSTERING_FIELDS = ["type", "entity_id"]
+
+# The alias table is clustered on name_length first, so the fuzzy branch's
+# length window prunes storage blocks instead of reading every name
+ALIAS_CLUSTERING_FIELDS = ["name_length", "type"]
+
+# The words of full_name and normalized_name, as RE2's \b splits them, indexed
+# whole so SEARCH() can look up a term's words exactly
+SEARCH_INDEX_COLUMNS = ["name_tokens", "normalized_tokens"]
+
+_DDL_TYPES = {"INTEGER": "INT64", "FLOAT": "FLOAT64", "BOOLEAN": "BOOL"}
+
+
+def load_alias_schema():
+    with open(ALIAS_SCHEMA_PATH, "r") as f:
+        return json.load(f)
+
+
+def _column_ddl(field):
+    column_type = _DDL_TYPES.get(field["type"], field["type"])
+    if field.get("mode") == "REPEATED":
+        return f"{field['name']} ARRAY<{column_type}>"
+    if field.get("mode") == "REQUIRED":
+        return f"{field['name']} {column_type} NOT NULL"
+    return f"{field['name']} {column_type}"
+
+
+def search_index_name(alias_table):
+    """Returns the search index's name, which BigQuery scopes to the table's dataset."""
+    return f"{alias_table.replace(':', '.').split('.')[-1]}_tokens"
+
+
+def build_alias_table_script(entities_table, alias_table):
+    """
+    Builds the script that keeps alias_table, one row per name of every entity,
+    in step with entities_table. The table and its search index are created on
+    the first run. Later runs replace the rows in one transaction, so searches
+    never see a half-written table, and BigQuery updates the index in the
+    background; until it catches up, SEARCH() scans the unindexed rows.
+    """
+    columns = ",\n        ".join(_column_ddl(field) for field in load_alias_schema())
+    return f"""
+    CREATE TABLE IF NOT EXISTS `{alias_table}` (
+        {columns}
+    )
+    CLUSTER BY {', '.join(ALIAS_CLUSTERING_FIELDS)};
+
+    CREATE SEARCH INDEX IF NOT EXISTS {search_index_name(alias_table)}
+    ON `{alias_table}` ({', '.join(SEARCH_INDEX_COLUMNS)})
+    OPTIONS (analyzer = 'NO_OP_ANALYZER');
+
+    BEGIN TRANSACTION;
+    DELETE FROM `{alias_table}` WHERE TRUE;
+    INSERT INTO `{alias_table}`
+    SELECT
+        t.entity_id,
+        t.type,
+        n.full_name,
+        n.normalized_name,
+        n.name_tokens,
+        REGEXP_EXTRACT_ALL(IFNULL(n.normalized_name, ''), r'[A-Za-z0-9_]+') AS normalized_tokens,
+        n.name_length,
+        n.sorted_token_key,
+        n.phonetic_key
+    FROM `{entities_table}` AS t, UNNEST(t.names) AS n;
+    COMMIT TRANSACTION;
+    """
+
+
+def refresh_alias_table(client, entities_table, alias_table):
+    """Rewrites alias_table from entities_table after a load. Returns the finished script job."""
+    script_job = client.query(build_alias_table_script(entities_table, alias_table))
+    script_job.result()
+    return script_job
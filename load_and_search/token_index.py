@@ -0,0 +1,136 @@
+import heapq
+import math
+
+from name_keys import sorted_token_key
+
+DEFAULT_MIN_SIMILARITY = 0.6
+DEFAULT_MIN_OVERLAP = 1
+
+
+def tokens(normalized_name):
+    """Returns the distinct words of a normalized name."""
+    return frozenset(normalized_name.split()) if normalized_name else frozenset()
+
+
+class TokenSetIndex:
+    """
+    Finds strings with the same words as a term in any order, for names like
+    "CHUOL JAMES KOANG" searched as "JAMES KOANG CHUOL".
+
+    Strings are indexed by sorted-token key, for exact reorderings, and by
+    token, with a posting list of the strings holding each one. A string
+    matches when it shares at least min_overlap words with the term and the
+    Jaccard similarity of their word sets is at least min_similarity.
+    Candidates come from the posting lists of the term's rarest words: a string
+    sharing t of the term's n words holds one of any n - t + 1 of them. Only
+    those candidates are compared, instead of every string.
+    """
+
+    def __init__(self, strings):
+        self._tokens = []
+        self._postings = {}
+        self._by_key = {}
+        for string_id, string in enumerate(strings):
+            string_tokens = tokens(string)
+            self._tokens.append(string_tokens)
+            for token in string_tokens:
+                self._postings.setdefault(token, []).append(string_id)
+            if string_tokens:
+                self._by_key.setdefault(sorted_token_key(string), []).append(string_id)
+        self.candidates_examined = 0
+        self._weighted_stats = None
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def reordered(self, normalized_term):
+        """Returns the ids of the strings with exactly the term's words, in any order."""
+        return list(self._by_key.get(sorted_token_key(normalized_term), ()))
+
+    def search(self, normalized_term, min_similarity=DEFAULT_MIN_SIMILARITY, min_overlap=DEFAULT_MIN_OVERLAP,
+               accept=None):
+        """
+        Returns [(string_id, similarity)] for the matching strings, most similar
+        first. Given accept, only the string_ids it returns true for are compared.
+        """
+        term_tokens = tokens(normalized_term)
+        if not term_tokens:
+            return []
+        if min_similarity >= 1:
+            # Only exact reorderings qualify: one lookup by sorted-token key
+            if min_overlap > len(term_tokens):
+                return []
+            return [
+                (string_id, 1.0) for string_id in self.reordered(normalized_term) if accept is None or accept(string_id)
+            ]
+        # Jaccard >= s needs |A & B| >= s * |B|, as the union is at least |B|
+        needed = max(min_overlap, math.ceil(min_similarity * len(term_tokens) - 1e-9), 1)
+        if needed > len(term_tokens):
+            return []
+        rarest = sorted(term_tokens, key=lambda token: len(self._postings.get(token, ())))
+        candidates = set()
+        for token in rarest[:len(term_tokens) - needed + 1]:
+            candidates.update(self._postings.get(token, ()))
+        if accept is not None:
+            candidates = {string_id for string_id in candidates if accept(string_id)}
+        self.candidates_examined += len(candidates)
+
+        matches = []
+        for string_id in candidates:
+            string_tokens = self._tokens[string_id]
+            overlap = len(term_tokens & string_tokens)
+            if overlap < needed:
+                continue
+            similarity = overlap / len(term_tokens | string_tokens)
+            if similarity >= min_similarity:
+                matches.append((string_id, similarity))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches
+
+    def _weighted_postings(self, stats):
+        """Returns the posting lists sorted by the strings' IDF weight under stats, lightest first."""
+        if self._weighted_stats is not stats:
+            self._weights = [stats.weight(string_tokens) for string_tokens in self._tokens]
+            self._weighted = {
+                token: sorted(ids, key=self._weights.__getitem__) for token, ids in self._postings.items()
+            }
+            self._weighted_stats = stats
+        return self._weighted
+
+    def search_weighted(self, normalized_term, stats, top_k=10, min_score=0.5, accept=None):
+        """
+        Returns up to top_k [(string_id, score)] for the strings scoring at least
+        min_score under stats (a TokenStats), best first.
+
+        Only strings holding one of the term's essential words are candidates.
+        A string of weight w scores at most (term weight) / w, so the posting
+        lists are merged lightest first and the search stops once that bound is
+        below the top_k-th score found, without visiting the heavier strings.
+        Given accept, strings it returns false for are skipped unscored.
+        """
+        term_tokens = tokens(normalized_term)
+        if not term_tokens or top_k <= 0:
+            return []
+        postings = self._weighted_postings(stats)
+        total = stats.weight(term_tokens)
+        lists = [postings[token] for token in stats.essential_tokens(term_tokens, min_score) if token in postings]
+
+        # A min-heap of (score, -string_id), so the worst of the top_k is first
+        top = []
+        seen = set()
+        for string_id in heapq.merge(*lists, key=self._weights.__getitem__):
+            bound = min(1.0, total / self._weights[string_id])
+            if bound < min_score or (len(top) == top_k and bound < top[0][0]):
+                break
+            if string_id in seen or (accept is not None and not accept(string_id)):
+                continue
+            seen.add(string_id)
+            self.candidates_examined += 1
+            score = stats.score(term_tokens, self._tokens[string_id])
+            if score < min_score:
+                continue
+            if len(top) < top_k:
+                heapq.heappush(top, (score, -string_id))
+            elif (score, -string_id) > top[0]:
+                heapq.heapreplace(top, (score, -string_id))
+        return sorted(((-negative, score) for score, negative in top), key=lambda match: (-match[1], match[0]))
@@ -0,0 +1,115 @@
+import math
+
+from token_index import tokens
+
+# A name must cover this share of the term's weight (weighted Jaccard) to match
+DEFAULT_MIN_SCORE = 0.5
+
+
+def idf(document_frequency, documents):
+    """Smoothed inverse document frequency, as BulkScreener weights its n-grams."""
+    return math.log((1 + documents) / (1 + document_frequency)) + 1
+
+
+class TokenStats:
+    """
+    Document frequencies of the words of normalized names, with one document
+    per alias, so common words like "BANK" or "CORP" weigh less than rare ones.
+
+    A name scores the weighted Jaccard similarity of its words and the term's:
+    the IDF of the words they share over the IDF of all their words. A word the
+    snapshot has never seen gets the highest weight.
+    """
+
+    def __init__(self, frequencies, documents):
+        self.frequencies = dict(frequencies)
+        self.documents = documents
+
+    @classmethod
+    def from_names(cls, normalized_names):
+        frequencies, documents = {}, 0
+        for normalized_name in normalized_names:
+            if normalized_name is None:
+                continue
+            documents += 1
+            for token in tokens(normalized_name):
+                frequencies[token] = frequencies.get(token, 0) + 1
+        return cls(frequencies, documents)
+
+    @classmethod
+    def from_records(cls, records):
+        """Counts the normalized names of every alias of the records."""
+        return cls.from_names(
+            name.get("normalized_name") for record in records for name in record.get("names") or []
+        )
+
+    @classmethod
+    def from_bigquery(cls, client, stats_table):
+        """Reads a table written by build_token_stats_query."""
+        frequencies, documents = {}, 0
+        for row in client.list_rows(stats_table):
+            frequencies[row["token"]] = row["document_frequency"]
+            documents = row["documents"]
+        return cls(frequencies, documents)
+
+    def idf(self, token):
+        return idf(self.frequencies.get(token, 0), self.documents)
+
+    def weight(self, words):
+        return sum(self.idf(token) for token in words)
+
+    def score(self, term_tokens, name_tokens):
+        """Returns the weighted Jaccard similarity of two word sets."""
+        matched = self.weight(term_tokens & name_tokens)
+        union = self.weight(term_tokens | name_tokens)
+        return matched / union if union else 0.0
+
+    def essential_tokens(self, term_tokens, min_score=DEFAULT_MIN_SCORE):
+        """
+        Returns the term's words a name needs at least one of to score min_score.
+        A name's score is at most the share of the term's weight it holds, so
+        the commonest words, while their weights add up to less than min_score
+        of the total, can't make a match on their own (the MaxScore cutoff).
+        """
+        ranked = sorted(term_tokens, key=lambda token: (self.idf(token), token))
+        cutoff = min_score * self.weight(term_tokens)
+        cumulative = 0.0
+        for position, token in enumerate(ranked):
+            cumulative += self.idf(token)
+            if cumulative >= cutoff - 1e-9:
+                return frozenset(ranked[position:])
+        return frozenset()
+
+
+def build_token_stats_query(entities_table, stats_table):
+    """
+    Builds the statement that rewrites stats_table with the document frequency
+    and IDF of every word of the normalized names in entities_table, one
+    document per alias, as TokenStats.from_records counts them.
+    """
+    return f"""
+    CREATE OR REPLACE TABLE `{stats_table}` AS
+    WITH alias_tokens AS (
+        SELECT ARRAY(SELECT DISTINCT token FROM UNNEST(SPLIT(n.normalized_name, ' ')) AS token WHERE token != '')
+            AS tokens
+        FROM `{entities_table}` AS t, UNNEST(t.names) AS n
+        WHERE n.normalized_name IS NOT NULL
+    ),
+    totals AS (
+        SELECT COUNT(*) AS documents FROM alias_tokens
+    )
+    SELECT
+        token,
+        COUNT(*) AS document_frequency,
+        ANY_VALUE(totals.documents) AS documents,
+        LN((1 + ANY_VALUE(totals.documents)) / (1 + COUNT(*))) + 1 AS idf
+    FROM alias_tokens, UNNEST(alias_tokens.tokens) AS token, totals
+    GROUP BY token
+    """
+
+
+def refresh_token_stats(client, entities_table, stats_table):
+    """Recomputes stats_table from entities_table after a load. Returns the finished query job."""
+    query_job = client.query(build_token_stats_query(entities_table, stats_table))
+    query_job.result()
+    return query_job
@@ -152,6 +152,9 @@ resource "google_cloudfunctions2_function" "download_sdn_function" {
       BUCKET_NAME = google_storage_bucket.dataflow_temp_bucket.name
       PROJECT_ID  = var.project_id
       REGION      = var.region
+      # Resumable upload chunk size; "gzip" stores the snapshot as sdn_advanced.xml.gz
+      UPLOAD_CHUNK_SIZE_MB = "16"
+      STORAGE_FORMAT       = "xml"
     }
   }
 
@@ -35,5 +35,22 @@ resource "google_bigquery_table" "table" {
 
   schema = file("../queries/bq_schema.json")
 
+  # Matches table_layout.CLUSTERING_FIELDS, which the loaders set on every load
+  clustering = ["type", "entity_id"]
+
   deletion_protection = false # For ease of development/testing
 }
+
+# One row per name, rewritten from the entities table after every load. The
+# loaders create its search index (CREATE SEARCH INDEX has no Terraform resource).
+resource "google_bigquery_table" "aliases" {
+  dataset_id = google_bigquery_dataset.dataset.dataset_id
+  table_id   = "${var.table_id}_aliases"
+
+  schema = file("../queries/alias_schema.json")
+
+  # Matches table_layout.ALIAS_CLUSTERING_FIELDS
+  clustering = ["name_length", "type"]
+
+  deletion_protection = false
+}
@@ -0,0 +1,182 @@
+import pytest
+
+# A trimmed-down SDN Advanced XML document that keeps the section order of the
+# real OFAC export: reference values, locations, parties, then sanctions entries.
+SAMPLE_SDN_XML = """<?xml version="1.0" encoding="utf-8"?>
+<Sanctions xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns="https://sanctionslistservice.ofac.treas.gov/api/PublicationPreview/exports/ADVANCED_XML">
+  <DateOfIssue>
+    <Year>2025</Year>
+    <Month>11</Month>
+    <Day>20</Day>
+  </DateOfIssue>
+  <ReferenceValueSets>
+    <AliasTypeValues>
+      <AliasType ID="1400">A.K.A.</AliasType>
+      <AliasType ID="1403">Name</AliasType>
+    </AliasTypeValues>
+    <CountryValues>
+      <Country ID="11082" ISO2="CU">Cuba</Country>
+      <Country ID="11144" ISO2="AE">United Arab Emirates</Country>
+      <Country ID="11203" ISO2="SS">South Sudan</Country>
+    </CountryValues>
+  </ReferenceValueSets>
+  <Locations>
+    <Location ID="200">
+      <LocationCountry CountryID="11082" />
+      <LocationPart LocPartTypeID="1451">
+        <LocationPartValue Primary="true">
+          <Comment />
+          <Value>Calle 23 No. 64</Value>
+        </LocationPartValue>
+      </LocationPart>
+      <LocationPart LocPartTypeID="1454">
+        <LocationPartValue Primary="true">
+          <Value>Havana</Value>
+        </LocationPartValue>
+      </LocationPart>
+    </Location>
+    <Location ID="201">
+      <LocationCountry CountryID="11144" />
+      <LocationPart LocPartTypeID="1454">
+        <LocationPartValue Primary="true">
+          <Value>Dubai</Value>
+        </LocationPartValue>
+      </LocationPart>
+      <LocationPart LocPartTypeID="1456">
+        <LocationPartValue Primary="true">
+          <Value>PO Box 1234</Value>
+        </LocationPartValue>
+      </LocationPart>
+    </Location>
+  </Locations>
+  <DistinctParties>
+    <DistinctParty FixedRef="36">
+      <Comment />
+      <Profile ID="36" PartySubTypeID="3">
+        <Identity ID="4001" FixedRef="36" Primary="true" False="false">
+          <Alias FixedRef="36" AliasTypeID="1403" Primary="true" LowQuality="false">
+            <DocumentedName ID="5001" FixedRef="36" DocNameStatusID="1">
+              <DocumentedNamePart>
+                <NamePartValue NamePartGroupID="6001" ScriptID="215">AEROCARIBBEAN AIRLINES</NamePartValue>
+              </DocumentedNamePart>
+            </DocumentedName>
+          </Alias>
+          <Alias FixedRef="36" AliasTypeID="1400" Primary="false" LowQuality="false">
+            <DocumentedName ID="5002" FixedRef="36" DocNameStatusID="1">
+              <DocumentedNamePart>
+                <NamePartValue NamePartGroupID="6002" ScriptID="215">AERO-CARIBBEAN</NamePartValue>
+              </DocumentedNamePart>
+            </DocumentedName>
+          </Alias>
+        </Identity>
+        <Feature ID="7001" FeatureTypeID="25">
+          <FeatureVersion ID="7101" ReliabilityID="1">
+            <Comment />
+            <VersionLocation LocationID="200" />
+          </FeatureVersion>
+        </Feature>
+      </Profile>
+    </DistinctParty>
+    <DistinctParty FixedRef="16910">
+      <Comment>Linked To: SOUTH SUDAN PEOPLE'S LIBERATION ARMY.</Comment>
+      <Profile ID="16910" PartySubTypeID="4">
+        <Identity ID="4002" FixedRef="16910" Primary="true" False="false">
+          <Alias FixedRef="16910" AliasTypeID="1403" Primary="true" LowQuality="false">
+            <DocumentedName ID="5003" FixedRef="16910" DocNameStatusID="1">
+              <DocumentedNamePart>
+                <NamePartValue NamePartGroupID="6003" ScriptID="215">CHUOL</NamePartValue>
+              </DocumentedNamePart>
+              <DocumentedNamePart>
+                <NamePartValue NamePartGroupID="6004" ScriptID="215">James Koang</NamePartValue>
+              </DocumentedNamePart>
+            </DocumentedName>
+          </Alias>
+        </Identity>
+        <Feature ID="7002" FeatureTypeID="8">
+          <FeatureVersion ID="7102" ReliabilityID="1">
+            <Comment />
+          </FeatureVersion>
+        </Feature>
+      </Profile>
+    </DistinctParty>
+    <DistinctParty FixedRef="23665">
+      <Comment />
+      <Profile ID="23665" PartySubTypeID="3">
+        <Identity ID="4003" FixedRef="23665" Primary="true" False="false">
+          <Alias FixedRef="23665" AliasTypeID="1403" Primary="true" LowQuality="false">
+            <DocumentedName ID="5004" FixedRef="23665" DocNameStatusID="1">
+              <DocumentedNamePart>
+                <NamePartValue NamePartGroupID="6005" ScriptID="215">BLUE LAGOON GROUP LTD</NamePartValue>
+              </DocumentedNamePart>
+            </DocumentedName>
+          </Alias>
+        </Identity>
+        <Feature ID="7003" FeatureTypeID="25">
+          <FeatureVersion ID="7103" ReliabilityID="1">
+            <VersionLocation LocationID="201" />
+          </FeatureVersion>
+        </Feature>
+      </Profile>
+    </DistinctParty>
+    <DistinctParty FixedRef="9647">
+      <Comment />
+      <Profile ID="9647" PartySubTypeID="1">
+        <Identity ID="4004" FixedRef="9647" Primary="true" False="false">
+          <Alias FixedRef="9647" AliasTypeID="1403" Primary="true" LowQuality="false">
+            <DocumentedName ID="5005" FixedRef="9647" DocNameStatusID="1">
+              <DocumentedNamePart>
+                <NamePartValue NamePartGroupID="6006" ScriptID="215">SEA STAR</NamePartValue>
+              </DocumentedNamePart>
+            </DocumentedName>
+          </Alias>
+        </Identity>
+      </Profile>
+    </DistinctParty>
+  </DistinctParties>
+  <ProfileRelationships>
+    <ProfileRelationship ID="8001" From-ProfileID="16910" To-ProfileID="36" RelationTypeID="1555" />
+  </ProfileRelationships>
+  <SanctionsEntries>
+    <SanctionsEntry ID="9001" ProfileID="36" ListID="1550">
+      <EntryEvent ID="9101" EntryEventTypeID="1" LegalBasisID="1">
+        <Comment />
+      </EntryEvent>
+      <SanctionsMeasure ID="9201" SanctionsTypeID="1">
+        <Comment>CUBA</Comment>
+      </SanctionsMeasure>
+    </SanctionsEntry>
+    <SanctionsEntry ID="9002" ProfileID="16910" ListID="1550">
+      <SanctionsMeasure ID="9202" SanctionsTypeID="1">
+        <Comment>SOUTH SUDAN</Comment>
+      </SanctionsMeasure>
+      <SanctionsMeasure ID="9203" SanctionsTypeID="1">
+        <Comment>SOUTH SUDAN</Comment>
+      </SanctionsMeasure>
+    </SanctionsEntry>
+    <SanctionsEntry ID="9003" ProfileID="23665" ListID="1550">
+      <SanctionsMeasure ID="9204" SanctionsTypeID="1">
+        <Comment>SDGT</Comment>
+      </SanctionsMeasure>
+    </SanctionsEntry>
+  </SanctionsEntries>
+</Sanctions>
+"""
+
+
+@pytest.fixture
+def sample_sdn_xml_path(tmp_path):
+    """Writes the sample SDN document to a temporary file and returns its path."""
+    path = tmp_path / "sdn_advanced.xml"
+    path.write_text(SAMPLE_SDN_XML, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def sample_sdn_xml_gz_path(tmp_path):
+    """Writes the sample SDN document gzip-compressed, as stored with STORAGE_FORMAT=gzip."""
+    import gzip
+
+    path = tmp_path / "sdn_advanced.xml.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(SAMPLE_SDN_XML)
+    return str(path)
@@ -0,0 +1,236 @@
+import pytest
+import csv
+import json
+import random
+import sys
+import os
+import xml.etree.ElementTree as ET
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+import bulk_screening
+import sdn_parser
+from bulk_screening import BulkScreener, char_ngrams, screen_bulk
+from local_search import LocalSearchIndex
+from conftest import SAMPLE_SDN_XML
+
+
+@pytest.fixture
+def records():
+    return sdn_parser.parse_sanctions_document(ET.fromstring(SAMPLE_SDN_XML.encode("utf-8")))
+
+
+def test_char_ngrams_are_padded():
+    assert char_ngrams("AB") == [" AB", "AB "]
+    assert char_ngrams("") == ["  "]
+
+
+@pytest.mark.parametrize("candidates", [0, -1])
+def test_candidates_must_be_positive(records, candidates):
+    with pytest.raises(ValueError, match="candidates"):
+        BulkScreener(records, candidates=candidates)
+
+
+def test_screen_chunk_finds_robust_cases(records):
+    screener = BulkScreener(records)
+    names = [("a", "Blue Lagoon Grp"), ("b", "Aerocaribean"), ("c", "Zzyzx Unrelated"), ("d", "")]
+    results = screener.screen_chunk(names, threshold=2, top_k=3)
+
+    assert [r["input_id"] for r in results] == ["a", "b", "c", "d"]
+    assert results[0]["matches"][0]["entity_id"] == 23665
+    assert results[0]["matches"][0]["score"] == 0
+    assert results[1]["matches"][0]["entity_id"] == 36
+    assert results[1]["matches"][0]["score"] == 1
+    assert 0 < results[1]["matches"][0]["similarity"] <= 1
+    assert results[2]["matches"] == []
+    assert results[3]["matches"] == []
+
+
+def test_matches_local_index_when_every_alias_is_a_candidate():
+    rng = random.Random(4)
+    words = ["BANK", "STAR", "OCEAN", "TRADING", "NORTH", "GOLD", "PETRO", "MARINE"]
+    records = []
+    for i in range(150):
+        name = " ".join(rng.sample(words, rng.randint(1, 3)))
+        records.append({"entity_id": i, "names": [{"full_name": name.title(), "normalized_name": name}]})
+    screener = BulkScreener(records, candidates=len(records), max_df=1.0)
+    index = LocalSearchIndex(records)
+    terms = [" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(30)] + ["Gold Sttar", "Ocaen"]
+
+    results = screener.screen_chunk([(str(i), t) for i, t in enumerate(terms)], threshold=2, top_k=len(records))
+    for term, result in zip(terms, results):
+        found = sorted((m["score"], m["entity_id"]) for m in result["matches"])
+        expected = sorted((score, entity_id) for entity_id, score in index.match(term, 2))
+        assert found == expected, term
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_screen_bulk_keeps_input_order(records, workers):
+    screener = BulkScreener(records)
+    names = [(str(i), name) for i, name in enumerate(["Sea Star", "Blue Lagoon Group", "James"] * 7)]
+    results = list(screen_bulk(screener, iter(names), chunk_size=4, workers=workers))
+
+    assert [r["input_id"] for r in results] == [input_id for input_id, _ in names]
+    assert results[0]["matches"][0]["entity_id"] == 9647
+
+
+def test_run_writes_results(records, tmp_path):
+    snapshot = tmp_path / "snapshot.jsonl"
+    snapshot.write_text("".join(json.dumps(r) + "\n" for r in records))
+    names = tmp_path / "customers.csv"
+    names.write_text("customer,name\nc1,Sea Star\nc2,Nobody At All\n")
+    output = tmp_path / "results.jsonl"
+
+    bulk_screening.run([
+        "--input_file", str(names), "--snapshot", str(snapshot), "--output_file", str(output),
+        "--id_column", "customer", "--workers", "1",
+    ])
+
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r["input_id"] for r in results] == ["c1", "c2"]
+    assert results[0]["matches"][0]["entity_id"] == 9647
+    assert results[1]["matches"] == []
+
+
+def test_common_ngrams_are_left_out_of_name_vectors():
+    records = [
+        {"entity_id": i, "names": [{"full_name": n, "normalized_name": n}]}
+        for i, n in enumerate(["ALPHA TRADING", "BETA TRADING", "GAMMA TRADING", "DELTA SHIPPING"])
+    ]
+    screener = BulkScreener(records, max_df=0.5)
+    columns, _ = screener._vectorize("ALPHA TRADING")
+    grams = {gram for gram, column in screener.vocabulary.items() if column in set(columns.tolist())}
+    assert "TRA" not in grams
+    assert "ALP" in grams
+    # A name made only of common n-grams keeps them
+    assert len(screener._vectorize("TRADING")[0]) > 0
+
+
+def _write_inputs(path, count):
+    names = ["Sea Star", "Blue Lagoon Grp", "Nobody At All", "James"]
+    path.write_text("customer,name\n" + "".join(f"c{i},{names[i % 4]}\n" for i in range(count)))
+
+
+@pytest.mark.parametrize("engine", ["index", "tfidf"])
+def test_screen_file_writes_csv_rows_per_match(records, tmp_path, engine):
+    screener = LocalSearchIndex(records) if engine == "index" else BulkScreener(records)
+    inputs, output = tmp_path / "customers.csv", tmp_path / "matches.csv"
+    _write_inputs(inputs, 8)
+
+    screened, flagged = bulk_screening.screen_file(screener, str(inputs), str(output), id_column="customer",
+                                                   workers=1, top_k=1)
+
+    rows = list(csv.DictReader(output.open()))
+    assert (screened, flagged) == (8, 6)
+    assert [row["input_id"] for row in rows] == ["c0", "c1", "c3", "c4", "c5", "c7"]
+    assert rows[0]["entity_id"] == "9647" and rows[0]["rank"] == "1"
+    assert not os.path.exists(str(output) + ".checkpoint")
+
+
+def test_screen_file_resumes_from_checkpoint(records, tmp_path, monkeypatch):
+    screener = LocalSearchIndex(records)
+    inputs, output = tmp_path / "customers.csv", tmp_path / "results.jsonl"
+    _write_inputs(inputs, 10)
+    expected = tmp_path / "expected.jsonl"
+    bulk_screening.screen_file(screener, str(inputs), str(expected), workers=1)
+
+    # Crash after the 7th result: rows 1-6 are checkpointed, row 7 was written but not checkpointed
+    real_writer = bulk_screening._ResultWriter.write
+    written = []
+
+    def crashing_write(self, result):
+        real_writer(self, result)
+        written.append(result)
+        if len(written) == 7:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(bulk_screening._ResultWriter, "write", crashing_write)
+    with pytest.raises(KeyboardInterrupt):
+        bulk_screening.screen_file(screener, str(inputs), str(output), workers=1, checkpoint_every=3)
+    checkpoint = json.loads(open(str(output) + ".checkpoint").read())
+    assert checkpoint["rows_done"] == 6
+
+    monkeypatch.setattr(bulk_screening._ResultWriter, "write", real_writer)
+    screened, _ = bulk_screening.screen_file(screener, str(inputs), str(output), workers=1, checkpoint_every=3)
+
+    assert screened == 4
+    assert output.read_text() == expected.read_text()
+    assert not os.path.exists(str(output) + ".checkpoint")
+
+
+def test_checkpoint_for_another_input_is_refused(records, tmp_path):
+    output = tmp_path / "results.jsonl"
+    output.write_text("")
+    (tmp_path / "results.jsonl.checkpoint").write_text(json.dumps({"input_file": "/elsewhere.csv"}))
+    inputs = tmp_path / "customers.csv"
+    _write_inputs(inputs, 2)
+
+    with pytest.raises(ValueError):
+        bulk_screening.screen_file(LocalSearchIndex(records), str(inputs), str(output), workers=1)
+    screened, _ = bulk_screening.screen_file(LocalSearchIndex(records), str(inputs), str(output), workers=1,
+                                             restart=True)
+    assert screened == 2
+
+
+def test_index_engine_on_worker_processes(records):
+    names = [(str(i), name) for i, name in enumerate(["Sea Star", "Aerocaribean", "James"] * 5)]
+    results = list(screen_bulk(LocalSearchIndex(records), names, chunk_size=2, workers=2))
+    assert [r["input_id"] for r in results] == [input_id for input_id, _ in names]
+    assert results[1]["matches"] == [{"entity_id": 36, "score": 1}]
+
+
+def test_index_engine_matches_names_literally(records):
+    index = LocalSearchIndex(records + [
+        {"entity_id": 1, "names": [{"full_name": "Acme (Pty) Ltd", "normalized_name": "ACME PTY LTD"}]},
+        {"entity_id": 2, "names": [{"full_name": "AXB Holdings", "normalized_name": "AXB HOLDINGS"}]},
+    ])
+    results = index.screen_chunk([("a", "("), ("b", "ACME (PTY) LTD"), ("c", "A.B")], threshold=0, top_k=5)
+
+    assert results[0]["matches"] == []
+    assert results[1]["matches"] == [{"entity_id": 1, "score": 0}]
+    assert results[2]["matches"] == []
+
+
+def test_index_engine_skips_blank_names(records):
+    results = LocalSearchIndex(records).screen_chunk([("a", ""), ("b", "   "), ("c", "*"), ("d", None)])
+    assert [r["matches"] for r in results] == [[], [], [], []]
+    assert [r["normalized_term"] for r in results] == [None, "", "", None]
+
+
+@pytest.mark.parametrize("engine", ["index", "tfidf"])
+def test_screen_bulk_applies_filters(records, engine):
+    screener = LocalSearchIndex(records) if engine == "index" else BulkScreener(records)
+    names = [("a", "Blue Lagoon Group"), ("b", "Aerocaribbean"), ("c", "Sea Star")]
+
+    results = list(screen_bulk(screener, names, workers=1, entity_type="Entity", country_iso2=["AE"]))
+    assert [[m["entity_id"] for m in r["matches"]] for r in results] == [[23665], [], []]
+
+    results = list(screen_bulk(screener, names, workers=2, chunk_size=1, programs="CUBA"))
+    assert [[m["entity_id"] for m in r["matches"]] for r in results] == [[], [36], []]
+
+
+@pytest.mark.parametrize("changed, match", [
+    ({"entity_type": None}, "filters"),
+    ({"threshold": 1}, "threshold"),
+    ({"top_k": 3}, "top_k"),
+    ({"engine": "tfidf"}, "engine"),
+])
+def test_checkpoint_with_other_settings_is_refused(records, tmp_path, changed, match):
+    inputs = tmp_path / "names.csv"
+    inputs.write_text("name\nSea Star\nJames\n")
+    output = tmp_path / "out.jsonl"
+    checkpoint = tmp_path / "out.jsonl.checkpoint"
+    checkpoint.write_text(json.dumps({
+        "input_file": str(inputs), "engine": "LocalSearchIndex", "threshold": 2, "top_k": 5,
+        "filters": {"entity_type": ["Vessel"]}, "rows_done": 1, "flagged": 1, "output_bytes": 0,
+    }))
+    output.write_text("")
+    settings = dict({"engine": "index", "threshold": 2, "top_k": 5, "entity_type": "Vessel"}, **changed)
+    screener = LocalSearchIndex(records) if settings.pop("engine") == "index" else BulkScreener(records)
+
+    with pytest.raises(ValueError, match=match):
+        bulk_screening.screen_file(screener, str(inputs), str(output), workers=1, **settings)
+    screened, _ = bulk_screening.screen_file(
+        LocalSearchIndex(records), str(inputs), str(output), workers=1, entity_type="Vessel"
+    )
+    assert screened == 1
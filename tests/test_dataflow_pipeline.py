@@ -0,0 +1,188 @@
+import pytest
+import sys
+import os
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+import dataflow_pipeline
+from conftest import SAMPLE_SDN_XML
+
+
+def _parse_document():
+    dofn = dataflow_pipeline.ParseSanctionsXmlDoFn()
+    return list(dofn.process(SAMPLE_SDN_XML))
+
+
+def test_document_dofn_parses_xml_string():
+    records = _parse_document()
+    assert [r["entity_id"] for r in records] == [36, 16910, 23665, 9647]
+
+
+def test_streaming_dofn_reads_from_path(sample_sdn_xml_path):
+    dofn = dataflow_pipeline.StreamParseSanctionsXmlDoFn()
+    assert list(dofn.process(sample_sdn_xml_path)) == _parse_document()
+
+
+def test_split_pipeline_on_direct_runner(sample_sdn_xml_path):
+    import apache_beam as beam
+    from apache_beam.testing.test_pipeline import TestPipeline
+    from apache_beam.testing.util import assert_that, equal_to
+
+    expected = _parse_document()
+    with TestPipeline() as p:
+        input_path = p | beam.Create([sample_sdn_xml_path])
+        reference_data = input_path | "Ref" >> beam.ParDo(
+            dataflow_pipeline.ReadReferenceDataDoFn()
+        )
+        records = (
+            input_path
+            | "Index" >> beam.ParDo(dataflow_pipeline.IndexDistinctPartiesDoFn())
+            | "Parse" >> beam.ParDo(
+                dataflow_pipeline.ParseDistinctPartyRangesDoFn(),
+                reference_data=beam.pvalue.AsSingleton(reference_data),
+            )
+        )
+        assert_that(records, equal_to(expected))
+
+
+@pytest.mark.parametrize("write_method", ["LOCAL_JSONL", "LOCAL_PARQUET"])
+def test_run_writes_local_sink(sample_sdn_xml_path, tmp_path, write_method):
+    output_path = str(tmp_path / "out" / "sdn_entities")
+    dataflow_pipeline.run(
+        [
+            "--input_file", sample_sdn_xml_path,
+            "--project", "test-project",
+            "--temp_location", str(tmp_path / "tmp"),
+            "--write_method", write_method,
+            "--output_path", output_path,
+        ]
+    )
+
+    output_files = sorted((tmp_path / "out").iterdir())
+    assert output_files
+    if write_method == "LOCAL_JSONL":
+        import json
+        records = [json.loads(line) for f in output_files for line in f.read_text().splitlines()]
+    else:
+        import pyarrow.parquet as pq
+        records = [row for f in output_files for row in pq.read_table(f).to_pylist()]
+
+    expected = sorted(_parse_document(), key=lambda r: r["entity_id"])
+    assert sorted(records, key=lambda r: r["entity_id"]) == expected
+
+
+def test_run_streams_gzip_input(sample_sdn_xml_gz_path, tmp_path):
+    import json
+
+    output_path = str(tmp_path / "out" / "sdn_entities")
+    dataflow_pipeline.run(
+        [
+            "--input_file", sample_sdn_xml_gz_path,
+            "--project", "test-project",
+            "--temp_location", str(tmp_path / "tmp"),
+            "--write_method", "LOCAL_JSONL",
+            "--output_path", output_path,
+        ]
+    )
+
+    records = [
+        json.loads(line)
+        for f in sorted((tmp_path / "out").iterdir())
+        for line in f.read_text().splitlines()
+    ]
+    expected = sorted(_parse_document(), key=lambda r: r["entity_id"])
+    assert sorted(records, key=lambda r: r["entity_id"]) == expected
+
+
+def test_run_requires_output_table_for_bigquery(sample_sdn_xml_path, tmp_path):
+    with pytest.raises(SystemExit):
+        dataflow_pipeline.run(
+            [
+                "--input_file", sample_sdn_xml_path,
+                "--project", "test-project",
+                "--temp_location", str(tmp_path / "tmp"),
+            ]
+        )
+
+
+def test_diff_against_existing_classifies_changes():
+    dofn = dataflow_pipeline.DiffAgainstExistingDoFn()
+    record = {"entity_id": 1, "names": [], "content_hash": "abc"}
+
+    def diff(new, existing):
+        return list(dofn.process((1, {"new": new, "existing": existing})))
+
+    assert diff([record], []) == [dict(record, change_type="INSERT")]
+    assert diff([record], ["old"]) == [dict(record, change_type="UPDATE")]
+    assert diff([record], ["abc"]) == []
+    deleted = diff([], ["abc"])
+    assert deleted[0]["entity_id"] == 1
+    assert deleted[0]["change_type"] == "DELETE"
+
+
+def test_build_merge_query_covers_schema():
+    schema = [
+        {"name": "entity_id", "type": "INTEGER"},
+        {"name": "names", "type": "RECORD"},
+        {"name": "content_hash", "type": "STRING"},
+    ]
+    query = dataflow_pipeline.build_merge_query("p.d.t", "p.d.t_changes", schema)
+
+    assert "MERGE `p.d.t` AS T" in query
+    assert "USING `p.d.t_changes` AS S" in query
+    assert "ON T.entity_id = S.entity_id" in query
+    assert "names = S.names" in query
+    assert "content_hash = S.content_hash" in query
+    assert "entity_id = S.entity_id," not in query
+    assert "INSERT (entity_id, names, content_hash)" in query
+
+
+def test_load_job_report_sums_the_runs_load_jobs():
+    from unittest.mock import MagicMock
+    from datetime import datetime, timezone
+
+    def job(job_id, dataset_id, files, size, started, ended):
+        return MagicMock(job_type="load", job_id=job_id, input_files=files, input_file_bytes=size,
+                         destination=MagicMock(dataset_id=dataset_id),
+                         started=datetime(2025, 1, 1, 0, 0, started, tzinfo=timezone.utc),
+                         ended=datetime(2025, 1, 1, 0, 0, ended, tzinfo=timezone.utc))
+
+    client = MagicMock()
+    client.list_jobs.return_value = [
+        job("beam_bq_job_LOAD_a", "sanctions_data", 2, 3000, 10, 20),
+        job("beam_bq_job_LOAD_b", "sanctions_data", 1, 1000, 12, 25),
+        job("beam_bq_job_LOAD_c", "other", 9, 9000, 0, 59),
+        job("manual_load", "sanctions_data", 9, 9000, 0, 59),
+    ]
+    started_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    report = dataflow_pipeline._load_job_report(client, "p:sanctions_data.sdn_entities", started_at)
+
+    assert client.list_jobs.call_args[1]["min_creation_time"] == started_at
+    assert report["load_jobs"] == 2
+    assert report["staged_files"] == 3
+    assert report["staged_bytes"] == 4000
+    assert report["load_seconds"] == 15
+
+
+def test_write_api_report_reads_the_appended_bytes():
+    from unittest.mock import MagicMock
+    from datetime import datetime, timezone
+
+    client = MagicMock()
+    client.get_dataset.return_value.location = "asia-southeast1"
+    client.query.return_value.result.return_value = [{"appended_bytes": 5000, "appended_rows": 4}]
+    started_at = datetime(2025, 1, 1, 0, 0, 30, tzinfo=timezone.utc)
+    first = datetime(2025, 1, 1, 0, 1, 0, tzinfo=timezone.utc)
+    finished = datetime(2025, 1, 1, 0, 1, 45, tzinfo=timezone.utc)
+
+    report = dataflow_pipeline._write_api_report(client, "p:sanctions_data.sdn_entities", started_at, first, finished)
+
+    query = client.query.call_args[0][0]
+    assert "`p`.`region-asia-southeast1`.INFORMATION_SCHEMA.WRITE_API_TIMELINE_BY_PROJECT" in query
+    params = {p.name: p.value for p in client.query.call_args[1]["job_config"].query_parameters}
+    assert params["table_id"] == "sdn_entities"
+    assert params["started_at"] == datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert report["appended_bytes"] == 5000
+    assert report["appended_rows"] == 4
+    assert report["write_seconds"] == 45
@@ -0,0 +1,111 @@
+import pytest
+import hashlib
+import io
+import sys
+import os
+from unittest.mock import MagicMock
+
+pytest.importorskip("functions_framework")
+pytest.importorskip("googleapiclient")
+
+# Add the download_sdn directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "download_sdn"))
+import main
+
+CONTENT = b"<Sanctions />"
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=CONTENT, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield self.content
+
+
+@pytest.fixture
+def gcs(monkeypatch):
+    """A bucket with a previous snapshot whose metadata each test sets."""
+    monkeypatch.setenv("BUCKET_NAME", "bucket")
+    monkeypatch.setenv("PROJECT_ID", "project")
+    monkeypatch.setenv("REGION", "region")
+    monkeypatch.delenv("STORAGE_FORMAT", raising=False)
+
+    bucket = MagicMock()
+    bucket.previous = MagicMock(metadata={})
+    bucket.get_blob.return_value = bucket.previous
+    bucket.uploaded = io.BytesIO()
+    upload = MagicMock()
+    upload.__enter__.return_value = bucket.uploaded
+    bucket.blob.return_value.open.return_value = upload
+    bucket.copied = MagicMock(metadata=None)
+    bucket.copy_blob.return_value = bucket.copied
+
+    client = MagicMock()
+    client.bucket.return_value = bucket
+    monkeypatch.setattr(main.storage, "Client", lambda: client)
+    bucket.launch = MagicMock()
+    monkeypatch.setattr(main, "launch_dataflow_job", bucket.launch)
+    return bucket
+
+
+def _call(monkeypatch, response, force=False):
+    get = MagicMock(return_value=response)
+    monkeypatch.setattr(main.requests, "get", get)
+    request = MagicMock(args={"force": "true"} if force else {})
+    return main.download_sdn_list(request), get
+
+
+def test_not_modified_skips_upload_and_launch(gcs, monkeypatch):
+    gcs.previous.metadata = {"source_etag": '"v1"', "sha256": SHA256}
+    (body, status), get = _call(monkeypatch, FakeResponse(status_code=304))
+
+    assert status == 200 and "unchanged" in body
+    assert get.call_args[1]["headers"] == {"If-None-Match": '"v1"'}
+    gcs.blob.assert_not_called()
+    gcs.launch.assert_not_called()
+
+
+def test_same_digest_skips_launch(gcs, monkeypatch):
+    gcs.previous.metadata = {"sha256": SHA256}
+    (body, status), _ = _call(monkeypatch, FakeResponse(headers={"ETag": '"v2"'}))
+
+    assert status == 200 and "unchanged" in body
+    gcs.copy_blob.assert_not_called()
+    gcs.launch.assert_not_called()
+    gcs.blob.return_value.delete.assert_called_once()
+    assert gcs.previous.metadata == {"sha256": SHA256, "source_etag": '"v2"'}
+
+
+def test_force_downloads_and_launches_unconditionally(gcs, monkeypatch):
+    gcs.previous.metadata = {"source_etag": '"v1"', "sha256": SHA256}
+    (_, status), get = _call(monkeypatch, FakeResponse(headers={"ETag": '"v1"'}), force=True)
+
+    assert status == 200
+    assert get.call_args[1]["headers"] == {}
+    assert gcs.uploaded.getvalue() == CONTENT
+    gcs.launch.assert_called_once_with("project", "region", "bucket", "sdn_advanced.xml")
+    assert gcs.copied.metadata == {"source_etag": '"v1"', "sha256": SHA256}
+    gcs.copied.patch.assert_called_once()
+
+
+def test_failed_launch_leaves_the_snapshot_unrecorded(gcs, monkeypatch):
+    gcs.launch.side_effect = RuntimeError("quota exceeded")
+    (body, status), _ = _call(monkeypatch, FakeResponse(headers={"ETag": '"v2"'}))
+
+    assert status == 500 and "quota exceeded" in body
+    # Without a digest or ETag on the snapshot, the next run downloads and launches again
+    assert gcs.copied.metadata is None
+    gcs.copied.patch.assert_not_called()
@@ -0,0 +1,59 @@
+import pytest
+import random
+import sys
+import os
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+from edit_distance import PackedStrings, bounded_levenshtein, levenshtein
+
+
+def _random_strings(rng, count, alphabet, max_length):
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length))) for _ in range(count)]
+
+
+def test_reference_examples():
+    assert levenshtein("", "") == 0
+    assert levenshtein("KITTEN", "SITTING") == 3
+    assert levenshtein("AEROCARIBBEAN", "AEROCARIBEAN") == 1
+    assert levenshtein("ABC", "") == 3
+
+
+def test_bounded_matches_reference():
+    rng = random.Random(11)
+    for _ in range(3000):
+        a, b = _random_strings(rng, 2, "AB C&", 14)
+        limit = rng.randint(0, 5)
+        assert bounded_levenshtein(a, b, limit) == min(levenshtein(a, b), limit + 1)
+
+
+def test_bounded_handles_long_patterns():
+    rng = random.Random(12)
+    for _ in range(50):
+        a = "".join(rng.choice("ABCD") for _ in range(rng.randint(60, 150)))
+        b = "".join(rng.choice("ABCD") for _ in range(rng.randint(60, 150)))
+        assert bounded_levenshtein(a, b, 200) == levenshtein(a, b)
+
+
+def test_bounded_exits_early_but_stays_exact_within_limit():
+    assert bounded_levenshtein("BLUE LAGOON GROUP", "RED SEA TRADING CO", 2) == 3
+    assert bounded_levenshtein("BLUE LAGOON GROUP", "BLUE LAGON GROUP", 2) == 1
+    assert bounded_levenshtein("A", "ABCDEF", 2) == 3
+
+
+@pytest.mark.parametrize("query_length", [0, 1, 5, 20, 63, 64, 65, 90])
+def test_packed_distances_match_reference(query_length):
+    rng = random.Random(query_length)
+    strings = _random_strings(rng, 200, "ABC D", 100) + [""]
+    packed = PackedStrings(strings)
+    query = "".join(rng.choice("ABC DZ") for _ in range(query_length))
+    for limit in (0, 2, 10, 200):
+        expected = [min(levenshtein(query, s), limit + 1) for s in strings]
+        assert packed.distances(query, limit).tolist() == expected
+
+
+def test_packed_within_returns_input_positions():
+    packed = PackedStrings(["SEA STAR", "BLUE LAGOON GRP", "SEA STARS", "", "SEE STAR"])
+    assert packed.within("SEA STAR", 1) == [(0, 0), (2, 1), (4, 1)]
+    assert packed.within("SEA STAR", -1) == []
+    assert PackedStrings([]).within("SEA STAR", 2) == []
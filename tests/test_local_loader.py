@@ -0,0 +1,120 @@
+import pytest
+import sys
+import os
+import json
+import xml.etree.ElementTree as ET
+from unittest.mock import patch
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+import local_loader
+import sdn_parser
+from conftest import SAMPLE_SDN_XML
+
+
+def _expected_records():
+    return sdn_parser.parse_sanctions_document(ET.fromstring(SAMPLE_SDN_XML.encode("utf-8")))
+
+
+def test_parse_to_jsonl_shards(sample_sdn_xml_path, tmp_path):
+    shard_paths, total = local_loader.parse_to_shards(
+        sample_sdn_xml_path, str(tmp_path / "shards"), "jsonl", workers=2
+    )
+
+    assert total == 4
+    assert len(shard_paths) > 1
+    records = []
+    for path in shard_paths:
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f)
+    assert records == _expected_records()
+
+
+def test_parse_gzip_input(sample_sdn_xml_gz_path, tmp_path):
+    shard_paths, total = local_loader.parse_to_shards(
+        sample_sdn_xml_gz_path, str(tmp_path / "shards"), "jsonl", workers=2
+    )
+
+    records = []
+    for path in shard_paths:
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f)
+    assert total == 4
+    assert records == _expected_records()
+
+
+def test_gzip_input_is_decompressed_once(sample_sdn_xml_gz_path, tmp_path):
+    worker_inputs = []
+    real_pool = local_loader.ProcessPoolExecutor
+
+    def pool(max_workers, initializer, initargs):
+        worker_inputs.append(initargs[0])
+        return real_pool(max_workers=max_workers, initializer=initializer, initargs=initargs)
+
+    with patch.object(local_loader.gzip, "open", wraps=local_loader.gzip.open) as gzip_open, \
+            patch.object(local_loader, "ProcessPoolExecutor", pool):
+        local_loader.parse_to_shards(sample_sdn_xml_gz_path, str(tmp_path / "shards"), "jsonl", workers=2)
+
+    assert gzip_open.call_count == 1
+    assert not worker_inputs[0].endswith(".gz")
+    assert not os.path.exists(worker_inputs[0])
+
+
+def test_parse_to_avro_shards(sample_sdn_xml_path, tmp_path):
+    fastavro = pytest.importorskip("fastavro")
+
+    shard_paths, total = local_loader.parse_to_shards(
+        sample_sdn_xml_path, str(tmp_path / "shards"), "avro", workers=2
+    )
+
+    records = []
+    for path in shard_paths:
+        with open(path, "rb") as f:
+            records.extend(fastavro.reader(f))
+    assert total == 4
+    assert records == _expected_records()
+
+
+def test_bq_schema_to_avro_modes():
+    schema = local_loader.bq_schema_to_avro(local_loader.load_bigquery_schema())
+    fields = {f["name"]: f["type"] for f in schema["fields"]}
+
+    assert fields["entity_id"] == "long"
+    assert fields["type"] == ["null", "string"]
+    assert fields["programs"] == {"type": "array", "items": "string"}
+    assert fields["names"]["type"] == "array"
+    assert fields["names"]["items"]["type"] == "record"
+
+
+def test_load_jsonl_shards_submits_one_job(sample_sdn_xml_path, tmp_path):
+    shard_paths, _ = local_loader.parse_to_shards(
+        sample_sdn_xml_path, str(tmp_path / "shards"), "jsonl", workers=2
+    )
+
+    with patch("google.cloud.bigquery.Client") as MockClient:
+        mock_client = MockClient.return_value
+        local_loader.load_shards(shard_paths, "my-project:my_dataset.my_table")
+
+    MockClient.assert_called_once_with(project="my-project")
+    assert mock_client.load_table_from_file.call_count == 1
+    assert mock_client.load_table_from_file.call_args[0][1] == "my-project.my_dataset.my_table"
+    with open(tmp_path / "shards" / "sdn_entities.jsonl") as f:
+        assert len(f.readlines()) == 4
+
+
+def test_empty_input_is_not_loaded(tmp_path):
+    empty = tmp_path / "empty.xml"
+    empty.write_text(SAMPLE_SDN_XML[:SAMPLE_SDN_XML.index("<DistinctParties>")] + "</Sanctions>\n")
+    shard_paths, total = local_loader.parse_to_shards(str(empty), str(tmp_path / "shards"), "jsonl", workers=2)
+    assert (shard_paths, total) == ([], 0)
+
+    with patch("google.cloud.bigquery.Client") as MockClient:
+        with pytest.raises(ValueError, match="No shards"):
+            local_loader.load_shards(shard_paths, "my-project:my_dataset.my_table")
+    MockClient.assert_not_called()
+
+
+def test_load_avro_requires_staging(tmp_path):
+    with patch("google.cloud.bigquery.Client"):
+        with pytest.raises(ValueError):
+            local_loader.load_shards([str(tmp_path / "part-00000.avro")], "p:d.t", "avro")
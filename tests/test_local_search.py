@@ -0,0 +1,177 @@
+import pytest
+import json
+import random
+import sys
+import os
+import xml.etree.ElementTree as ET
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+import local_search
+import sdn_parser
+from conftest import SAMPLE_SDN_XML
+
+# The cases from test_robust_search_cases.py that the sample document covers
+ROBUST_CASES = [
+    ("AERO-CARIBBEAN", 36),
+    ("AEROCARIBBEAN", 36),
+    ("BLUE LAGOON GROUP", 23665),
+    ("Blue Lagoon Grp", 23665),
+    ("Blue Lagoon Group Ltd", 23665),
+    ("Blue Lagoon Group Limited", 23665),
+    ("James", 16910),
+]
+
+
+@pytest.fixture
+def index():
+    records = sdn_parser.parse_sanctions_document(ET.fromstring(SAMPLE_SDN_XML.encode("utf-8")))
+    return local_search.LocalSearchIndex(records)
+
+
+def _reference_edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+@pytest.mark.parametrize("search_term, expected_entity_id", ROBUST_CASES)
+def test_robust_cases(index, search_term, expected_entity_id):
+    assert expected_entity_id in [entity_id for entity_id, _ in index.match(search_term)]
+
+
+def test_ranking_and_scores(index):
+    assert index.match("Aerocaribean") == [(36, 1)]
+    assert index.match("Sea Star") == [(9647, 0)]
+    assert index.match("Sea Stars", threshold=0) == []
+    assert [e["entity_id"] for e in index.search("Sea Stars", threshold=1)] == [9647]
+
+
+def test_word_match_is_case_insensitive_on_full_name(index):
+    assert index.match("koang") == [(16910, 0)]
+    # A word match needs whole words, not a prefix
+    assert index.match("Koan", threshold=0) == []
+
+
+def test_bounded_edit_distance_matches_reference():
+    rng = random.Random(3)
+    for _ in range(2000):
+        a = "".join(rng.choice("AB C") for _ in range(rng.randint(0, 8)))
+        b = "".join(rng.choice("AB C") for _ in range(rng.randint(0, 8)))
+        limit = rng.randint(0, 3)
+        expected = _reference_edit_distance(a, b)
+        assert local_search.bounded_edit_distance(a, b, limit) == min(expected, limit + 1)
+
+
+@pytest.mark.parametrize("fuzzy_index", local_search.FUZZY_INDEXES)
+def test_fuzzy_candidates_keep_every_match(fuzzy_index):
+    rng = random.Random(5)
+    names = ["".join(rng.choice("ABC ") for _ in range(rng.randint(1, 14))) for _ in range(300)]
+    records = [
+        {"entity_id": i, "names": [{"full_name": name, "normalized_name": name}]}
+        for i, name in enumerate(names)
+    ]
+    index = local_search.LocalSearchIndex(records, fuzzy_index=fuzzy_index)
+    for term in names[:40]:
+        for threshold in (0, 1, 2, 3):
+            found = {name_id for name_id, _ in index._edit_distance_matches(term, threshold)}
+            expected = {
+                name_id for name_id, name in enumerate(index._normalized_names)
+                if _reference_edit_distance(name, term) <= threshold
+            }
+            assert found == expected
+
+
+@pytest.mark.parametrize("fuzzy_index", ["qgram", "scan"])
+def test_fuzzy_indexes_agree(index, fuzzy_index):
+    other = local_search.LocalSearchIndex(index.entities, fuzzy_index=fuzzy_index)
+    for search_term, _ in ROBUST_CASES + [("Aerocaribean", None), ("Sea Stars", None)]:
+        assert other.match(search_term) == index.match(search_term)
+
+
+def test_fuzzy_stats_count_candidates():
+    names = [f"TRADING COMPANY {i:04d}" for i in range(500)]
+    records = [{"entity_id": i, "names": [{"full_name": n, "normalized_name": n}]} for i, n in enumerate(names)]
+    qgram = local_search.LocalSearchIndex(records, fuzzy_index="qgram")
+    scan = local_search.LocalSearchIndex(records, fuzzy_index="scan")
+    for index in (qgram, scan):
+        index.match("Tradin Company 0042", threshold=1)
+
+    assert scan.fuzzy_stats()["candidates_examined"] == 500
+    assert qgram.fuzzy_stats()["queries"] == 1
+    assert qgram.fuzzy_stats()["candidates_examined"] < 50
+
+
+def test_unknown_fuzzy_index():
+    with pytest.raises(ValueError):
+        local_search.LocalSearchIndex([], fuzzy_index="bktree")
+
+
+def test_from_jsonl(index, tmp_path):
+    path = tmp_path / "snapshot.jsonl"
+    path.write_text("".join(json.dumps(e) + "\n" for e in index.entities))
+    assert local_search.LocalSearchIndex.from_jsonl(str(path)).match("SEA STAR") == [(9647, 0)]
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("search_term", [
+    "AERO-CARIBBEAN", "AEROCARIBBEAN", "BLUE LAGOON GROUP", "Blue Lagoon Grp", "Blue Lagoon Group Ltd",
+    "Blue Lagoon Group Limited", "Hamza", "Hital Exchange", "Hital Xchange", "Corp", "Corporation",
+    "James", "Bank",
+])
+def test_matches_bigquery(search_term):
+    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT_ID")
+    if not project_id:
+        pytest.skip("Skipping integration test: GOOGLE_CLOUD_PROJECT_ID not set")
+
+    import search_bq
+
+    index = _bigquery_snapshot(project_id)
+    expected = search_bq.query_entities(project_id, "sanctions_data", "sdn_entities", search_term, 2)
+    assert sorted(entity_id for entity_id, _ in index.match(search_term)) == sorted(
+        e["entity_id"] for e in expected
+    )
+
+
+_snapshots = {}
+
+
+def _bigquery_snapshot(project_id):
+    if project_id not in _snapshots:
+        _snapshots[project_id] = local_search.LocalSearchIndex.from_bigquery(
+            project_id, "sanctions_data", "sdn_entities"
+        )
+    return _snapshots[project_id]
+
+
+@pytest.mark.parametrize("fuzzy_index", local_search.FUZZY_INDEXES)
+def test_filters_restrict_matches(fuzzy_index):
+    records = sdn_parser.parse_sanctions_document(ET.fromstring(SAMPLE_SDN_XML.encode("utf-8")))
+    index = local_search.LocalSearchIndex(records, fuzzy_index=fuzzy_index)
+    # A fuzzy match, a full-name word match and a normalized word match
+    for term in ("Aerocaribean", "AEROCARIBBEAN AIRLINES", "Blue Lagoon"):
+        expected = index.match(term)
+        assert expected
+        assert index.match(term, entity_type="Vessel") == []
+        assert index.match(term, entity_type=["Entity", "Vessel"]) == expected
+    assert index.match("Aerocaribean", programs="CUBA", country_iso2="CU") == [(36, 1)]
+    assert index.match("Aerocaribean", programs="CUBA", country_iso2="AE") == []
+    assert index.match("Blue Lagoon", programs=["SDGT", "CUBA"]) == [(23665, 0)]
+    assert [e["entity_id"] for e in index.search("Sea Star", entity_type="Vessel")] == [9647]
+    assert index.match_tokens("Koang James Chuol", entity_type="Individual") == [(16910, 1.0)]
+    assert index.match_tokens("Koang James Chuol", country_iso2="CU") == []
+    assert index.match_weighted("Blue Lagoon", country_iso2="AE", min_score=0.1)[0][0] == 23665
+    assert index.match_weighted("Blue Lagoon", country_iso2="CU", min_score=0.1) == []
+
+
+def test_filter_bitsets_combine_values_and_attributes(index):
+    assert index._allowed({}) is None
+    # Entities are numbered in record order: 36, 16910, 23665, 9647
+    assert index._allowed({"entity_type": "Entity"}) == 0b0101
+    assert index._allowed({"entity_type": ["Entity", "Vessel"]}) == 0b1101
+    assert index._allowed({"entity_type": "Entity", "country_iso2": "AE"}) == 0b0100
+    assert index._allowed({"programs": "UNKNOWN"}) == 0
@@ -0,0 +1,45 @@
+import pytest
+import sys
+import os
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+from name_keys import literal_word_tokens, phonetic_key, search_keys, sorted_token_key, soundex, word_tokens
+
+
+@pytest.mark.parametrize("word, code", [
+    ("Robert", "R163"), ("Rupert", "R163"), ("Ashcraft", "A261"), ("Ashcroft", "A261"),
+    ("Tymczak", "T522"), ("Pfister", "P236"), ("Honeyman", "H555"), ("Lee", "L000"),
+    ("123", ""), ("", ""), ("Müller", "M460"),
+])
+def test_soundex(word, code):
+    assert soundex(word) == code
+
+
+def test_names_that_sound_alike_share_a_phonetic_key():
+    assert phonetic_key("MOHAMMED AL HASHIMI") == phonetic_key("MUHAMAD AL HASHEMI")
+    assert phonetic_key("BLUE LAGOON") != phonetic_key("RED LAGOON")
+    assert phonetic_key("123 &") is None
+    assert phonetic_key(None) is None
+
+
+def test_reordered_names_share_a_sorted_token_key():
+    assert sorted_token_key("LAGOON BLUE GRP") == sorted_token_key("BLUE LAGOON GRP") == "BLUE GRP LAGOON"
+    assert sorted_token_key("") is None
+
+
+def test_word_tokens_split_like_re2():
+    assert word_tokens("Aero-Caribbean Airlines") == ["AERO", "CARIBBEAN", "AIRLINES"]
+    assert word_tokens("O'Neil_Co") == ["O", "NEIL_CO"]
+    assert literal_word_tokens("Blue (Lagoon)") == []
+    assert literal_word_tokens("Blue Lagoon") == ["BLUE", "LAGOON"]
+
+
+def test_search_keys():
+    assert search_keys("Blue Lagoon Group Ltd", "BLUE LAGOON GRP LTD") == {
+        "name_tokens": ["BLUE", "LAGOON", "GROUP", "LTD"],
+        "name_length": 19,
+        "sorted_token_key": "BLUE GRP LAGOON LTD",
+        "phonetic_key": "B400 L250 G610 L300",
+    }
+    assert search_keys("...", None)["name_length"] is None
@@ -1,10 +1,14 @@
 import pytest
+import random
 import sys
 import os
 
 # Add the load_and_search directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
-from normalization_logic import normalize_name
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from normalization_logic import NORMALIZATION_VERSION, NameNormalizer, normalize_name
+# The sequential regex chain the token dictionary replaced, and the same rules as a dictionary
+from bench_normalization import LEGACY_ABBREVIATIONS, legacy_normalize
 
 
 @pytest.mark.parametrize(
@@ -47,3 +51,55 @@ from normalization_logic import normalize_name
 )
 def test_normalize_name(input_name, expected):
     assert normalize_name(input_name) == expected
+
+
+def test_token_dictionary_matches_regex_chain():
+    words = [
+        "Private", "pvt", "PTE", "Limited", "ltd", "Company", "Corporation", "Incorporated",
+        "Department", "Brothers", "and", "Andes", "Acme", "A1", "Ltd.", "Co", "É", "ß",
+    ]
+    separators = [" ", "  ", "\t", "\n", " & ", "&", ", ", ".", "-", " \xa0"]
+    rng = random.Random(7)
+    normalizer = NameNormalizer(LEGACY_ABBREVIATIONS)
+    for _ in range(3000):
+        parts = [rng.choice(words) for _ in range(rng.randint(1, 5))]
+        name = rng.choice(["", " ", "."]) + "".join(
+            part + rng.choice(separators) for part in parts[:-1]
+        ) + parts[-1] + rng.choice(["", " ", ".", "\n", ".\n", " &"])
+        assert normalizer.normalize(name) == legacy_normalize(name), repr(name)
+
+
+@pytest.mark.parametrize(
+    "input_name, expected",
+    [
+        ("Blue Lagoon Group", "BLUE LAGOON GRP"),
+        ("Blue Lagoon Grp", "BLUE LAGOON GRP"),
+        ("Hital Exchange", "HITAL XCHG"),
+        ("Hital Xchange", "HITAL XCHG"),
+        ("Limited Editions Group Limited", "LIMITED EDITIONS GRP LTD"),
+    ],
+)
+def test_added_abbreviations(input_name, expected):
+    assert normalize_name(input_name) == expected
+
+
+def test_dictionary_version():
+    assert NORMALIZATION_VERSION == NameNormalizer().version
+    assert NameNormalizer(LEGACY_ABBREVIATIONS).version == "1"
+
+
+def test_normalize_many_keeps_order():
+    names = ["Acme Ltd", None, "Smith and Sons Company", ""]
+    assert NameNormalizer().normalize_many(names) == ["ACME LTD", None, "SMITH & SONS CO", None]
+
+
+def test_normalizer_cache_stats():
+    normalizer = NameNormalizer(cache_size=2)
+    normalizer.normalize_many(["Acme Ltd", "Acme Ltd", "Beta Corp", "Gamma Inc", "Acme Ltd"])
+
+    info = normalizer.cache_info()
+    assert info["hits"] == 1
+    assert info["misses"] == 4
+    assert info["size"] == 2
+    assert info["max_size"] == 2
+    assert info["hit_rate"] == pytest.approx(0.2)
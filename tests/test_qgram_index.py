@@ -0,0 +1,44 @@
+import pytest
+import random
+import sys
+import os
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+from qgram_index import QGramIndex, qgrams
+
+
+def _reference_edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def test_qgrams_are_padded():
+    assert qgrams("AB", 3) == ["\x00\x00A", "\x00AB", "AB\x00", "B\x00\x00"]
+    assert len(qgrams("", 3)) == 2
+    assert qgrams("ABC", 1) == ["A", "B", "C"]
+
+
+@pytest.mark.parametrize("q", [2, 3, 4])
+def test_candidates_include_every_match(q):
+    rng = random.Random(q)
+    strings = ["".join(rng.choice("ABCD &") for _ in range(rng.randint(0, 16))) for _ in range(400)]
+    index = QGramIndex(strings, q)
+    for term in strings[:30] + ["ABCDABCD", "", "A"]:
+        for max_edits in range(4):
+            candidates = set(index.candidates(term, max_edits))
+            expected = {i for i, s in enumerate(strings) if _reference_edit_distance(s, term) <= max_edits}
+            assert expected <= candidates
+
+
+def test_count_filter_prunes_distant_strings():
+    strings = ["BLUE LAGOON GROUP", "BLUE LAGOON GRP", "RED SEA TRADING", "BLUE OCEAN TRADING", "LAGOON BLUE"]
+    index = QGramIndex(strings)
+    assert sorted(index.candidates("BLUE LAGOON GRP", 2)) == [0, 1]
+    assert index.candidates("BLUE LAGOON GRP", -1) == []
+    assert len(index) == 5
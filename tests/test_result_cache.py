@@ -0,0 +1,122 @@
+import pytest
+import sys
+import os
+import datetime
+from unittest.mock import MagicMock, patch
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+import result_cache
+from result_cache import ResultCache, SnapshotVersion, table_snapshot_version
+
+
+def test_get_put_and_counters():
+    cache = ResultCache()
+    key = ResultCache.key("ACME", 2, "v1", "Acme")
+
+    assert cache.get(key) == (False, None)
+    cache.put(key, [{"entity_id": 1}], cost=500)
+    assert cache.get(key) == (True, [{"entity_id": 1}])
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bytes_saved"]) == (1, 1, 500)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_key_separates_threshold_version_and_options():
+    keys = {
+        ResultCache.key("ACME", 2, "v1", "Acme"),
+        ResultCache.key("ACME", 1, "v1", "Acme"),
+        ResultCache.key("ACME", 2, "v2", "Acme"),
+        ResultCache.key("ACME", 2, "v1", "A.C.M.E."),
+        ResultCache.key("ACME", 2, "v1", "Acme", kind="ranked", top_k=5),
+    }
+    assert len(keys) == 5
+    # Case differences in the raw term share an entry
+    assert ResultCache.key("ACME", 2, "v1", "acme") == ResultCache.key("ACME", 2, "v1", "ACME")
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = ResultCache(ttl_seconds=10)
+    with patch.object(result_cache.time, "time", return_value=1000.0):
+        cache.put("a", 1)
+    with patch.object(result_cache.time, "time", return_value=1009.0):
+        assert cache.get("a") == (True, 1)
+    with patch.object(result_cache.time, "time", return_value=1010.0):
+        assert cache.get("a") == (False, None)
+
+
+def test_new_snapshot_version_drops_entries():
+    cache = ResultCache()
+    cache.set_snapshot_version("v1")
+    cache.put("a", 1)
+    cache.set_snapshot_version("v1")
+    assert cache.get("a") == (True, 1)
+
+    cache.set_snapshot_version("v2")
+    assert cache.get("a") == (False, None)
+
+
+def test_sqlite_backend_survives_restarts(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(path=path)
+    cache.set_snapshot_version("v1")
+    cache.put("a", {"matches": [1, 2]}, cost=42)
+    cache.close()
+
+    reopened = ResultCache(path=path)
+    assert reopened.get("a") == (True, {"matches": [1, 2]})
+    assert reopened.stats()["bytes_saved"] == 42
+
+    reopened.set_snapshot_version("v2")
+    reopened.close()
+    assert ResultCache(path=path).get("a") == (False, None)
+
+
+def test_sqlite_backend_keeps_most_recently_used(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(max_entries=2, path=path)
+    now = result_cache.time.time()
+    with patch.object(result_cache.time, "time", side_effect=[now + i for i in range(4)]):
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+    cache.close()
+
+    reopened = ResultCache(path=path)
+    assert reopened.get("b") == (False, None)
+    assert reopened.get("a") == (True, 1)
+
+
+def test_get_or_compute_only_computes_on_miss():
+    cache = ResultCache()
+    compute = MagicMock(return_value=(["row"], 10))
+
+    assert cache.get_or_compute("k", compute) == ["row"]
+    assert cache.get_or_compute("k", compute) == ["row"]
+    assert compute.call_count == 1
+
+
+def test_snapshot_version_tracks_table_modification():
+    client = MagicMock()
+    client.get_table.return_value = MagicMock(modified=datetime.datetime(2024, 5, 1, 12), etag="abc")
+    assert table_snapshot_version(client, "p.d.t") == "2024-05-01T12:00:00/abc"
+
+    version = SnapshotVersion(client, "p.d.t", refresh_seconds=3600)
+    version.current()
+    version.current()
+    assert client.get_table.call_count == 2
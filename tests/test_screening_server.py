@@ -0,0 +1,126 @@
+import pytest
+import http.client
+import json
+import sys
+import os
+import threading
+import xml.etree.ElementTree as ET
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+import screening_server
+import sdn_parser
+from local_search import LocalSearchIndex
+from conftest import SAMPLE_SDN_XML
+
+
+def test_micro_batcher_groups_concurrent_submissions():
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = screening_server.MicroBatcher(process, max_batch_size=4, max_wait_ms=200)
+    futures = [batcher.submit(i) for i in range(10)]
+    results = [future.result(timeout=5) for future in futures]
+    batcher.close()
+
+    assert results == [i * 2 for i in range(10)]
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert batcher.stats() == {"batches": 3, "requests": 10, "mean_batch_size": 10 / 3}
+
+
+def test_micro_batcher_fails_every_request_of_a_failed_batch():
+    def process(items):
+        raise RuntimeError("quota exceeded")
+
+    batcher = screening_server.MicroBatcher(process, max_batch_size=2, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    batcher.close()
+
+
+def test_micro_batcher_fails_only_the_items_that_failed():
+    def process(items):
+        return [ValueError(item) if item < 0 else item for item in items]
+
+    batcher = screening_server.MicroBatcher(process, max_batch_size=3, max_wait_ms=200)
+    futures = [batcher.submit(i) for i in (1, -1, 2)]
+    assert futures[0].result(timeout=5) == 1
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5) == 2
+    batcher.close()
+
+
+def test_local_backend_matches_names_literally():
+    index = LocalSearchIndex([
+        {"entity_id": 1, "names": [{"full_name": "Acme (Pty) Ltd", "normalized_name": "ACME PTY LTD"}]},
+        {"entity_id": 2, "names": [{"full_name": "AXB Holdings", "normalized_name": "AXB HOLDINGS"}]},
+    ])
+    backend = screening_server.LocalIndexBackend(index)
+    assert backend([("ACME (PTY", 0, {}), ("A.B", 0, {})]) == [[{"entity_id": 1, "score": 0}], []]
+
+    results = backend([(42, 0, {}), ("Acme", 0, {})])
+    assert isinstance(results[0], Exception)
+    assert results[1] == [{"entity_id": 1, "score": 0}]
+
+
+def test_bigquery_backend_groups_by_threshold_and_filters(monkeypatch):
+    import search_bq
+
+    calls = []
+
+    def screen_batch(project_id, dataset_id, table_id, names, threshold, top_k, client=None, **filters):
+        calls.append((threshold, filters, [name for _, name in names]))
+        return [{"input_id": input_id, "matches": [name]} for input_id, name in names]
+
+    monkeypatch.setattr(search_bq, "screen_batch", screen_batch)
+    backend = screening_server.BigQueryBackend.__new__(screening_server.BigQueryBackend)
+    backend.project_id, backend.dataset_id, backend.table_id, backend.top_k, backend.client = "p", "d", "t", 5, None
+
+    results = backend([("a", 2, {}), ("b", 2, {"entity_type": ["Vessel"]}), ("c", 2, {}), ("d", 1, {})])
+
+    assert results == [["a"], ["b"], ["c"], ["d"]]
+    assert sorted(calls, key=str) == sorted([
+        (2, {}, ["a", "c"]), (2, {"entity_type": ["Vessel"]}, ["b"]), (1, {}, ["d"]),
+    ], key=str)
+
+
+def test_screen_endpoint_with_local_backend():
+    index = LocalSearchIndex(
+        sdn_parser.parse_sanctions_document(ET.fromstring(SAMPLE_SDN_XML.encode("utf-8")))
+    )
+    batcher = screening_server.MicroBatcher(screening_server.LocalIndexBackend(index), max_wait_ms=5)
+    server = screening_server.make_server(batcher, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def post(body):
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+        connection.request("POST", "/screen", json.dumps(body), {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    try:
+        assert post({"name": "Blue Lagoon Grp"}) == (
+            200, {"name": "Blue Lagoon Grp", "matches": [{"entity_id": 23665, "score": 0}]}
+        )
+        assert post({"name": "Sea Stars", "threshold": 0})[1]["matches"] == []
+        assert post({"threshold": 1})[0] == 400
+        assert post({"name": 42})[0] == 400
+        assert post({"name": "   "})[0] == 400
+        assert post({"name": "Sea (Star"})[0] == 200
+        assert post({"name": "..."}) == (200, {"name": "...", "matches": []})
+        assert post({"name": "-"}) == (200, {"name": "-", "matches": []})
+        assert post({"name": "Blue Lagoon Grp", "entity_type": "Vessel"})[1]["matches"] == []
+        assert post({"name": "Blue Lagoon Grp", "programs": ["SDGT"], "country_iso2": "AE"})[1]["matches"] == [
+            {"entity_id": 23665, "score": 0}
+        ]
+        assert post({"name": "Blue Lagoon Grp", "programs": [1]})[0] == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+        batcher.close()
@@ -0,0 +1,129 @@
+import pytest
+import sys
+import os
+import xml.etree.ElementTree as ET
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+import sdn_parser
+from conftest import SAMPLE_SDN_XML
+
+
+def _parse_document():
+    return sdn_parser.parse_sanctions_document(ET.fromstring(SAMPLE_SDN_XML.encode("utf-8")))
+
+
+def _parse_streaming(path):
+    return list(sdn_parser.iter_entities_streaming(lambda: open(path, "rb")))
+
+
+def test_document_parse_builds_records():
+    records = {r["entity_id"]: r for r in _parse_document()}
+
+    assert sorted(records) == [36, 9647, 16910, 23665]
+
+    aero = records[36]
+    assert aero["type"] == "Entity"
+    assert aero["programs"] == ["CUBA"]
+    assert [n["full_name"] for n in aero["names"]] == [
+        "AEROCARIBBEAN AIRLINES",
+        "AERO-CARIBBEAN",
+    ]
+    assert aero["names"][0]["is_primary"] is True
+    assert aero["addresses"] == [
+        {
+            "address_line": "Calle 23 No. 64",
+            "city": "Havana",
+            "state": None,
+            "postal_code": None,
+            "country": "Cuba",
+            "country_iso2": "CU",
+        }
+    ]
+
+    chuol = records[16910]
+    assert chuol["type"] == "Individual"
+    assert chuol["names"][0]["full_name"] == "CHUOL James Koang"
+    assert chuol["programs"] == ["SOUTH SUDAN"]
+    assert chuol["remarks"] == "Linked To: SOUTH SUDAN PEOPLE'S LIBERATION ARMY."
+
+    vessel = records[9647]
+    assert vessel["type"] == "Vessel"
+    assert vessel["programs"] == []
+    assert vessel["addresses"] == []
+
+    blue_lagoon = records[23665]
+    assert blue_lagoon["names"][0]["normalized_name"] == "BLUE LAGOON GRP LTD"
+    assert blue_lagoon["normalization_version"] == sdn_parser.NORMALIZATION_VERSION
+
+
+def test_names_carry_search_keys():
+    records = {r["entity_id"]: r for r in _parse_document()}
+
+    aero = records[36]["names"][1]
+    assert aero["name_tokens"] == ["AERO", "CARIBBEAN"]
+    assert aero["name_length"] == len(aero["normalized_name"])
+    chuol = records[16910]["names"][0]
+    assert chuol["sorted_token_key"] == "CHUOL JAMES KOANG"
+    assert chuol["phonetic_key"] == "C400 J520 K520"
+
+
+def test_streaming_parse_matches_document_parse(sample_sdn_xml_path):
+    assert _parse_streaming(sample_sdn_xml_path) == _parse_document()
+
+
+def test_streaming_parse_detaches_consumed_elements(sample_sdn_xml_path):
+    # Once a record has been yielded and the generator resumed, nothing of it
+    # should remain reachable from the elements still being parsed.
+    seen = []
+    with open(sample_sdn_xml_path, "rb") as f:
+        for tag, elem in sdn_parser._iter_xml_records(f, {sdn_parser._DISTINCT_PARTY_TAG}):
+            seen.append(elem)
+            assert len(elem) > 0
+
+    assert len(seen) == 4
+    assert all(len(elem) == 0 for elem in seen)
+
+
+@pytest.mark.parametrize("chunk_size", [16, 64, 1 << 20])
+def test_index_distinct_parties_finds_byte_ranges(sample_sdn_xml_path, chunk_size):
+    with open(sample_sdn_xml_path, "rb") as f:
+        root_open, root_close, ranges = sdn_parser.index_distinct_parties(
+            f, chunk_size=chunk_size
+        )
+    data = SAMPLE_SDN_XML.encode("utf-8")
+
+    assert root_open.startswith(b"<Sanctions ")
+    assert root_close == b"</Sanctions>"
+    assert len(ranges) == 4
+    for start, end in ranges:
+        assert data[start:end].startswith(b'<DistinctParty FixedRef="')
+        assert data[start:end].endswith(b"</DistinctParty>")
+
+
+def test_fragment_parse_matches_document_parse(sample_sdn_xml_path):
+    with open(sample_sdn_xml_path, "rb") as f:
+        _, location_map, profile_programs = sdn_parser.read_reference_data(f)
+    with open(sample_sdn_xml_path, "rb") as f:
+        root_open, root_close, ranges = sdn_parser.index_distinct_parties(f)
+
+    data = SAMPLE_SDN_XML.encode("utf-8")
+    records = [
+        sdn_parser.parse_party_fragment(
+            data[start:end], root_open, root_close, location_map, profile_programs
+        )
+        for start, end in ranges
+    ]
+    assert records == _parse_document()
+
+
+def test_content_hash_is_stable_and_tracks_changes():
+    first = _parse_document()
+    second = _parse_document()
+    assert [r["content_hash"] for r in first] == [r["content_hash"] for r in second]
+    assert len({r["content_hash"] for r in first}) == len(first)
+
+    record = dict(first[0])
+    assert sdn_parser.compute_content_hash(record) == record["content_hash"]
+    record["remarks"] = "Changed"
+    assert sdn_parser.compute_content_hash(record) != first[0]["content_hash"]
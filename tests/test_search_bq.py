@@ -103,3 +103,255 @@ def test_query_construction(mock_bigquery_client):
     assert job_config.query_parameters[0].value == "SearchTerm"
     assert job_config.query_parameters[1].name == "threshold"
     assert job_config.query_parameters[1].value == 5
+
+def test_read_names_csv_and_jsonl(tmp_path):
+    csv_path = tmp_path / "names.csv"
+    csv_path.write_text("customer_id,name\nC1,Acme Ltd\nC2,Blue Lagoon Group\n")
+    jsonl_path = tmp_path / "names.jsonl"
+    jsonl_path.write_text('{"name": "Acme Ltd"}\n{"name": "Sea Star"}\n')
+
+    assert search_bq.read_names(str(csv_path), id_column="customer_id") == [
+        ("C1", "Acme Ltd"),
+        ("C2", "Blue Lagoon Group"),
+    ]
+    assert search_bq.read_names(str(jsonl_path)) == [("0", "Acme Ltd"), ("1", "Sea Star")]
+
+def test_screen_batch_runs_one_query(mock_bigquery_client):
+    mock_query_job = MagicMock()
+    mock_query_job.result.return_value = [
+        {
+            "input_id": "0",
+            "search_term": "Blue Lagoon Grp",
+            "normalized_term": "BLUE LAGOON GRP",
+            "matches": [{"entity_id": 23665, "score": 0, "matched_name": "BLUE LAGOON GROUP LTD"}],
+        },
+        {"input_id": "1", "search_term": "Nobody", "normalized_term": "NOBODY", "matches": []},
+    ]
+    mock_bigquery_client.query.return_value = mock_query_job
+
+    results = list(search_bq.screen_batch(
+        "my-project", "my-dataset", "my-table", [("0", "Blue Lagoon Grp"), ("1", "Nobody (UK)")], 2, top_k=3
+    ))
+
+    assert mock_bigquery_client.query.call_count == 1
+    query_str = mock_bigquery_client.query.call_args[0][0]
+    job_config = mock_bigquery_client.query.call_args[1]['job_config']
+    assert "CROSS JOIN `my-project.my-dataset.my-table`" in query_str
+    assert "UNNEST(@inputs)" in query_str
+    assert "LIMIT 3" in query_str
+
+    params = {p.name: p for p in job_config.query_parameters}
+    assert params["threshold"].value == 2
+    inputs = [struct.struct_values for struct in params["inputs"].values]
+    assert inputs[0]["normalized_term"] == "BLUE LAGOON GRP"
+    # Names are matched literally in batch mode
+    assert inputs[1]["regex_pattern"] == r"(?i)\bNOBODY\ \(UK\)\b"
+
+    assert results[0]["matches"][0]["entity_id"] == 23665
+    assert results[1]["matches"] == []
+    mock_bigquery_client.create_table.assert_not_called()
+
+def test_screen_batch_matches_nothing_for_blank_names(mock_bigquery_client):
+    mock_bigquery_client.query.return_value.result.return_value = []
+
+    list(search_bq.screen_batch("p", "d", "t", [("0", ""), ("1", "   "), ("2", "*"), ("3", "Sea Star")], 2))
+
+    job_config = mock_bigquery_client.query.call_args[1]['job_config']
+    params = {p.name: p for p in job_config.query_parameters}
+    inputs = [struct.struct_values for struct in params["inputs"].values]
+    for blank in inputs[:3]:
+        assert blank["regex_pattern"] is None
+        assert blank["normalized_regex_pattern"] is None
+        assert blank["normalized_term"] is None
+    assert inputs[3]["regex_pattern"] == r"(?i)\bSEA\ STAR\b"
+
+def test_screen_batch_uses_temp_table_for_large_inputs(mock_bigquery_client, monkeypatch):
+    monkeypatch.setattr(search_bq, "MAX_PARAMETER_INPUTS", 1)
+    mock_bigquery_client.create_table.side_effect = lambda table: table
+    mock_bigquery_client.query.return_value.result.return_value = []
+
+    list(search_bq.screen_batch("my-project", "my-dataset", "my-table", [("0", "A"), ("1", "B")], 2))
+
+    table = mock_bigquery_client.create_table.call_args[0][0]
+    assert table.table_id.startswith("_screening_inputs_")
+    assert mock_bigquery_client.load_table_from_json.call_args[0][0][1]["search_term"] == "B"
+    assert f"`my-project.my-dataset.{table.table_id}`" in mock_bigquery_client.query.call_args[0][0]
+    mock_bigquery_client.delete_table.assert_called_once()
+
+def test_screen_file_streams_results(mock_bigquery_client, tmp_path):
+    input_path = tmp_path / "names.csv"
+    input_path.write_text("name\nSea Star\n")
+    output_path = tmp_path / "results.jsonl"
+    mock_bigquery_client.query.return_value.result.return_value = [
+        {"input_id": "0", "search_term": "Sea Star", "normalized_term": "SEA STAR",
+         "matches": [{"entity_id": 9647, "score": 0, "matched_name": "SEA STAR"}]},
+    ]
+
+    assert search_bq.screen_file("p", "d", "t", str(input_path), str(output_path)) == (1, 1)
+    assert json.loads(output_path.read_text())["matches"][0]["entity_id"] == 9647
+
+def test_ranked_search_scans_table_once(mock_bigquery_client):
+    mock_bigquery_client.query.return_value.result.return_value = [
+        {"entity_id": 23665, "programs": ["SDGT"], "match_type": "NORMALIZED_WORD", "distance": 0,
+         "matched_name": "BLUE LAGOON GROUP LTD"},
+    ]
+
+    _, results = search_bq.ranked_search(
+        "my-project", "my-dataset", "my-table", "Blue Lagoon Grp", 2, top_k=3, columns=["programs"]
+    )
+
+    query_str = mock_bigquery_client.query.call_args[0][0]
+    job_config = mock_bigquery_client.query.call_args[1]['job_config']
+    assert query_str.count("`my-project.my-dataset.my-table`") == 1
+    assert " IN (" not in query_str
+    assert "t.programs," in query_str
+    assert "t.addresses" not in query_str
+    assert query_str.count("EDIT_DISTANCE(") == 1
+    assert "ABS(LENGTH(n.normalized_name) - LENGTH(@normalized_search_term)) <= @threshold" in query_str
+
+    params = {p.name: p.value for p in job_config.query_parameters}
+    assert params["top_k"] == 3
+    assert params["normalized_search_term"] == "BLUE LAGOON GRP"
+    assert params["normalized_regex_pattern"] == r"\bBLUE LAGOON GRP\b"
+    assert results == [
+        {"entity_id": 23665, "programs": ["SDGT"], "match_type": "NORMALIZED_WORD", "distance": 0,
+         "matched_name": "BLUE LAGOON GROUP LTD"},
+    ]
+
+def test_ranked_query_rejects_unknown_columns():
+    with pytest.raises(ValueError):
+        search_bq.build_ranked_query("p.d.t", ["names", "entity_id; DROP TABLE x"])
+
+def test_keyed_search_filters_on_stored_keys(mock_bigquery_client):
+    mock_bigquery_client.query.return_value.result.return_value = []
+
+    search_bq.ranked_search("p", "d", "t", "Lagoon Blue Group", 2, use_keys=True)
+
+    query_str = mock_bigquery_client.query.call_args[0][0]
+    job_config = mock_bigquery_client.query.call_args[1]['job_config']
+    assert "UNNEST(n.name_tokens)" in query_str
+    assert "n.name_length BETWEEN" in query_str
+    assert "LENGTH(n.normalized_name)" not in query_str
+    assert "'TOKEN_SET'" in query_str and "'PHONETIC'" in query_str
+    params = {p.name: getattr(p, "value", None) or getattr(p, "values", None) for p in job_config.query_parameters}
+    assert params["term_tokens"] == ["LAGOON", "BLUE", "GROUP"]
+    assert params["sorted_token_key"] == "BLUE GRP LAGOON"
+    assert params["phonetic_key"] == "L250 B400 G610"
+
+def test_keyed_search_requires_no_words_for_regex_terms(mock_bigquery_client):
+    mock_bigquery_client.query.return_value.result.return_value = []
+
+    search_bq.ranked_search("p", "d", "t", "Blue.*Group", 2, use_keys=True)
+
+    job_config = mock_bigquery_client.query.call_args[1]['job_config']
+    assert {p.name: p.values for p in job_config.query_parameters if p.name == "term_tokens"} == {"term_tokens": []}
+
+def test_weighted_search_reads_token_stats(mock_bigquery_client):
+    mock_bigquery_client.query.return_value.result.return_value = [
+        {"entity_id": 1, "score": 0.8, "matched_name": "Bank Melli Iran"},
+    ]
+
+    _, results = search_bq.weighted_search("p", "d", "t", "Melli Bank", top_k=3, min_score=0.4)
+
+    query_str = mock_bigquery_client.query.call_args[0][0]
+    job_config = mock_bigquery_client.query.call_args[1]['job_config']
+    assert "`p.d.t_token_stats`" in query_str
+    assert "JOIN essential ON essential.token = word" in query_str
+    assert "LIMIT @top_k" in query_str
+    # Without columns, the table's rows are never joined back
+    assert query_str.count("`p.d.t`") == 1
+    params = {p.name: getattr(p, "value", None) or getattr(p, "values", None) for p in job_config.query_parameters}
+    assert params == {"term_tokens": ["BANK", "MELLI"], "min_score": 0.4, "top_k": 3}
+    assert results == [{"entity_id": 1, "score": 0.8, "matched_name": "Bank Melli Iran"}]
+
+def test_weighted_query_joins_columns_for_top_k_only():
+    query_str = search_bq.build_weighted_query("p.d.t", "p.d.s", ["programs"])
+    assert "t.programs," in query_str
+    assert "JOIN `p.d.t` AS t USING (entity_id)" in query_str
+
+def test_indexed_search_looks_words_up_with_search(mock_bigquery_client):
+    mock_bigquery_client.query.return_value.result.return_value = []
+
+    search_bq.ranked_search("p", "d", "t", "Blue Lagoon Group", 2, use_search_index=True)
+
+    query_str = mock_bigquery_client.query.call_args[0][0]
+    job_config = mock_bigquery_client.query.call_args[1]['job_config']
+    assert "`p.d.t_aliases`" in query_str
+    assert "`p.d.t`" not in query_str
+    for i in range(3):
+        assert f"SEARCH(a.name_tokens, @word_token_{i}, analyzer => 'NO_OP_ANALYZER')" in query_str
+        assert f"SEARCH(a.normalized_tokens, @normalized_token_{i}, analyzer => 'NO_OP_ANALYZER')" in query_str
+    assert "a.name_length BETWEEN" in query_str
+    assert "'TOKEN_SET' AS match_type" not in query_str
+    params = {p.name: p.value for p in job_config.query_parameters}
+    assert [params[f"word_token_{i}"] for i in range(3)] == ["BLUE", "LAGOON", "GROUP"]
+    assert [params[f"normalized_token_{i}"] for i in range(3)] == ["BLUE", "LAGOON", "GRP"]
+
+def test_indexed_search_scans_names_for_regex_terms(mock_bigquery_client):
+    mock_bigquery_client.query.return_value.result.return_value = []
+
+    search_bq.ranked_search("p", "d", "t", "Blue.*Group", 2, use_keys=True, use_search_index=True,
+                            columns=["programs"], alias_table_id="aliases")
+
+    query_str = mock_bigquery_client.query.call_args[0][0]
+    assert "`p.d.aliases`" in query_str
+    assert "SEARCH(a.name_tokens" not in query_str
+    assert "WHERE TRUE" in query_str
+    assert "'TOKEN_SET'" in query_str and "'PHONETIC'" in query_str
+    assert "JOIN `p.d.t` AS t USING (entity_id)" in query_str
+
+def test_search_filters_accept_one_value_or_many():
+    assert search_bq.search_filters() == {}
+    assert search_bq.search_filters("Vessel", ["SDGT", "CUBA"], ()) == {
+        "entity_type": ["Vessel"], "programs": ["SDGT", "CUBA"],
+    }
+
+def test_filters_are_pushed_into_the_default_query(mock_bigquery_client):
+    mock_bigquery_client.query.return_value.result.return_value = []
+
+    search_bq.query_entities("p", "d", "t", "Sea Star", 2, entity_type="Vessel", country_iso2=["CU", "AE"])
+
+    query_str = mock_bigquery_client.query.call_args[0][0]
+    job_config = mock_bigquery_client.query.call_args[1]['job_config']
+    where = query_str[query_str.index("WHERE"):query_str.index("Normalized Fuzzy Match")]
+    assert "e.type IN UNNEST(@filter_entity_type)" in where
+    assert "address.country_iso2 IN UNNEST(@filter_country_iso2)" in where
+    assert "@filter_programs" not in query_str
+    # The filters must restrict every match condition, not just the first of the OR chain
+    condition = " ".join(query_str[query_str.index("AND (", query_str.index("WHERE")):query_str.index("GROUP BY")].split())
+    assert condition.startswith("AND ( ( -- Normalized Fuzzy Match")
+    assert condition.endswith("REGEXP_CONTAINS(n.normalized_name, normalized_regex_pattern) ) )")
+    params = {p.name: getattr(p, "values", None) for p in job_config.query_parameters}
+    assert params["filter_entity_type"] == ["Vessel"]
+    assert params["filter_country_iso2"] == ["CU", "AE"]
+
+def test_filters_are_pushed_into_ranked_and_weighted_queries(mock_bigquery_client):
+    mock_bigquery_client.query.return_value.result.return_value = []
+
+    search_bq.ranked_search("p", "d", "t", "Sea Star", 2, programs="SDGT")
+    query_str = mock_bigquery_client.query.call_args[0][0]
+    assert "FROM `p.d.t` AS t\n        WHERE EXISTS (SELECT 1 FROM UNNEST(t.programs) AS program" in query_str
+
+    search_bq.weighted_search("p", "d", "t", "Sea Star", entity_type="Vessel")
+    query_str = mock_bigquery_client.query.call_args[0][0]
+    candidates = query_str[query_str.index("candidates AS"):query_str.index("scored AS")]
+    assert "WHERE t.type IN UNNEST(@filter_entity_type)" in candidates
+
+    assert "UNNEST(@filter_programs)" not in search_bq.build_batch_query("p.d.t", "UNNEST(@inputs)", 5)
+    batch_query = search_bq.build_batch_query("p.d.t", "UNNEST(@inputs)", 5, {"programs": ["SDGT"]})
+    assert "CROSS JOIN (SELECT * FROM `p.d.t` AS t WHERE EXISTS" in batch_query
+
+def test_indexed_search_filters_type_on_the_alias_table(mock_bigquery_client):
+    mock_bigquery_client.query.return_value.result.return_value = []
+
+    search_bq.ranked_search("p", "d", "t", "Sea Star", 2, use_search_index=True, entity_type="Vessel")
+    query_str = mock_bigquery_client.query.call_args[0][0]
+    assert query_str.count("AND a.type IN UNNEST(@filter_entity_type)") == 3
+    assert "allowed AS" not in query_str
+
+    search_bq.ranked_search("p", "d", "t", "Sea Star", 2, use_search_index=True, use_keys=True,
+                            entity_type="Vessel", country_iso2="CU")
+    query_str = mock_bigquery_client.query.call_args[0][0]
+    assert "allowed AS (\n        SELECT t.entity_id FROM `p.d.t` AS t WHERE EXISTS" in query_str
+    assert query_str.count("AND a.entity_id IN (SELECT entity_id FROM allowed)") == 5
+    assert "t.type" not in query_str
@@ -0,0 +1,120 @@
+import pytest
+import asyncio
+import sys
+import os
+import threading
+import datetime
+import time
+from unittest.mock import MagicMock
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+import search_service
+from result_cache import ResultCache
+
+
+class _SlowClient:
+    """Stands in for bigquery.Client, recording how many queries run at once."""
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.active = 0
+        self.peak = 0
+        self.queries = []
+        self.closed = False
+        self.table = MagicMock(modified=datetime.datetime(2024, 1, 1), etag="a")
+        self._lock = threading.Lock()
+
+    def query(self, query, job_config=None):
+        params = {p.name: p.value for p in job_config.query_parameters}
+        self.queries.append(params)
+        job = MagicMock()
+        job.total_bytes_processed = 1000
+
+        def result():
+            with self._lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            time.sleep(self.latency)
+            with self._lock:
+                self.active -= 1
+            return [{"entity_id": len(params["normalized_search_term"]), "match_type": "FUZZY", "distance": 1,
+                     "matched_name": params["normalized_search_term"]}]
+
+        job.result.side_effect = result
+        return job
+
+    def get_table(self, table):
+        return self.table
+
+    def close(self):
+        self.closed = True
+
+
+def test_search_many_respects_concurrency_limit():
+    client = _SlowClient()
+    terms = [f"Name {'X' * (i + 1)}" for i in range(12)]
+
+    async def main():
+        async with search_service.SearchService("p", max_concurrency=3, client=client) as service:
+            return await service.search_many(terms)
+
+    results = asyncio.run(main())
+
+    assert client.peak == 3
+    assert len(client.queries) == 12
+    # A client passed in belongs to the caller
+    assert not client.closed
+    assert [r[0]["matched_name"] for r in results] == [t.upper() for t in terms]
+
+
+def test_close_releases_only_its_own_client(monkeypatch):
+    client = _SlowClient(latency=0)
+    monkeypatch.setattr(search_service, "_pooled_client", lambda project_id, max_concurrency: client)
+    with search_service.SearchService("p"):
+        pass
+    assert client.closed
+
+
+def test_search_returns_objects_and_reuses_client():
+    client = _SlowClient(latency=0)
+    with search_service.SearchService("p", client=client, top_k=3) as service:
+        first = asyncio.run(service.search("Blue Lagoon Grp"))
+        second = service.search_sync("Sea Star")
+
+    assert first[0]["matched_name"] == "BLUE LAGOON GRP"
+    assert second[0]["matched_name"] == "SEA STAR"
+    assert [q["top_k"] for q in client.queries] == [3, 3]
+
+
+def test_search_many_can_return_exceptions():
+    client = MagicMock()
+    client.query.side_effect = RuntimeError("quota")
+    service = search_service.SearchService("p", client=client)
+
+    results = asyncio.run(service.search_many(["a", "b"], return_exceptions=True))
+    service.close()
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_cache_answers_repeats_until_table_changes():
+    client = _SlowClient(latency=0)
+    cache = ResultCache()
+    with search_service.SearchService("p", client=client, cache=cache, version_refresh_seconds=0) as service:
+        first = service.search_sync("Blue Lagoon Grp")
+        # Same normalized and upper-cased term: served from the cache
+        again = service.search_sync("blue lagoon grp")
+        assert len(client.queries) == 1
+        assert again == first
+
+        service.search_sync("Blue Lagoon Grp", threshold=1)
+        assert len(client.queries) == 2
+
+        client.table = MagicMock(modified=datetime.datetime(2024, 1, 2), etag="b")
+        service.search_sync("Blue Lagoon Grp")
+        assert len(client.queries) == 3
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+    assert stats["bytes_saved"] == 1000
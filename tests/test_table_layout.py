@@ -0,0 +1,36 @@
+import sys
+import os
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+from table_layout import build_alias_table_script, load_alias_schema, search_index_name
+
+
+def test_alias_schema_matches_name_fields():
+    with open(os.path.join(os.path.dirname(__file__), "..", "queries", "bq_schema.json")) as f:
+        names = next(field for field in __import__("json").load(f) if field["name"] == "names")
+    name_fields = {field["name"] for field in names["fields"]}
+    alias_fields = {field["name"] for field in load_alias_schema()}
+    # Every alias column comes from the entity or its name, except the derived normalized_tokens
+    assert alias_fields - name_fields == {"entity_id", "type", "normalized_tokens"}
+
+
+def test_search_index_name_is_dataset_scoped():
+    assert search_index_name("p.d.sdn_entities_aliases") == "sdn_entities_aliases_tokens"
+    assert search_index_name("p:d.sdn_entities_aliases") == "sdn_entities_aliases_tokens"
+
+
+def test_alias_table_script_keeps_index_and_replaces_rows_atomically():
+    script = build_alias_table_script("p.d.sdn_entities", "p.d.sdn_entities_aliases")
+    assert "CREATE TABLE IF NOT EXISTS `p.d.sdn_entities_aliases`" in script
+    assert "name_tokens ARRAY<STRING>" in script
+    assert "entity_id INT64 NOT NULL" in script
+    assert "CLUSTER BY name_length, type" in script
+    assert "CREATE SEARCH INDEX IF NOT EXISTS sdn_entities_aliases_tokens" in script
+    assert "(name_tokens, normalized_tokens)" in script
+    assert "analyzer = 'NO_OP_ANALYZER'" in script
+    # The table is never dropped, which would drop the index with it
+    assert "CREATE OR REPLACE" not in script
+    transaction = script[script.index("BEGIN TRANSACTION"):script.index("COMMIT TRANSACTION")]
+    assert "DELETE FROM `p.d.sdn_entities_aliases` WHERE TRUE" in transaction
+    assert "FROM `p.d.sdn_entities` AS t, UNNEST(t.names) AS n" in transaction
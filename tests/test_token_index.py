@@ -0,0 +1,75 @@
+import sys
+import os
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+from local_search import LocalSearchIndex
+from token_index import TokenSetIndex, tokens
+
+NAMES = [
+    "CHUOL JAMES KOANG",
+    "JAMES KOANG",
+    "KOANG CHUOL",
+    "JAMES SMITH",
+    "BLUE LAGOON GROUP",
+    "",
+]
+
+
+def test_tokens_are_distinct_words():
+    assert tokens("AL AL QAIDA") == frozenset({"AL", "QAIDA"})
+    assert tokens(None) == frozenset()
+
+
+def test_reordered_names_match_exactly():
+    index = TokenSetIndex(NAMES)
+    assert index.reordered("JAMES KOANG CHUOL") == [0]
+    assert index.search("JAMES KOANG CHUOL", min_similarity=1.0) == [(0, 1.0)]
+
+
+def test_token_set_similarity_ranks_partial_overlaps():
+    index = TokenSetIndex(NAMES)
+    matches = index.search("KOANG CHUOL JAMES", min_similarity=0.6)
+    assert matches == [(0, 1.0), (1, 2 / 3), (2, 2 / 3)]
+    assert index.search("JAMES", min_similarity=0.6) == []
+    assert index.search("JAMES", min_similarity=0.3) == [(1, 0.5), (3, 0.5), (0, 1 / 3)]
+
+
+def test_min_overlap_requires_shared_words():
+    index = TokenSetIndex(NAMES)
+    assert [i for i, _ in index.search("JAMES KOANG", min_similarity=0.1, min_overlap=2)] == [1, 0]
+    assert index.search("JAMES", min_similarity=0.1, min_overlap=2) == []
+    assert index.search("", min_similarity=0.1) == []
+
+
+def test_candidates_come_from_posting_lists():
+    index = TokenSetIndex(NAMES + [f"OTHER NAME {i}" for i in range(100)])
+    index.search("BLUE LAGOON GROUP", min_similarity=0.6)
+    assert index.candidates_examined == 1
+
+
+def test_search_matches_brute_force():
+    index = TokenSetIndex(NAMES)
+    for term in NAMES + ["JAMES CHUOL", "SMITH JAMES KOANG"]:
+        for similarity in (0.2, 0.5, 0.8):
+            for overlap in (1, 2):
+                expected = set()
+                for i, name in enumerate(NAMES):
+                    shared = tokens(term) & tokens(name)
+                    if tokens(term) and len(shared) >= overlap and \
+                            len(shared) / len(tokens(term) | tokens(name)) >= similarity:
+                        expected.add(i)
+                assert {i for i, _ in index.search(term, similarity, overlap)} == expected
+
+
+def test_local_search_index_matches_reordered_names():
+    records = [
+        {"entity_id": "1", "names": [{"full_name": "Chuol, James Koang", "normalized_name": "CHUOL JAMES KOANG"}]},
+        {"entity_id": "2", "names": [{"full_name": "James Koang", "normalized_name": "JAMES KOANG"},
+                                     {"full_name": "Koang James", "normalized_name": "KOANG JAMES"}]},
+        {"entity_id": "3", "names": [{"full_name": "John Doe", "normalized_name": "JOHN DOE"}]},
+    ]
+    index = LocalSearchIndex(records)
+    assert index.match_tokens("James Koang Chuol") == [("1", 1.0), ("2", 2 / 3)]
+    assert index.match_tokens("James Koang Chuol", min_similarity=1.0) == [("1", 1.0)]
+    assert index.match_tokens(None) == []
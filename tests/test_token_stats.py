@@ -0,0 +1,84 @@
+import math
+import random
+import sys
+import os
+
+# Add the load_and_search directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "load_and_search"))
+from local_search import LocalSearchIndex
+from token_index import TokenSetIndex, tokens
+from token_stats import TokenStats, build_token_stats_query, idf
+
+NAMES = [
+    "BANK MELLI IRAN",
+    "BANK SEPAH",
+    "BANK",
+    "MELLI INVESTMENT CORP",
+    "SEPAH BANK INTERNATIONAL",
+    "BLUE LAGOON CORP",
+    "GOLDEN CORP",
+]
+
+
+def test_common_words_weigh_less():
+    stats = TokenStats.from_names(NAMES + [None])
+    assert stats.documents == 7
+    assert stats.frequencies["BANK"] == 4
+    assert stats.idf("BANK") == idf(4, 7) == math.log(8 / 5) + 1
+    assert stats.idf("BANK") < stats.idf("MELLI") < stats.idf("LAGOON") < stats.idf("UNSEEN")
+
+
+def test_score_is_weighted_jaccard():
+    stats = TokenStats.from_names(NAMES)
+    assert stats.score(tokens("BANK"), tokens("BANK")) == 1.0
+    # Sharing the rare word counts for more than sharing the common one
+    assert stats.score(tokens("MELLI BANK"), tokens("BANK MELLI IRAN")) > \
+        stats.score(tokens("MELLI BANK"), tokens("BANK SEPAH"))
+    assert stats.score(frozenset(), frozenset()) == 0.0
+
+
+def test_essential_tokens_drop_common_words():
+    stats = TokenStats.from_names(NAMES)
+    assert stats.essential_tokens(tokens("BANK LAGOON"), 0.5) == {"LAGOON"}
+    assert stats.essential_tokens(tokens("BANK"), 0.5) == {"BANK"}
+    assert stats.essential_tokens(tokens("BANK LAGOON"), 0.0) == {"BANK", "LAGOON"}
+
+
+def test_weighted_search_matches_brute_force():
+    rng = random.Random(5)
+    words = ["BANK", "CORP", "LTD", "JAMES", "MELLI", "SEPAH", "LAGOON", "KOANG", "IRAN", "GOLD"]
+    names = [" ".join(rng.sample(words, rng.randint(1, 4))) for _ in range(300)]
+    stats = TokenStats.from_names(names)
+    index = TokenSetIndex(names)
+    for term in ["BANK", "BANK MELLI", "JAMES KOANG CORP", "LAGOON GOLD IRAN LTD", "UNSEEN BANK"]:
+        for min_score in (0.2, 0.5):
+            scores = [(i, stats.score(tokens(term), tokens(name))) for i, name in enumerate(names)]
+            expected = sorted(((i, s) for i, s in scores if s >= min_score), key=lambda m: (-m[1], m[0]))
+            assert index.search_weighted(term, stats, 5, min_score) == expected[:5]
+
+
+def test_weighted_search_stops_early():
+    names = [f"BANK {i}" for i in range(1000)] + ["BANK"]
+    stats = TokenStats.from_names(names)
+    index = TokenSetIndex(names)
+    assert index.search_weighted("BANK", stats, 1, 0.1) == [(1000, 1.0)]
+    assert index.candidates_examined == 1
+
+
+def test_local_search_index_ranks_broad_terms():
+    records = [
+        {"entity_id": "1", "names": [{"full_name": "Bank Melli Iran", "normalized_name": "BANK MELLI IRAN"}]},
+        {"entity_id": "2", "names": [{"full_name": "Bank Sepah", "normalized_name": "BANK SEPAH"}]},
+        {"entity_id": "3", "names": [{"full_name": "Melli Bank", "normalized_name": "MELLI BANK"}]},
+    ]
+    index = LocalSearchIndex(records)
+    assert [entity_id for entity_id, _ in index.match_weighted("Melli Bank", top_k=2, min_score=0.1)] == ["3", "1"]
+    assert [entity_id for entity_id, _ in index.match_weighted("Bank", top_k=10, min_score=0.1)] == ["3", "2", "1"]
+    assert index.match_weighted(None) == []
+
+
+def test_token_stats_query_counts_aliases():
+    query = build_token_stats_query("p.d.sdn_entities", "p.d.sdn_entities_token_stats")
+    assert "CREATE OR REPLACE TABLE `p.d.sdn_entities_token_stats`" in query
+    assert "FROM `p.d.sdn_entities` AS t, UNNEST(t.names) AS n" in query
+    assert "LN((1 + ANY_VALUE(totals.documents)) / (1 + COUNT(*))) + 1 AS idf" in query